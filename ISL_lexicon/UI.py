@@ -2,11 +2,13 @@ import tkinter as tk
 from tkinter import messagebox
 import pandas as pd
 import os
-import cv2
+
+from sentence_video import ClipPlayer, SentenceAssembler
 
 # Paths
 CSV_PATH = os.path.join("ISL_lexicon", "index.csv")
 VIDEO_FOLDER = os.path.join("ISL_lexicon", "Videos", "output")
+SENTENCE_FOLDER = os.path.join("ISL_lexicon", "Videos", "sentences")
 
 # Define stop words to ignore
 STOP_WORDS = {
@@ -27,25 +29,19 @@ STOP_WORDS = {
 df = pd.read_csv(CSV_PATH)
 word_to_video = {row['words']: row['path'] for _, row in df.iterrows()}
 
-def play_video(video_path):
-    """Play a video using OpenCV."""
-    full_path = os.path.join(VIDEO_FOLDER, os.path.basename(video_path))
-    if not os.path.exists(full_path):
-        messagebox.showerror("Error", f"Video not found: {full_path}")
-        return
-    
-    cap = cv2.VideoCapture(full_path)
-    if not cap.isOpened():
-        messagebox.showerror("Error", f"Could not open video: {full_path}")
+def video_path(path):
+    return os.path.join(VIDEO_FOLDER, os.path.basename(path))
+
+def play_sentence(clip_paths):
+    """Play the clips of a sentence, as a single assembled video when it was already assembled."""
+    sentence_path = assembler.cached(clip_paths)
+    if sentence_path is not None:
+        player.play([sentence_path])
         return
-        
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: break
-        cv2.imshow("Sign Output", frame)
-        if cv2.waitKey(25) & 0xFF == ord('q'): break
-    cap.release()
-    cv2.destroyAllWindows()
+
+    # Start playing the clips right away, and assemble the sentence video for next time
+    player.play(clip_paths)
+    assembler.assemble_in_background(clip_paths)
 
 def process_input():
     input_text = entry.get().strip().lower()
@@ -60,14 +56,14 @@ def process_input():
         messagebox.showwarning("Warning", "No meaningful words found after removing stop words.")
         return
 
-    matched = False
+    clip_paths = []
+    not_found = []
     print(f"Processing words: {words}")  # Debug print
 
     for word in words:
         if word in word_to_video:
-            matched = True
             print(f"Playing video for word: {word} -> {word_to_video[word]}")  # Debug print
-            play_video(word_to_video[word])
+            clip_paths.append(video_path(word_to_video[word]))
         else:
             # Try common variations (e.g., plural forms)
             variations = [
@@ -78,16 +74,24 @@ def process_input():
             variation_found = False
             for var in variations:
                 if var in word_to_video:
-                    matched = True
                     variation_found = True
                     print(f"Playing video for variation: {var} -> {word_to_video[var]}")  # Debug print
-                    play_video(word_to_video[var])
+                    clip_paths.append(video_path(word_to_video[var]))
                     break
             
             if not variation_found:
-                messagebox.showinfo("Not Found", f"No sign available for: {word}")
+                not_found.append(word)
+
+    missing_videos = [path for path in clip_paths if not os.path.exists(path)]
+    if missing_videos:
+        messagebox.showerror("Error", f"Video not found: {', '.join(missing_videos)}")
+    clip_paths = [path for path in clip_paths if os.path.exists(path)]
 
-    if not matched:
+    if clip_paths:
+        play_sentence(clip_paths)
+    if not_found:
+        messagebox.showinfo("Not Found", f"No sign available for: {', '.join(not_found)}")
+    if not clip_paths and not not_found:
         messagebox.showinfo("Info", "No matching signs found in dataset.")
 
 # --- UI Setup ---
@@ -96,6 +100,9 @@ root.title("ISL Translator")
 root.geometry("400x200")
 root.configure(bg="black")
 
+player = ClipPlayer(root)
+assembler = SentenceAssembler(SENTENCE_FOLDER)
+
 label = tk.Label(root, text="Enter English Text:", fg="white", bg="black", font=("Arial", 14))
 label.pack(pady=10)
 
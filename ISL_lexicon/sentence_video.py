@@ -0,0 +1,142 @@
+import hashlib
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+
+import cv2
+
+# Sentence videos for the ISL UI. The clips of a sentence are played back to back from a background decoder
+# (the next clip is decoded while the current one plays), and concatenated in the background into a single
+# sentence video (ffmpeg concat demuxer, stream copy, no re-encoding), which is played directly next time.
+
+
+class SentenceAssembler:
+    def __init__(self, cache_directory):
+        self.cache_directory = cache_directory
+        self.lock = threading.Lock()
+        self.assembling = set()
+
+    def key(self, clip_paths):
+        # The word sequence (as clips), and the version of every clip, so re-rendered clips are picked up
+        content = []
+        for path in clip_paths:
+            stat = os.stat(path)
+            content.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha1("\n".join(content).encode("utf-8")).hexdigest()
+
+    def cached(self, clip_paths):
+        """The sentence video if it was already assembled, None otherwise"""
+        if len(clip_paths) == 1:
+            return clip_paths[0]
+        path = os.path.join(self.cache_directory, f"{self.key(clip_paths)}.mp4")
+        return path if os.path.exists(path) else None
+
+    def assemble(self, clip_paths):
+        key = self.key(clip_paths)
+        output_path = os.path.join(self.cache_directory, f"{key}.mp4")
+        if os.path.exists(output_path):
+            return output_path
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+        fd, list_path = tempfile.mkstemp(dir=self.cache_directory, suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for path in clip_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        # Written to a temporary file, so an interrupted assembly is never played
+        tmp_path = os.path.join(self.cache_directory, f"{key}.tmp.mp4")
+        try:
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                            "-c", "copy", tmp_path], check=True)
+            os.replace(tmp_path, output_path)
+        finally:
+            os.remove(list_path)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return output_path
+
+    def assemble_in_background(self, clip_paths):
+        key = self.key(clip_paths)
+        with self.lock:
+            if key in self.assembling:
+                return
+            self.assembling.add(key)
+
+        def run():
+            try:
+                self.assemble(clip_paths)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print(f"Could not assemble sentence video: {e}")
+            finally:
+                with self.lock:
+                    self.assembling.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+class ClipPlayer:
+    """
+    Plays clips one after another in an OpenCV window, without blocking the Tk main loop:
+    frames are decoded on a background thread into a bounded buffer, and shown from the main loop with `after`.
+    """
+
+    def __init__(self, root, window_name="Sign Output", buffer_frames=64):
+        self.root = root
+        self.window_name = window_name
+        self.buffer_frames = buffer_frames
+        self.stop_event = None
+        self.frames = None
+
+    def play(self, clip_paths):
+        self.stop()
+        self.stop_event = threading.Event()
+        self.frames = queue.Queue(maxsize=self.buffer_frames)
+        threading.Thread(target=self._decode, args=(clip_paths, self.frames, self.stop_event), daemon=True).start()
+        self._show_next(self.frames, self.stop_event)
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+            # Unblock the decoder, if it waits for space in the buffer
+            while not self.frames.empty():
+                self.frames.get_nowait()
+
+    @staticmethod
+    def _decode(clip_paths, frames, stop_event):
+        for path in clip_paths:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                print(f"Could not open video: {path}")
+                continue
+            delay = int(1000 / (cap.get(cv2.CAP_PROP_FPS) or 25))
+            while not stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.put((frame, delay))
+            cap.release()
+        frames.put((None, 0))
+
+    def _show_next(self, frames, stop_event):
+        if stop_event.is_set():
+            return
+        try:
+            frame, delay = frames.get_nowait()
+        except queue.Empty:
+            # The decoder is behind, check again shortly
+            self.root.after(5, self._show_next, frames, stop_event)
+            return
+
+        if frame is None:
+            cv2.destroyWindow(self.window_name)
+            return
+
+        cv2.imshow(self.window_name, frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            stop_event.set()
+            cv2.destroyWindow(self.window_name)
+            return
+        self.root.after(delay, self._show_next, frames, stop_event)
@@ -0,0 +1,75 @@
+# Measures the per-pose preprocessing of concatenate_poses (reduce, normalize, trim) on a paragraph-length input,
+# serially and with thread and process pools of increasing size, and the full concatenate_poses for reference.
+# Usage: python benchmarks/concatenate.py [--signs 60] [--repeat 3]
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+
+from pose_format import Pose
+
+from spoken_to_signed.gloss_to_pose.concatenate import ConcatenationSettings, concatenate_poses, preprocess_poses
+from spoken_to_signed.gloss_to_pose.lookup.fingerspelling_lookup import FingerspellingPoseLookup
+
+
+def load_poses(count: int, spoken_language: str, signed_language: str):
+    lookup = FingerspellingPoseLookup()
+    rows = [rows[0] for rows in lookup.words_index[spoken_language][signed_language].values()]
+    random.seed(0)
+    poses = [lookup.get_pose(row) for row in random.choices(rows, k=count)]
+    # Keep raw bytes, as preprocessing modifies poses in place
+    return [to_bytes(pose) for pose in poses]
+
+
+def to_bytes(pose: Pose) -> bytes:
+    buffer = io.BytesIO()
+    pose.write(buffer)
+    return buffer.getvalue()
+
+
+def measure(function, poses_bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        poses = [Pose.read(content) for content in poses_bytes]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            function(poses)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signs", type=int, default=60, help="Number of signs to concatenate")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--spoken-language", type=str, default="de")
+    parser.add_argument("--signed-language", type=str, default="sgg")
+    args = parser.parse_args()
+
+    poses_bytes = load_poses(args.signs, args.spoken_language, args.signed_language)
+    cores = os.cpu_count()
+    worker_counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    print(f"{args.signs} signs, {cores} cores")
+
+    configurations = [("serial", None, None)]
+    configurations += [(f"{kind} x{workers}", kind, workers) for kind in ["thread", "process"]
+                       for workers in worker_counts]
+
+    serial = None
+    for name, kind, workers in configurations:
+        ConcatenationSettings.executor = kind
+        ConcatenationSettings.workers = workers
+        # Warm up the pool, which is shared across calls
+        measure(preprocess_poses, poses_bytes[:2], 1)
+
+        preprocess_time = measure(preprocess_poses, poses_bytes, args.repeat)
+        total_time = measure(concatenate_poses, poses_bytes, args.repeat)
+        serial = serial if serial is not None else preprocess_time
+        print(f"  {name:<12} preprocessing {preprocess_time * 1000:8.1f}ms ({serial / preprocess_time:4.2f}x)  "
+              f"concatenate_poses {total_time * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
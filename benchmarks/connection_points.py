@@ -0,0 +1,111 @@
+# Compares the best connection points between signs found with descriptors (a subset of joints, in float32)
+# to the current method (all points), on pairs of lexicon entries prepared like concatenate_poses prepares them.
+# Join quality is the full distance at the descriptor connection point, relative to the best full distance (>= 1).
+# Usage: python benchmarks/connection_points.py [--pairs 500]
+import argparse
+import contextlib
+import io
+import itertools
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from spoken_to_signed.gloss_to_pose.concatenate import prepare_pose, trim_pose
+from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup
+from spoken_to_signed.gloss_to_pose.lookup.fingerspelling_lookup import FingerspellingPoseLookup
+from spoken_to_signed.gloss_to_pose.smoothing import ConnectionSettings, connection_descriptors, \
+    find_best_connection_point
+
+ROOT = Path(__file__).parent.parent
+
+
+def lexicon_rows(lookup):
+    return [row
+            for signed_languages in lookup.words_index.values()
+            for terms in signed_languages.values()
+            for rows in terms.values()
+            for row in rows]
+
+
+def prepared_poses(lookup, rows):
+    poses = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for row in rows:
+            pose = prepare_pose(lookup.get_pose(row))
+            pose.descriptors = connection_descriptors(pose)
+            poses.append(trim_pose(pose))
+    return poses
+
+
+def find_connection(pose1, pose2, use_descriptors: bool, precomputed: bool):
+    ConnectionSettings.use_descriptors = use_descriptors
+    descriptors = pose1.descriptors, pose2.descriptors
+    if not precomputed:
+        pose1.descriptors = pose2.descriptors = None
+    try:
+        return find_best_connection_point(pose1, pose2)
+    finally:
+        pose1.descriptors, pose2.descriptors = descriptors
+        ConnectionSettings.use_descriptors = False
+
+
+def full_distance(pose1, pose2, last_index: int, first_index: int) -> float:
+    return cdist(pose1.body.data[last_index].reshape(1, -1), pose2.body.data[first_index].reshape(1, -1))[0, 0]
+
+
+def report(name: str, poses, pairs):
+    print(f"{name}: {len(poses)} entries, {len(pairs)} joins")
+
+    timings = {}
+    for method, use_descriptors, precomputed in [("all points", False, False),
+                                                 ("descriptors", True, False),
+                                                 ("precomputed descriptors", True, True)]:
+        start = time.perf_counter()
+        results = [find_connection(poses[i], poses[j], use_descriptors, precomputed) for i, j in pairs]
+        timings[method] = (time.perf_counter() - start) / len(pairs)
+        if method == "all points":
+            reference = results
+        elif method == "descriptors":
+            candidates = results
+
+    same = sum(result == expected for result, expected in zip(candidates, reference))
+    offsets = [abs(int(result[0]) - int(expected[0])) + abs(int(result[1]) - int(expected[1]))
+               for result, expected in zip(candidates, reference)]
+    ratios = []
+    for (i, j), result, expected in zip(pairs, candidates, reference):
+        best = full_distance(poses[i], poses[j], *expected)
+        ratios.append(full_distance(poses[i], poses[j], *result) / best if best > 0 else 1)
+
+    print(f"  same connection point  {same / len(pairs):8.1%}")
+    print(f"  frame offset           mean {np.mean(offsets):.2f}, max {np.max(offsets)}")
+    print(f"  join quality           mean {np.mean(ratios):.3f}, p95 {np.percentile(ratios, 95):.3f}, "
+          f"max {np.max(ratios):.3f}")
+    for method, timing in timings.items():
+        print(f"  {method:<24} {timing * 1e6:8.1f} us/join")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=500, help="Number of fingerspelling joins to compare")
+    parser.add_argument("--spoken-language", type=str, default="de")
+    parser.add_argument("--signed-language", type=str, default="sgg")
+    args = parser.parse_args()
+
+    dummy_lookup = CSVPoseLookup(str(ROOT / "assets" / "dummy_lexicon"), prepared=False)
+    dummy_poses = prepared_poses(dummy_lookup, lexicon_rows(dummy_lookup))
+    report("Dummy lexicon", dummy_poses, list(itertools.permutations(range(len(dummy_poses)), 2)))
+
+    fingerspelling_lookup = FingerspellingPoseLookup()
+    rows = [rows[0] for rows in
+            fingerspelling_lookup.words_index[args.spoken_language][args.signed_language].values()]
+    fingerspelling_poses = prepared_poses(fingerspelling_lookup, rows)
+    random.seed(0)
+    pairs = [tuple(random.sample(range(len(fingerspelling_poses)), 2)) for _ in range(args.pairs)]
+    report(f"Fingerspelling lexicon ({args.spoken_language}-{args.signed_language})", fingerspelling_poses, pairs)
+
+
+if __name__ == "__main__":
+    main()
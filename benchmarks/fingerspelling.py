@@ -0,0 +1,72 @@
+# Measures fingerspelling: word segmentation (trie vs. the previous alphabet scan), and assembling word poses
+# (first time vs. repeated words, served from the word cache)
+# Usage: python benchmarks/fingerspelling.py [--words unknown_words.txt] [--spoken-language de --signed-language sgg]
+# Without a word list, 10k random words are generated from the alphabet of the language pair.
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from spoken_to_signed.gloss_to_pose.lookup.fingerspelling_lookup import FingerspellingPoseLookup
+
+LONG_NAMES = ["maximiliankonstantinwolfgangschneider", "annaschwarzenbachmuellerluedenscheid",
+              "bartholomaeuskirchschlaegerhofstetter", "christophschaerlachenbuehlmann"]
+
+
+def scan_segment(word: str, alphabet):
+    # The previous segmentation: find any alphabet key in the word (longest first), then recurse on both sides
+    if word == "":
+        return []
+    for key in alphabet:
+        if key in word:
+            match_index = word.index(key)
+            return (scan_segment(word[:match_index], alphabet) + [key] +
+                    scan_segment(word[match_index + len(key):], alphabet))
+    raise FileNotFoundError(f"Characters {word} not found in fingerspelling lexicon")
+
+
+def measure(name: str, function, count: int):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<32} {elapsed:8.3f}s  {count / elapsed:10.1f} words/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=str, default=None, help="Text file, one word per line")
+    parser.add_argument("--spoken-language", type=str, default="de")
+    parser.add_argument("--signed-language", type=str, default="sgg")
+    parser.add_argument("--assemble", type=int, default=200, help="Number of words to assemble poses for")
+    args = parser.parse_args()
+
+    lookup = FingerspellingPoseLookup()
+    alphabet = list(lookup.words_index[args.spoken_language][args.signed_language])
+
+    if args.words is not None:
+        with open(args.words, "r", encoding="utf-8") as f:
+            words = [line.strip().lower() for line in f if line.strip() != ""]
+    else:
+        random.seed(0)
+        single_characters = [key for key in alphabet if len(key) == 1]
+        words = ["".join(random.choices(single_characters, k=random.randint(3, 12))) for _ in range(10000)]
+
+    sorted_alphabet = sorted(alphabet, key=len, reverse=True)
+    for name, word_list in [("long names", LONG_NAMES * 250), (f"{len(words)} unknown words", words)]:
+        print(f"Segmentation, {name}")
+        measure("alphabet scan", lambda: [scan_segment(w, sorted_alphabet) for w in word_list], len(word_list))
+        measure("trie", lambda: [lookup.segment(w, args.spoken_language, args.signed_language) for w in word_list],
+                len(word_list))
+
+    assemble_words = words[:args.assemble]
+    print(f"Assembling {len(assemble_words)} words")
+    for name in ["first time", "repeated (word cache)"]:
+        measure(name, lambda: [lookup.lookup(w, w, args.spoken_language, args.signed_language)
+                               for w in assemble_words], len(assemble_words))
+    print(f"  word cache: {lookup.word_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Tracks the cold start cost of the command line entry points: wall time and peak memory of importing a module
+# Usage: python benchmarks/startup.py [--module spoken_to_signed.bin] [--repeat 5]
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MEASURE_SCRIPT = """
+import json
+import resource
+import sys
+import time
+
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+
+max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":  # bytes on macOS, kilobytes on Linux
+    max_rss_kb /= 1024
+
+heavy_modules = [m for m in ["mediapipe", "cv2", "tensorflow", "torch", "spacy"] if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": max_rss_kb / 1024, "heavy_modules": heavy_modules}}))
+"""
+
+
+def measure_import(module: str):
+    # Every measurement runs in a fresh interpreter, so nothing is cached in sys.modules
+    output = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT.format(module=module)],
+                            check=True,
+                            capture_output=True,
+                            text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", type=str, default="spoken_to_signed.bin")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    measure_import(args.module)  # Warm up the OS file cache
+    runs = [measure_import(args.module) for _ in range(args.repeat)]
+
+    seconds = [run["seconds"] for run in runs]
+    max_rss = [run["max_rss_mb"] for run in runs]
+    print(f"import {args.module} ({args.repeat} runs)")
+    print(f"  wall time: median {statistics.median(seconds):.3f}s, min {min(seconds):.3f}s, max {max(seconds):.3f}s")
+    print(f"  peak RSS:  median {statistics.median(max_rss):.1f}MB, max {max(max_rss):.1f}MB")
+    print(f"  heavy modules loaded: {', '.join(runs[-1]['heavy_modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# Compares glossing throughput of text_to_gloss (one call per sentence) and text_to_gloss_batch (nlp.pipe)
+# Usage: python benchmarks/text_to_gloss.py --corpus sentences.txt --language de [--glosser rules] [--batch-size 256]
+# The corpus is a text file with one sentence per line, a few thousand sentences give stable numbers.
+import argparse
+import importlib
+import time
+
+
+def measure(name: str, function, sentences_count: int):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<24} {elapsed:8.2f}s  {sentences_count / elapsed:10.1f} sentences/sec")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", type=str, required=True, help="Text file, one sentence per line")
+    parser.add_argument("--language", type=str, required=True)
+    parser.add_argument("--glosser", choices=["rules", "spacylemma"], default="rules")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip() != ""]
+
+    module = importlib.import_module(f"spoken_to_signed.text_to_gloss.{args.glosser}")
+    module.text_to_gloss(texts[0], args.language)  # Load the spaCy model outside the measurements
+
+    print(f"{args.glosser} glosser, {len(texts)} sentences")
+    single = measure("text_to_gloss", lambda: [module.text_to_gloss(text, args.language) for text in texts],
+                     len(texts))
+    batch = measure(f"text_to_gloss_batch ({args.n_process}p)",
+                    lambda: module.text_to_gloss_batch(
+                        texts, args.language, batch_size=args.batch_size, n_process=args.n_process), len(texts))
+
+    mismatches = sum(1 for a, b in zip(single, batch) if a != b)
+    print(f"  outputs differ for {mismatches} sentences")
+
+
+if __name__ == "__main__":
+    main()
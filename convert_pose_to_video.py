@@ -1,40 +1,74 @@
+# Renders the pose files of a lexicon to videos, e.g. ISL_lexicon/ins/*.pose to ISL_lexicon/Videos/output,
+# across a process pool. Run update_index.py afterwards to add the rows of new videos to index.csv.
+# Usage: python convert_pose_to_video.py --lexicon ISL_lexicon [--mode clean] [--workers 8] [--force]
+#
+# Every `<signed_language>/<name>.pose` is rendered to the video of the same name, case insensitive, listed in
+# index.csv or already in the video directory (e.g. ins/jesus_christ.pose to Videos/output/Jesus_Christ.mp4).
+# New poses get a video named after them, every word capitalized.
+# Videos are skipped when they are newer than their pose, or when the pose content did not change since it was
+# rendered with the same mode (recorded in a manifest next to the videos).
+#
+# Modes:
+# - cleanup: the original look, drawing on white then cleaning up every frame with whole-image OpenCV passes
+# - clean: drawn directly on a black background, without world landmarks (which end up in the top-left corner,
+#   the artifacts the cleanup wipes) or legs, so frames need no cleanup
+import argparse
+import csv
+import functools
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable
+
+import cv2
+import numpy as np
 from pose_format import Pose
 from pose_format.pose_visualizer import PoseVisualizer
-import numpy as np
-import cv2
-from vidgear.gears import WriteGear
 
-# --- Paths ---
-pose_file = "ISL_lexicon/ins/label.pose"
-output_file = "ISL_lexicon/Videos/output/Label.mp4"
+from spoken_to_signed.pose_to_video import open_writer
+
+MODES = ["cleanup", "clean"]
+VIDEO_DIRECTORY = os.path.join("Videos", "output")
+MANIFEST_NAME = ".render_manifest.json"
+# Bump when rendering changes, to render every video again
+RENDER_VERSION = 1
 
-# --- Load Pose ---
-with open(pose_file, "rb") as f:
-    pose = Pose.read(f.read())
+UPWARD_OFFSET = 300  # Pixels
+LEG_CUTOFF = 0.6  # Fraction of the height, for the cleanup mode
+LEG_POINTS = ["LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE", "LEFT_HEEL", "RIGHT_HEEL",
+              "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX"]
 
-# --- Centering and Upward Offset ---
-pose_data = pose.body.data
-confidence = pose.body.confidence
 
-valid_points = confidence > 0.2
-com = np.mean(pose_data[..., :2][valid_points], axis=0)
-center = np.array([pose.header.dimensions.width / 2, pose.header.dimensions.height / 2])
-offset = center - com + np.array([0, -300])  # Move up
+def file_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
 
-pose.body.data[..., 0] += offset[0]
-pose.body.data[..., 1] += offset[1]
 
-# --- Visualization Setup ---
-visualizer = PoseVisualizer(pose)
-visualizer.thickness = 3
-visualizer.connection_color = (255, 255, 255)  # white lines
-visualizer.point_color = (255, 0, 0)           # red points
-visualizer.point_radius = 2
+def center_pose(pose: Pose):
+    # Center the signer, and move it up
+    valid_points = pose.body.confidence > 0.2
+    com = np.mean(pose.body.data[..., :2][valid_points], axis=0)
+    center = np.array([pose.header.dimensions.width / 2, pose.header.dimensions.height / 2])
+    offset = center - com + np.array([0, -UPWARD_OFFSET])
 
-frames = []
+    pose.body.data[..., 0] += offset[0]
+    pose.body.data[..., 1] += offset[1]
 
-# --- Frame Generation ---
-for frame in visualizer.draw():
+
+def create_visualizer(pose: Pose) -> PoseVisualizer:
+    visualizer = PoseVisualizer(pose)
+    visualizer.thickness = 3
+    return visualizer
+
+
+def cleanup_frame(frame: np.ndarray) -> np.ndarray:
     # Remove white background
     frame[np.all(frame == [255, 255, 255], axis=-1)] = 0
 
@@ -51,7 +85,7 @@ for frame in visualizer.draw():
     _, mask = cv2.threshold(frame_gray, 1, 255, cv2.THRESH_BINARY)
 
     # Cut off bottom part (legs)
-    leg_cutoff = int(h * 0.6)
+    leg_cutoff = int(h * LEG_CUTOFF)
     mask[leg_cutoff:, :] = 0
 
     # Remove small stray blobs
@@ -76,21 +110,162 @@ for frame in visualizer.draw():
     kernel = np.ones((3, 3), np.uint8)
     opened_mask = cv2.morphologyEx(enhanced_frame, cv2.MORPH_OPEN, kernel)
     final_mask = opened_mask.any(axis=2).astype(np.uint8)
-    enhanced_frame = cv2.bitwise_and(enhanced_frame, enhanced_frame, mask=final_mask)
-
-    frames.append(enhanced_frame)
-
-# --- Video Writer ---
-output_params = {
-    "-vcodec": "libx264",
-    "-preset": "slow",
-    "-input_framerate": pose.body.fps,
-    "-pix_fmt": "yuv420p",
-    "-crf": "18"
-}
-writer = WriteGear(output=output_file, logging=True, **output_params)
-for f in frames:
-    writer.write(f)
-writer.close()
-
-print(" Video successfully saved to:", output_file)
+    return cv2.bitwise_and(enhanced_frame, enhanced_frame, mask=final_mask)
+
+
+def cleanup_frames(pose: Pose):
+    for frame in create_visualizer(pose).draw():
+        yield cleanup_frame(frame)
+
+
+def clean_frames(pose: Pose):
+    # World landmarks are in meters, so they are drawn around the origin
+    components = [c.name for c in pose.header.components if c.name != "POSE_WORLD_LANDMARKS"]
+    pose = pose.get_components(components)
+
+    # Legs are not drawn
+    leg_indexes = [pose.header._get_point_index("POSE_LANDMARKS", point) for point in LEG_POINTS]
+    pose.body.confidence[:, :, leg_indexes] = 0
+
+    yield from create_visualizer(pose).draw(background_color=(0, 0, 0))
+
+
+def render_video(pose_path: str, video_path: str, mode: str) -> str:
+    with open(pose_path, "rb") as f:
+        pose = Pose.read(f.read())
+    center_pose(pose)
+
+    frames = cleanup_frames(pose) if mode == "cleanup" else clean_frames(pose)
+
+    # yuv420p needs even dimensions, so odd ones lose their last row or column of pixels
+    width = pose.header.dimensions.width // 2 * 2
+    height = pose.header.dimensions.height // 2 * 2
+
+    # Write to a temporary file, so interrupted renders never look up to date
+    directory = os.path.dirname(video_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(video_path)[1])
+    os.close(fd)
+    try:
+        writer = open_writer(tmp_path, width, height, pose.body.fps, crf=18, encoder_preset="slow")
+        try:
+            # Frames are written as they are drawn, rather than collected in memory
+            for frame in frames:
+                writer.write(np.ascontiguousarray(frame[:height, :width]))
+        finally:
+            writer.close()
+        os.replace(tmp_path, video_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return video_path
+
+
+def video_name(pose_name: str) -> str:
+    # e.g. jesus_christ to Jesus_Christ
+    return "_".join(part.capitalize() for part in pose_name.split("_"))
+
+
+def lexicon_entries(lexicon_directory: str):
+    """(pose path, video path) for every pose file of the lexicon"""
+    # Existing videos keep their name, from index.csv or the video directory
+    videos = {}
+    video_directory = os.path.join(lexicon_directory, VIDEO_DIRECTORY)
+    if os.path.isdir(video_directory):
+        for name in sorted(os.listdir(video_directory)):
+            if name.endswith(".mp4"):
+                videos[os.path.splitext(name)[0].lower()] = os.path.join(video_directory, name)
+    index_path = os.path.join(lexicon_directory, "index.csv")
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = os.path.splitext(os.path.basename(row["path"]))[0].lower()
+                videos.setdefault(name, os.path.join(lexicon_directory, row["path"]))
+
+    entries = []
+    for pose_path in sorted(glob.glob(os.path.join(lexicon_directory, "*", "*.pose"))):
+        name = os.path.splitext(os.path.basename(pose_path))[0].lower()
+        video_path = videos.get(name, os.path.join(video_directory, f"{video_name(name)}.mp4"))
+        entries.append((pose_path, video_path))
+    return entries
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def render_key(pose_path: str, mode: str) -> dict:
+    return {"pose_sha1": file_sha1(pose_path), "mode": mode, "version": RENDER_VERSION}
+
+
+def is_up_to_date(pose_path: str, video_path: str, mode: str, manifest: dict, manifest_key: str) -> bool:
+    if not os.path.exists(video_path):
+        return False
+    recorded = manifest.get(manifest_key)
+    # Videos rendered before the manifest existed are trusted, use --force to render them again
+    settings_match = recorded is None or (recorded["mode"] == mode and recorded["version"] == RENDER_VERSION)
+    # Modification times are enough, unless the pose was touched without changing
+    if settings_match and os.path.getmtime(video_path) >= os.path.getmtime(pose_path):
+        return True
+    return recorded == render_key(pose_path, mode)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lexicon", type=str, default="ISL_lexicon", help="Lexicon directory, with index.csv")
+    parser.add_argument("--mode", choices=MODES, default="clean")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Rendering processes, 0 to disable")
+    parser.add_argument("--force", action="store_true", help="Render videos even if they are up to date")
+    args = parser.parse_args()
+
+    manifest_path = os.path.join(args.lexicon, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    pending = []
+    entries = lexicon_entries(args.lexicon)
+    for pose_path, video_path in entries:
+        manifest_key = os.path.relpath(video_path, args.lexicon)
+        if args.force or not is_up_to_date(pose_path, video_path, args.mode, manifest, manifest_key):
+            pending.append((pose_path, video_path, manifest_key))
+    print(f"{len(pending)} of {len(entries)} videos to render")
+
+    failed = 0
+
+    def finish(pose_path: str, manifest_key: str, result: Callable[[], str]):
+        # Failures are reported and counted, the other videos are still rendered
+        nonlocal failed
+        try:
+            print("Rendered", result())
+        except Exception as e:  # pylint: disable=broad-except
+            failed += 1
+            print(f"Failed to render {pose_path}: {e}", file=sys.stderr)
+            return
+        manifest[manifest_key] = render_key(pose_path, args.mode)
+        save_manifest(manifest_path, manifest)
+
+    if args.workers == 0:
+        for pose_path, video_path, manifest_key in pending:
+            finish(pose_path, manifest_key, functools.partial(render_video, pose_path, video_path, args.mode))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(render_video, pose_path, video_path, args.mode): (pose_path, manifest_key)
+                       for pose_path, video_path, manifest_key in pending}
+            for future in as_completed(futures):
+                pose_path, manifest_key = futures[future]
+                finish(pose_path, manifest_key, future.result)
+
+    print(f"Done, {len(pending) - failed} rendered, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Sentence correction for /api/correct. Detected sentences are built frame by frame, so runs of the same word or
+# phrase are collapsed locally first. The (slow) language model backend corrects the cleaned sentence, and its answers
+# are cached in memory and on disk, keyed by the cleaned sentence.
+
+logger = logging.getLogger(__name__)
+
+PROMPT = ("Remove all repeated words or phrases from this sentence, keeping only the first occurrence of each, "
+          "and correct the sentence: {sentence}")
+
+
+def remove_repetitions(sentence):
+    """Collapse runs of the same word or phrase (case insensitive), as detected frame by frame, into one"""
+    words = []
+    for word in sentence.split():
+        words.append(word)
+        lower = [w.lower() for w in words]
+        # Drop the phrase just added if it repeats the phrase right before it
+        for n in range(1, len(words) // 2 + 1):
+            if lower[-n:] == lower[-2 * n:-n]:
+                del words[-n:]
+                break
+    return " ".join(words)
+
+
+def normalize_sentence(sentence):
+    # Cache key: the same words, regardless of case, spacing and trailing punctuation
+    return re.sub(r"[.!?]+$", "", remove_repetitions(sentence).lower()).strip()
+
+
+def capitalize(sentence):
+    return sentence[:1].upper() + sentence[1:]
+
+
+class OpenAIBackend:
+    def __init__(self, model="gpt-3.5-turbo", max_tokens=100):
+        self.model = model
+        self.max_tokens = max_tokens
+
+    @property
+    def transient_errors(self):
+        # Errors answered with the local cleanup. Others (e.g. authentication or configuration) are raised
+        try:
+            from openai import error
+        except ImportError:
+            return TimeoutError, ConnectionError
+        return (TimeoutError, ConnectionError, error.Timeout, error.APIConnectionError,
+                error.ServiceUnavailableError)
+
+    def __call__(self, sentence, timeout):
+        import openai
+
+        openai.api_key = os.environ.get('OPENAI_API_KEY')
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[{"role": "user", "content": PROMPT.format(sentence=sentence)}],
+            max_tokens=self.max_tokens,
+            request_timeout=timeout,
+        )
+        return response['choices'][0]['message']['content'].strip()
+
+
+class StubBackend:
+    """Answers without a network call, for tests and local development"""
+
+    transient_errors = (TimeoutError, ConnectionError)
+
+    def __call__(self, sentence, timeout):
+        return capitalize(sentence)
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+
+class CorrectionCache:
+    """LRU cache of corrections in memory, backed by one JSON file per sentence on disk (optional)"""
+
+    def __init__(self, directory=None, max_entries=10000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                corrected = json.load(f)["corrected"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        self._set_memory(key, corrected)
+        return corrected
+
+    def set(self, key, corrected):
+        if self.directory is not None:
+            # Write atomically, as multiple workers may share the directory
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"sentence": key, "corrected": corrected}, f)
+            os.replace(tmp_path, self._path(key))
+        self._set_memory(key, corrected)
+
+    def _set_memory(self, key, corrected):
+        with self.lock:
+            self.memory[key] = corrected
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+
+class SentenceCorrector:
+    def __init__(self, backend, cache=None, local_max_words=0, timeout=10.0):
+        self.backend = backend
+        self.cache = cache if cache is not None else CorrectionCache()
+        self.local_max_words = local_max_words
+        self.timeout = timeout
+        self.counts = {"local": 0, "cached": 0, "backend": 0, "failed": 0}
+        # Requests are handled on multiple threads
+        self.lock = threading.Lock()
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def correct(self, sentence):
+        cleaned = remove_repetitions(sentence)
+
+        # Optionally, short sentences are only cleaned up, without grammar correction (off by default)
+        if len(cleaned.split()) <= self.local_max_words:
+            self._count("local")
+            return capitalize(cleaned)
+
+        key = normalize_sentence(cleaned)
+        corrected = self.cache.get(key)
+        if corrected is not None:
+            self._count("cached")
+            return corrected
+
+        try:
+            corrected = self.backend(cleaned, timeout=self.timeout)
+        except self.backend.transient_errors:
+            # Timeouts and network errors fall back to the local cleanup, which is not cached
+            logger.warning("Sentence correction failed, answering with the local cleanup", exc_info=True)
+            self._count("failed")
+            return capitalize(cleaned)
+
+        self._count("backend")
+        self.cache.set(key, corrected)
+        return corrected
+
+
+def create_corrector():
+    backend = BACKENDS[os.environ.get("CORRECT_BACKEND", "openai")]()
+    cache = CorrectionCache(directory=os.environ.get("CORRECT_CACHE_DIR"),
+                            max_entries=int(os.environ.get("CORRECT_CACHE_ENTRIES", 10000)))
+    return SentenceCorrector(backend, cache,
+                             local_max_words=int(os.environ.get("CORRECT_LOCAL_MAX_WORDS", 0)),
+                             timeout=float(os.environ.get("CORRECT_TIMEOUT", 10)))
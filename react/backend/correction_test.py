@@ -0,0 +1,71 @@
+import pytest
+
+from correction import CorrectionCache, SentenceCorrector, StubBackend, normalize_sentence, remove_repetitions
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, sentence, timeout):
+        self.calls += 1
+        return super().__call__(sentence, timeout)
+
+
+class TimeoutBackend(StubBackend):
+    def __call__(self, sentence, timeout):
+        raise TimeoutError(f"No answer after {timeout}s")
+
+
+class UnauthorizedBackend(StubBackend):
+    def __call__(self, sentence, timeout):
+        raise PermissionError("Invalid API key")
+
+
+def test_remove_repetitions_collapses_consecutive_runs():
+    assert remove_repetitions("hello hello Hello world") == "hello world"
+    assert remove_repetitions("thank you thank you very much") == "thank you very much"
+    # Words repeated apart from each other are kept
+    assert remove_repetitions("I want to go to the store") == "I want to go to the store"
+    assert normalize_sentence("I want to go to the store.") != normalize_sentence("I want to go the store")
+
+
+def test_short_sentences_are_corrected_by_the_backend_by_default():
+    backend = CountingBackend()
+    corrector = SentenceCorrector(backend)
+    assert corrector.correct("me go store") == "Me go store"
+    assert backend.calls == 1
+
+    corrector = SentenceCorrector(backend, local_max_words=3)
+    assert corrector.correct("hello hello world world") == "Hello world"
+    assert backend.calls == 1
+    assert corrector.stats()["local"] == 1
+
+
+def test_backend_answers_are_cached(tmp_path):
+    backend = CountingBackend()
+    corrector = SentenceCorrector(backend, CorrectionCache(directory=str(tmp_path)))
+    assert corrector.correct("i want want to eat") == "I want to eat"
+    assert corrector.correct("I want to eat.") == "I want to eat"
+    assert backend.calls == 1
+    assert corrector.stats() == {"local": 0, "cached": 1, "backend": 1, "failed": 0}
+
+    # The disk cache is shared with new correctors
+    corrector = SentenceCorrector(backend, CorrectionCache(directory=str(tmp_path)))
+    assert corrector.correct("i want to eat") == "I want to eat"
+    assert backend.calls == 1
+
+
+def test_backend_timeout_falls_back_to_local_cleanup(caplog):
+    corrector = SentenceCorrector(TimeoutBackend(), timeout=0.1)
+    assert corrector.correct("i want want to eat") == "I want to eat"
+    assert corrector.correct("i want want to eat") == "I want to eat"
+    # Failures are logged and not cached
+    assert corrector.stats() == {"local": 0, "cached": 0, "backend": 0, "failed": 2}
+    assert "No answer after 0.1s" in caplog.text
+
+
+def test_backend_errors_other_than_timeouts_are_raised():
+    corrector = SentenceCorrector(UnauthorizedBackend())
+    with pytest.raises(PermissionError):
+        corrector.correct("i want to eat")
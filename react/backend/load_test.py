@@ -0,0 +1,103 @@
+# Drives N simulated clients against a running server, each sending recorded frames in a loop with its own session,
+# and reports request latency percentiles and throughput.
+# Usage: python load_test.py --frames recorded_frames/ [--clients 8] [--requests 50] [--endpoint binary]
+# Frames are image files (e.g. JPEG webcam captures), sent in name order, like consecutive frames of a video.
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+
+ENDPOINTS = {
+    "json": "/api/detect",
+    "binary": "/api/detect/binary",
+}
+
+
+def load_frames(directory):
+    names = sorted(name for name in os.listdir(directory)
+                   if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")))
+    if len(names) == 0:
+        raise FileNotFoundError(f"No frames found in {directory}")
+    frames = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def frame_request(url, endpoint, frame, session):
+    headers = {"X-Session-Id": session}
+    if endpoint == "json":
+        mime_type = "image/png" if frame.startswith(b"\x89PNG") else "image/jpeg"
+        image = f"data:{mime_type};base64,{base64.b64encode(frame).decode('ascii')}"
+        body = json.dumps({"image": image}).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    else:
+        body = frame
+        headers["Content-Type"] = "application/octet-stream"
+    return urllib.request.Request(url + ENDPOINTS[endpoint], data=body, headers=headers, method="POST")
+
+
+def run_client(args, frames, latencies, errors):
+    session = str(uuid.uuid4())
+    for i in range(args.requests):
+        request = frame_request(args.url, args.endpoint, frames[i % len(frames)], session)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=args.timeout) as response:
+                result = json.loads(response.read())
+            if "error" in result:
+                errors.append(result["error"])
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+        if args.fps > 0:
+            # Webcam clients send frames at a fixed rate
+            time.sleep(max(0.0, 1 / args.fps - (time.perf_counter() - start)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=str, required=True, help="Directory of recorded frames")
+    parser.add_argument("--url", type=str, default="http://localhost:5000")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+    parser.add_argument("--endpoint", type=str, choices=list(ENDPOINTS.keys()), default="binary")
+    parser.add_argument("--fps", type=float, default=0, help="Frames per second per client, 0 for back to back")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    latencies, errors = [], []
+    clients = [threading.Thread(target=run_client, args=(args, frames, latencies, errors))
+               for _ in range(args.clients)]
+
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.clients} clients x {args.requests} requests to {ENDPOINTS[args.endpoint]}, "
+          f"{len(frames)} recorded frames")
+    if len(latencies) > 0:
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"  latency      p50 {p50:.1f}ms, p99 {p99:.1f}ms, max {max(latencies) * 1000:.1f}ms")
+        print(f"  throughput   {len(latencies) / elapsed:.1f} frames/sec")
+    print(f"  errors       {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+
+    with urllib.request.urlopen(args.url + "/api/hands/stats", timeout=args.timeout) as response:
+        print(f"  hands pool   {json.loads(response.read())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 import base64
 import io
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from PIL import Image
 import numpy as np
 import joblib
-import cv2
 import mediapipe as mp
 import os
-import openai
+
+from correction import create_corrector
 
 app = Flask(__name__)
 CORS(app)
@@ -24,8 +28,142 @@ if not os.path.exists(scaler_path):
 model = joblib.load(model_path)
 scaler = joblib.load(scaler_path)
 
+# Sentence correction, see correction.py for the configuration
+corrector = create_corrector()
+
+
+def create_hands():
+    return mp.solutions.hands.Hands(min_detection_confidence=0.7, min_tracking_confidence=0.7)
+
+
+class HandsTracker:
+    def __init__(self):
+        self.hands = None
+        self.busy = True
+        self.last_used = time.monotonic()
+
+
+class HandsPool:
+    """
+    MediaPipe Hands instances per client session, as tracking mode keeps state between the frames of a session.
+    Frames of the same session are processed in order, at most `max_workers` frames are processed at once,
+    and trackers idle for more than `idle_seconds` (or least recently used, beyond `max_sessions`) are closed.
+    """
+
+    def __init__(self, factory, max_sessions=32, max_workers=4, idle_seconds=60.0):
+        # A waiting frame holds a worker, so there is always a tracker to evict when every worker is busy
+        self.max_sessions = max(max_sessions, max_workers)
+        self.idle_seconds = idle_seconds
+        self.factory = factory
+        self.trackers = OrderedDict()  # session -> HandsTracker, least recently used first
+        self.condition = threading.Condition()
+        self.workers = threading.BoundedSemaphore(max_workers)
+        self.created = 0
+        self.evicted = 0
+
+    @contextmanager
+    def acquire(self, session):
+        with self.workers:
+            tracker = self._checkout(session)
+            try:
+                if tracker.hands is None:
+                    # Created outside of the lock, as building the graph is slow
+                    tracker.hands = self.factory()
+                yield tracker.hands
+            finally:
+                self._checkin(session, tracker)
+
+    def _checkout(self, session):
+        with self.condition:
+            while True:
+                self._evict_idle()
+                tracker = self.trackers.get(session)
+                if tracker is None and (len(self.trackers) < self.max_sessions or self._evict_least_recently_used()):
+                    tracker = HandsTracker()
+                    self.trackers[session] = tracker
+                    self.created += 1
+                    return tracker
+                if tracker is not None and not tracker.busy:
+                    tracker.busy = True
+                    self.trackers.move_to_end(session)
+                    return tracker
+                self.condition.wait()
+
+    def _checkin(self, session, tracker):
+        with self.condition:
+            tracker.busy = False
+            tracker.last_used = time.monotonic()
+            if tracker.hands is None and self.trackers.get(session) is tracker:
+                # The tracker could not be created
+                del self.trackers[session]
+            self.condition.notify_all()
+
+    def _evict(self, session):
+        tracker = self.trackers.pop(session)
+        if tracker.hands is not None:
+            tracker.hands.close()
+        self.evicted += 1
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for session in [s for s, t in self.trackers.items() if not t.busy and now - t.last_used > self.idle_seconds]:
+            self._evict(session)
+
+    def _evict_least_recently_used(self):
+        for session, tracker in self.trackers.items():
+            if not tracker.busy:
+                self._evict(session)
+                return True
+        return False
+
+    def stats(self):
+        with self.condition:
+            return {
+                "sessions": len(self.trackers),
+                "busy": sum(t.busy for t in self.trackers.values()),
+                "created": self.created,
+                "evicted": self.evicted,
+            }
+
+
 # Initialize MediaPipe
-mp_hands = mp.solutions.hands.Hands(min_detection_confidence=0.7, min_tracking_confidence=0.7)
+hands_pool = HandsPool(create_hands,
+                       max_sessions=int(os.environ.get("HANDS_MAX_SESSIONS", 32)),
+                       max_workers=int(os.environ.get("HANDS_WORKERS", os.cpu_count() or 1)),
+                       idle_seconds=float(os.environ.get("HANDS_IDLE_SECONDS", 60)))
+
+
+def session_id():
+    # Clients can identify their session explicitly, to share an address (e.g. behind a proxy)
+    return request.headers.get("X-Session-Id") or request.remote_addr
+
+
+# Number of values in a hand vector: 21 MediaPipe Hands landmarks, as (x, y, z)
+HAND_VECTOR_SIZE = 63
+
+
+def predict_landmarks(landmarks):
+    scaled = scaler.transform([landmarks])
+    return model.predict(scaled)[0]
+
+
+def detect_rgb(rgb_image):
+    # MediaPipe expects RGB images, as decoded by PIL
+    with hands_pool.acquire(session_id()) as hands:
+        result = hands.process(rgb_image)
+
+    if result.multi_hand_landmarks:
+        for hand_landmarks in result.multi_hand_landmarks:
+            landmarks = [coord for lm in hand_landmarks.landmark for coord in (lm.x, lm.y, lm.z)]
+
+            if len(landmarks) == HAND_VECTOR_SIZE:
+                return jsonify({ "detectedText": predict_landmarks(landmarks) })
+
+    return jsonify({ "detectedText": "No hand detected" })
+
+
+def decode_image(content):
+    return np.asarray(Image.open(io.BytesIO(content)).convert("RGB"))
 
 
 @app.route("/api/detect", methods=["POST"])
@@ -33,43 +171,62 @@ def detect():
     try:
         data = request.json
         img_data = data['image'].split(',')[1]  # Remove header like "data:image/jpeg;base64,..."
-        img = Image.open(io.BytesIO(base64.b64decode(img_data)))
-        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+        return detect_rgb(decode_image(base64.b64decode(img_data)))
 
-        result = mp_hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    except Exception as e:
+        return jsonify({ "error": str(e) })
 
-        if result.multi_hand_landmarks:
-            for hand_landmarks in result.multi_hand_landmarks:
-                landmarks = [coord for lm in hand_landmarks.landmark for coord in (lm.x, lm.y, lm.z)]
 
-                if len(landmarks) == 63:
-                    scaled = scaler.transform([landmarks])
-                    prediction = model.predict(scaled)[0]
-                    return jsonify({ "detectedText": prediction })
+@app.route("/api/detect/binary", methods=["POST"])
+def detect_binary():
+    # The request body is the encoded image itself (e.g. a JPEG blob from canvas.toBlob), without base64
+    try:
+        content = request.get_data()
+        if not content:
+            return jsonify({ "error": "Empty image" })
+        return detect_rgb(decode_image(content))
 
-        return jsonify({ "detectedText": "No hand detected" })
+    except Exception as e:
+        return jsonify({ "error": str(e) })
+
+
+@app.route("/api/detect/landmarks", methods=["POST"])
+def detect_landmarks():
+    # Hand landmarks computed by the client (e.g. MediaPipe Hands in the browser), in the same order as detect_rgb:
+    # {"landmarks": [x0, y0, z0, x1, y1, z1, ...]}, or null when no hand was detected
+    try:
+        landmarks = request.json.get('landmarks')
+        if landmarks is None:
+            return jsonify({ "detectedText": "No hand detected" })
+
+        landmarks = np.asarray(landmarks, dtype=np.float64)
+        if landmarks.shape != (HAND_VECTOR_SIZE,) or not np.isfinite(landmarks).all():
+            return jsonify({ "error": f"Expected {HAND_VECTOR_SIZE} finite landmark values" })
+        return jsonify({ "detectedText": predict_landmarks(landmarks) })
 
     except Exception as e:
         return jsonify({ "error": str(e) })
 
 
+@app.route("/api/hands/stats", methods=["GET"])
+def hands_stats():
+    return jsonify(hands_pool.stats())
+
+
 @app.route("/api/correct", methods=["POST"])
 def correct():
     try:
         data = request.json
         sentence = data['sentence']
-        prompt = f"Remove all repeated words or phrases from this sentence, keeping only the first occurrence of each, and correct the sentence: {sentence}"
-        openai.api_key = os.environ.get('OPENAI_API_KEY')
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=100
-        )
-        corrected = response['choices'][0]['message']['content'].strip()
-        return jsonify({'corrected': corrected})
+        return jsonify({'corrected': corrector.correct(sentence)})
     except Exception as e:
         return jsonify({'error': str(e)})
 
 
+@app.route("/api/correct/stats", methods=["GET"])
+def correct_stats():
+    return jsonify(corrector.stats())
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=False)
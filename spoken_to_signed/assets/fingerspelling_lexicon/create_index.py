@@ -1,23 +1,33 @@
 # load data.csv and save the same as index.csv
+# index.csv is only written again when data.csv or a pose file changed since the last run, see index.manifest.json
 
 import csv
+import os
 
 from pathlib import Path
 
+from spoken_to_signed.gloss_to_pose.lookup.compiled_index import file_sha1
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import update_index
+
 with Path('data.csv').open('r') as data_file:
     rows = list(csv.DictReader(data_file))
 
-# Here we modify rows to, for example, mirror some of the data for other languages
-for row in rows:
-    if row['spoken_language'] == 'en':
-        # Duplicate all ASL for french and swiss-french
-        for spoken_language, signed_language in [('fr', 'fsl')]:
-            new_row = row.copy()
-            new_row['spoken_language'] = spoken_language
-            new_row['signed_language'] = signed_language
-            rows.append(new_row)
-
-with Path('index.csv').open('w', newline='') as index_file:
-    writer = csv.DictWriter(index_file, fieldnames=rows[0].keys())
-    writer.writeheader()
-    writer.writerows(rows)
\ No newline at end of file
+
+def create_rows():
+    # Here we modify rows to, for example, mirror some of the data for other languages
+    for row in rows:
+        if row['spoken_language'] == 'en':
+            # Duplicate all ASL for french and swiss-french
+            for spoken_language, signed_language in [('fr', 'fsl')]:
+                new_row = row.copy()
+                new_row['spoken_language'] = spoken_language
+                new_row['signed_language'] = signed_language
+                rows.append(new_row)
+    return rows
+
+
+# Only the language directories are scanned for changes, not e.g. the raw downloads
+language_directories = sorted({os.path.dirname(row['path']) for row in rows})
+summary = update_index('.', language_directories, ('.pose',), create_rows, list(rows[0].keys()),
+                       sources={'data.csv': file_sha1('data.csv')}, lineterminator='\r\n')
+print(summary)
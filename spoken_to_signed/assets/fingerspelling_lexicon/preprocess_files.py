@@ -1,50 +1,85 @@
 # The files are upwards of 500MB. To make them a part of the installable, I would like them to be less
-# Therefore, this file reduces holistic (performs pre-proecssing) as well as runs trim_pose ahead of time
+# Therefore, this file preprocesses the downloaded (raw) poses ahead of time, into a separate output directory:
+# trim, normalize, remove appearance, remove the left hand for some languages, and speed up long or high fps poses.
+# Usage: python preprocess_files.py --input raw --output . [--workers 8] [--force]
+#
+# Outputs only depend on the raw inputs, so running this again gives the same files. A manifest in the output
+# directory records every input (size, modification time and hash) with the settings it was processed with, so
+# re-runs only process new or changed inputs (and the languages whose average duration they change).
+import argparse
+import json
+import os
+import tempfile
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-from pose_anonymization.appearance import remove_appearance
 from pose_format import Pose
-from pose_format.utils.generic import reduce_holistic, get_body_hand_wrist_index, get_hand_wrist_index
+from pose_format.utils.generic import get_body_hand_wrist_index, get_hand_wrist_index, normalize_pose_size
 from tqdm import tqdm
 
-from spoken_to_signed.gloss_to_pose.concatenate import trim_pose, normalize_pose, scale_normalized_pose
+from spoken_to_signed.gloss_to_pose.concatenate import get_pose_boundary, normalize_pose, trim_pose
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import file_info, write_atomic
 
 ONLY_RIGHT_HAND = {"ase", "sgg", "gsg"}
+# Size of the normalized poses, as in the previously processed lexicon
+TARGET_WIDTH = 500
 
-durations = defaultdict(list)
+MANIFEST_NAME = "preprocess.manifest.json"
+REPORT_NAME = "preprocess.report.json"
+# Bump when the processing changes, to process every file again
+PREPROCESS_VERSION = 1
 
-print("MAKE SURE THIS SCRIPT ONLY RUNS ONCE")
 
-for file in tqdm(Path.cwd().rglob('*.pose')):
-    # read the files (597M)
-    with open(file, "rb") as f:
-        pose = Pose.read(f.read())
+def read_pose(path: str) -> Pose:
+    with open(path, "rb") as f:
+        return Pose.read(f.read())
 
-    # trim pose (35% saving)
-    pose = trim_pose(pose)
 
-    # log duration
-    durations[file.parent.name].append(len(pose.body.data) / pose.body.fps)
+def trimmed_duration(path: str) -> float:
+    pose = read_pose(path)
+    first_frame, last_frame = get_pose_boundary(pose)
+    return (last_frame - first_frame) / pose.body.fps
+
+
+def interpolation_fps(fps: float, average_duration: float) -> Optional[Tuple[int, float]]:
+    """The fps to interpolate a pose to, and the fps it is then played at. None if it is kept as is."""
+    interpolate = False
+    original_fps = fps
+    target_fps = fps
+
+    if average_duration > 1.1:
+        # Practically, changes the speed of the video so that the average is 1~ second
+        target_fps /= average_duration
+        interpolate = True
+
+    if original_fps > 30:
+        target_fps /= 2
+        original_fps /= 2
+        interpolate = True
+
+    return (round(target_fps), original_fps) if interpolate else None
+
 
-    # Run this transformation only once! floating point instability can change the numbers slightly
-    # if pose.body.data.shape[2] != 576:
-    #     continue
+def process_file(input_path: str, output_path: str, language: str, average_duration: float) -> int:
+    """Process one raw pose into the output path, and return the size of the output"""
+    from pose_anonymization.appearance import remove_appearance
 
-    original_pose = pose
+    pose = read_pose(input_path)
 
-    # # reduce holistic (70% saving)
-    # pose = reduce_holistic(pose)
+    # trim pose (35% saving)
+    pose = trim_pose(pose)
 
     # normalize, just for good measure
     pose = normalize_pose(pose)
-    scale_normalized_pose(pose)
+    normalize_pose_size(pose, target_width=TARGET_WIDTH)
 
     # remove appearance to be consistent if the person changes
     pose = remove_appearance(pose)
 
     # Pose estimation is not perfect, so if we don't need the left hand (For selected languages), we can remove it
-    if file.parent.name in ONLY_RIGHT_HAND:
+    if language in ONLY_RIGHT_HAND:
         # Remove hand
         left_hand_index = get_hand_wrist_index(pose, "left")
         pose.body.data[:, :, left_hand_index:left_hand_index + 21] = 0
@@ -55,44 +90,159 @@ for file in tqdm(Path.cwd().rglob('*.pose')):
         pose.body.data[:, :, left_wrist_index] = 0
         pose.body.confidence[:, :, left_wrist_index] = 0
 
-    # write the file
-    with open(file, "wb") as f:
-        pose.write(f)
-
-duration_averages = {k: sum(v) / len(v) for k, v in durations.items()}
-for language, duration in duration_averages.items():
-    print(language, duration)
-
-# Heuristically speed up the videos if needed (16MB)
-for file in tqdm(Path.cwd().rglob('*.pose')):
-    with open(file, "rb") as f:
-        pose = Pose.read(f.read())
-
-    interpolate = False
-
-    original_fps = pose.body.fps
-    interpolation_fps = pose.body.fps
-
-    if duration_averages[file.parent.name] > 1.1:
-        # Practically, changes the speed of the video so that the average is 1~ second
-        speed_factor = duration_averages[file.parent.name]
-        interpolation_fps /= speed_factor
-        interpolate = True
-
-    if original_fps > 30:
-        interpolation_fps /= 2
-        original_fps /= 2
-        interpolate = True
-
-    interpolation_fps = round(interpolation_fps)
-
-    if interpolate:
-        # We want to avoid multiple interpolates, so we only interpolate once if needed
-        print("Interpolating", file, interpolation_fps)
-
-        # print("Before:", {"fps": pose.body.fps, "duration": len(pose.body.data) / pose.body.fps})
-        pose = pose.interpolate(interpolation_fps)
-        pose.body.fps = original_fps
-        # print("After:", {"fps": pose.body.fps, "duration": len(pose.body.data) / pose.body.fps})
-        with open(file, "wb") as f:
+    # Heuristically speed up the videos if needed (16MB)
+    interpolation = interpolation_fps(pose.body.fps, average_duration)
+    if interpolation is not None:
+        # A single interpolation, from the raw pose
+        target_fps, output_fps = interpolation
+        pose = pose.interpolate(target_fps)
+        pose.body.fps = output_fps
+
+    # Write to a temporary file, so interrupted runs never leave partial outputs
+    directory = os.path.dirname(output_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".pose")
+    try:
+        with os.fdopen(fd, "wb") as f:
             pose.write(f)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return os.path.getsize(output_path)
+
+
+def load_manifest(output_directory: str) -> dict:
+    path = os.path.join(output_directory, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == PREPROCESS_VERSION:
+            return manifest
+    return {"version": PREPROCESS_VERSION, "files": {}}
+
+
+def find_inputs(input_directory: str) -> List[str]:
+    # Relative paths, <language>/<name>.pose
+    return sorted(path.relative_to(input_directory).as_posix() for path in Path(input_directory).rglob("*.pose"))
+
+
+def language_averages(entries: Dict[str, dict]) -> Dict[str, float]:
+    # Summed in path order, so the averages (and outputs) do not depend on the order files were processed in
+    durations = defaultdict(list)
+    for path in sorted(entries.keys()):
+        durations[entries[path]["language"]].append(entries[path]["duration"])
+    return {language: sum(values) / len(values) for language, values in durations.items()}
+
+
+def stats_report(entries: Dict[str, dict], averages: Dict[str, float]) -> dict:
+    languages = {}
+    for entry in entries.values():
+        stats = languages.setdefault(entry["language"], {"files": 0, "input_bytes": 0, "output_bytes": 0})
+        stats["files"] += 1
+        stats["input_bytes"] += entry["input"]["size"]
+        stats["output_bytes"] += entry["output_size"]
+    for language, stats in languages.items():
+        stats["average_duration"] = averages[language]
+        stats["saved_bytes"] = stats["input_bytes"] - stats["output_bytes"]
+
+    total = {key: sum(stats[key] for stats in languages.values())
+             for key in ["files", "input_bytes", "output_bytes", "saved_bytes"]}
+    return {"languages": dict(sorted(languages.items())), "total": total}
+
+
+def print_report(report: dict):
+    print(f"{'language':<10}{'files':>7}{'avg duration':>14}{'input MB':>10}{'output MB':>11}{'saved':>8}")
+    rows = list(report["languages"].items()) + [("total", report["total"])]
+    for language, stats in rows:
+        duration = f"{stats['average_duration']:.2f}s" if "average_duration" in stats else ""
+        saved = stats["saved_bytes"] / stats["input_bytes"] if stats["input_bytes"] > 0 else 0
+        print(f"{language:<10}{stats['files']:>7}{duration:>14}{stats['input_bytes'] / 1e6:>10.1f}"
+              f"{stats['output_bytes'] / 1e6:>11.1f}{saved:>8.0%}")
+
+
+def preprocess_files(input_directory: str, output_directory: str, workers: Optional[int] = None,
+                     force: bool = False) -> dict:
+    if os.path.abspath(input_directory) == os.path.abspath(output_directory):
+        raise ValueError("The output directory must be different from the input directory")
+
+    manifest = {"version": PREPROCESS_VERSION, "files": {}} if force else load_manifest(output_directory)
+    previous = manifest["files"]
+
+    entries = {}
+    for path in find_inputs(input_directory):
+        info = file_info(os.path.join(input_directory, path), previous.get(path, {}).get("input"))
+        entry = {"language": path.split("/")[0], "input": info}
+        if path in previous and previous[path]["input"]["sha1"] == info["sha1"]:
+            entry["duration"] = previous[path]["duration"]
+        entries[path] = entry
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Durations of new inputs, after trimming, to average per language
+        measure = [path for path, entry in entries.items() if "duration" not in entry]
+        input_paths = [os.path.join(input_directory, path) for path in measure]
+        for path, duration in zip(measure, tqdm(executor.map(trimmed_duration, input_paths, chunksize=8),
+                                                total=len(measure), desc="Measuring")):
+            entries[path]["duration"] = duration
+
+        averages = language_averages(entries)
+        for path, entry in entries.items():
+            entry["settings"] = {"average_duration": averages[entry["language"]],
+                                 "only_right_hand": entry["language"] in ONLY_RIGHT_HAND}
+
+        def is_up_to_date(path: str) -> bool:
+            output_path = os.path.join(output_directory, path)
+            return (path in previous
+                    and previous[path]["input"]["sha1"] == entries[path]["input"]["sha1"]
+                    and previous[path]["settings"] == entries[path]["settings"]
+                    and os.path.exists(output_path)
+                    and os.path.getsize(output_path) == previous[path]["output_size"])
+
+        for path in entries:
+            if is_up_to_date(path):
+                entries[path]["output_size"] = previous[path]["output_size"]
+        process = [path for path in entries if "output_size" not in entries[path]]
+
+        futures = {path: executor.submit(process_file, os.path.join(input_directory, path),
+                                         os.path.join(output_directory, path), entries[path]["language"],
+                                         averages[entries[path]["language"]])
+                   for path in process}
+        for path, future in tqdm(futures.items(), desc="Processing"):
+            entries[path]["output_size"] = future.result()
+
+    # Outputs of inputs that were removed
+    for path in previous.keys() - entries.keys():
+        output_path = os.path.join(output_directory, path)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    os.makedirs(output_directory, exist_ok=True)
+    manifest = {"version": PREPROCESS_VERSION, "files": entries}
+    write_atomic(os.path.join(output_directory, MANIFEST_NAME),
+                 lambda f: json.dump(manifest, f, indent=1, sort_keys=True))
+
+    report = stats_report(entries, averages)
+    report["run"] = {"processed": len(process), "skipped": len(entries) - len(process),
+                     "removed": len(previous.keys() - entries.keys())}
+    write_atomic(os.path.join(output_directory, REPORT_NAME),
+                 lambda f: json.dump(report, f, indent=1, sort_keys=True))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, required=True, help="Directory of the downloaded poses")
+    parser.add_argument("--output", type=str, default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Directory of the processed poses (default: the fingerspelling lexicon)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Process every file, even if it is up to date")
+    args = parser.parse_args()
+
+    report = preprocess_files(args.input, args.output, workers=args.workers, force=args.force)
+    print_report(report)
+    print(f"Processed {report['run']['processed']} files, {report['run']['skipped']} were up to date, "
+          f"removed {report['run']['removed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("pose_anonymization")
+
+from spoken_to_signed.assets.fingerspelling_lexicon.preprocess_files import preprocess_files  # noqa: E402
+
+LEXICON_DIRECTORY = os.path.dirname(__file__)
+
+
+def copy_inputs(input_directory, count=2):
+    for language in ["ase", "bzs"]:
+        os.makedirs(input_directory / language)
+        for name in sorted(os.listdir(os.path.join(LEXICON_DIRECTORY, language)))[:count]:
+            shutil.copy(os.path.join(LEXICON_DIRECTORY, language, name), input_directory / language / name)
+
+
+def read_outputs(output_directory):
+    outputs = {}
+    for language in ["ase", "bzs"]:
+        for name in os.listdir(output_directory / language):
+            with open(output_directory / language / name, "rb") as f:
+                outputs[f"{language}/{name}"] = f.read()
+    return outputs
+
+
+def test_preprocess_files_is_idempotent(tmp_path):
+    input_directory, output_directory = tmp_path / "raw", tmp_path / "processed"
+    copy_inputs(input_directory)
+
+    report = preprocess_files(str(input_directory), str(output_directory), workers=2)
+    assert report["run"] == {"processed": 4, "skipped": 0, "removed": 0}
+    assert report["total"]["files"] == 4
+    outputs = read_outputs(output_directory)
+
+    report = preprocess_files(str(input_directory), str(output_directory), workers=2)
+    assert report["run"] == {"processed": 0, "skipped": 4, "removed": 0}
+
+    # Processing again from scratch gives the same files
+    report = preprocess_files(str(input_directory), str(output_directory), workers=2, force=True)
+    assert report["run"]["processed"] == 4
+    assert read_outputs(output_directory) == outputs
+
+
+def test_preprocess_files_updates_changed_languages(tmp_path):
+    input_directory, output_directory = tmp_path / "raw", tmp_path / "processed"
+    copy_inputs(input_directory)
+    preprocess_files(str(input_directory), str(output_directory))
+
+    # Inputs were added and removed since the last run
+    ase_name = sorted(os.listdir(os.path.join(LEXICON_DIRECTORY, "ase")))[2]
+    shutil.copy(os.path.join(LEXICON_DIRECTORY, "ase", ase_name), input_directory / "ase" / ase_name)
+    removed = sorted(os.listdir(input_directory / "bzs"))[0]
+    os.remove(input_directory / "bzs" / removed)
+
+    report = preprocess_files(str(input_directory), str(output_directory))
+    assert report["run"]["removed"] == 1
+    assert not os.path.exists(output_directory / "bzs" / removed)
+    assert report["languages"]["ase"]["files"] == 3
@@ -0,0 +1,216 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from spoken_to_signed.bin import _gloss_to_pose, _text_to_gloss_batch
+from spoken_to_signed.text_to_gloss.types import Gloss
+
+
+def read_sentences(input_path: str) -> Iterator[Tuple[str, str]]:
+    """Read (id, text) pairs from a JSONL file ({"id": ..., "text": ...}) or a TSV file (id, text)."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        if input_path.endswith(".jsonl"):
+            for i, line in enumerate(f):
+                if line.strip() != "":
+                    datum = json.loads(line)
+                    yield str(datum.get("id", i)), datum["text"]
+        else:
+            # Sentences are taken as is, quotes included
+            for i, row in enumerate(csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)):
+                if len(row) == 1:
+                    yield str(i), row[0]
+                elif len(row) > 1:
+                    yield row[0], row[1]
+
+
+def validate_id(sentence_id: str):
+    # Ids name the output files, they must not point outside the output directory
+    if (sentence_id in ("", ".", "..") or "/" in sentence_id or "\\" in sentence_id or "\0" in sentence_id
+            or os.path.basename(sentence_id) != sentence_id):
+        raise ValueError(f"Invalid sentence id {sentence_id!r}, ids are used as file names")
+
+
+def batches(iterable: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def gloss_key(sentences: List[Gloss]) -> tuple:
+    return tuple(tuple(tuple(item) for item in sentence) for sentence in sentences)
+
+
+def write_atomic(path: str, content: bytes):
+    # Write to a temporary file first, so interrupted runs never leave partial outputs that look finished
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _init_worker():
+    # The pipeline reports progress on stdout, which is noise when assembling thousands of sentences
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+
+
+def _sentences_to_pose(sentences: List[Gloss], lexicon: str, spoken_language: str, signed_language: str) -> bytes:
+    # Runs in a worker process, where the pose lookup is created once and then reused (see bin._pose_lookup)
+    pose = _gloss_to_pose(sentences, lexicon, spoken_language, signed_language)
+    buffer = io.BytesIO()
+    pose.write(buffer)
+    return buffer.getvalue()
+
+
+class InProcessExecutor(Executor):
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                future.set_result(fn(*args, **kwargs))
+        except Exception as e:  # pylint: disable=broad-except
+            future.set_exception(e)
+        return future
+
+
+class BatchTranslator:
+    def __init__(self, executor: Executor, args: argparse.Namespace):
+        self.executor = executor
+        self.args = args
+
+        self.pending: Dict[Future, tuple] = {}  # future -> gloss key
+        self.waiting: Dict[tuple, List[str]] = {}  # gloss key -> ids waiting for this pose
+        self.written: Dict[tuple, str] = {}  # gloss key -> path of an output with this pose
+        self.stats = {"sentences": 0, "resumed": 0, "assembled": 0, "deduplicated": 0, "failed": 0}
+
+    def output_path(self, sentence_id: str) -> str:
+        validate_id(sentence_id)
+        return os.path.join(self.args.output_directory, f"{sentence_id}.pose")
+
+    def translate(self, sentences: Iterable[Tuple[str, str]]):
+        for batch in batches(sentences, self.args.batch_size):
+            self.stats["sentences"] += len(batch)
+
+            valid = []
+            for sentence_id, text in batch:
+                try:
+                    validate_id(sentence_id)
+                    valid.append((sentence_id, text))
+                except ValueError as e:
+                    print(f"Failed: {e}", file=sys.stderr)
+                    self.stats["failed"] += 1
+            batch = valid
+
+            # Resume: skip sentences that were already written by a previous run
+            if not self.args.overwrite:
+                remaining = [(sentence_id, text) for sentence_id, text in batch
+                             if not os.path.exists(self.output_path(sentence_id))]
+                self.stats["resumed"] += len(batch) - len(remaining)
+                batch = remaining
+            if len(batch) == 0:
+                continue
+
+            texts = [text for _, text in batch]
+            try:
+                glosses = _text_to_gloss_batch(texts, self.args.spoken_language, self.args.glosser,
+                                               signed_language=self.args.signed_language)
+            except Exception as e:  # pylint: disable=broad-except
+                # A failed glossing batch fails its sentences, the other batches are still translated
+                sentence_ids = [sentence_id for sentence_id, _ in batch]
+                print(f"Failed {', '.join(sentence_ids)}: {e}", file=sys.stderr)
+                self.stats["failed"] += len(sentence_ids)
+                continue
+
+            for (sentence_id, _), sentences_glosses in zip(batch, glosses):
+                self.submit(sentence_id, sentences_glosses)
+
+            # Keep a bounded number of poses in flight, writing finished ones as we go
+            self.drain(max_pending=self.args.max_pending)
+
+        self.drain(max_pending=0)
+
+    def submit(self, sentence_id: str, sentences: List[Gloss]):
+        key = gloss_key(sentences)
+        if key in self.written:  # Repeated sentence, reuse the existing output
+            shutil.copyfile(self.written[key], self.output_path(sentence_id))
+            self.stats["deduplicated"] += 1
+        elif key in self.waiting:  # Repeated sentence, currently being assembled
+            self.waiting[key].append(sentence_id)
+        else:
+            future = self.executor.submit(_sentences_to_pose, sentences, self.args.lexicon, self.args.spoken_language,
+                                          self.args.signed_language)
+            self.pending[future] = key
+            self.waiting[key] = [sentence_id]
+
+    def drain(self, max_pending: int):
+        while len(self.pending) > max_pending:
+            finished, _ = wait(self.pending.keys(), return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = self.pending.pop(future)
+                sentence_ids = self.waiting.pop(key)
+                try:
+                    content = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"Failed {', '.join(sentence_ids)}: {e}", file=sys.stderr)
+                    self.stats["failed"] += len(sentence_ids)
+                    continue
+
+                for sentence_id in sentence_ids:
+                    write_atomic(self.output_path(sentence_id), content)
+                self.written[key] = self.output_path(sentence_ids[0])
+                self.stats["assembled"] += 1
+                self.stats["deduplicated"] += len(sentence_ids) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate many sentences from a JSONL or TSV file to pose files")
+    parser.add_argument("--input", type=str, required=True, help="JSONL with id and text fields, or TSV of id, text")
+    parser.add_argument("--output-directory", type=str, required=True)
+    parser.add_argument("--glosser", choices=['simple', 'spacylemma', 'rules', 'nmt'], required=True)
+    parser.add_argument("--lexicon", type=str, required=True)
+    parser.add_argument("--spoken-language", type=str, required=True)
+    parser.add_argument("--signed-language", type=str, required=True)
+    parser.add_argument("--batch-size", type=int, default=64, help="Number of sentences to gloss at once")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Pose assembly processes, 0 to disable")
+    parser.add_argument("--max-pending", type=int, default=None, help="Maximum number of poses in flight")
+    parser.add_argument("--overwrite", action="store_true", help="Translate sentences that already have an output")
+    args = parser.parse_args()
+
+    if args.max_pending is None:
+        args.max_pending = 2 * max(args.workers, 1)
+
+    os.makedirs(args.output_directory, exist_ok=True)
+
+    start = time.perf_counter()
+    if args.workers > 0:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    else:
+        executor = InProcessExecutor()
+
+    with executor:
+        translator = BatchTranslator(executor, args)
+        translator.translate(read_sentences(args.input))
+    elapsed = time.perf_counter() - start
+
+    stats = translator.stats
+    translated = stats["assembled"] + stats["deduplicated"]
+    print(f"Sentences: {stats['sentences']} "
+          f"(resumed {stats['resumed']}, translated {translated}, failed {stats['failed']})")
+    print(f"Poses assembled: {stats['assembled']}, reused for repeated glosses: {stats['deduplicated']}")
+    print(f"Elapsed: {elapsed:.1f}s, {translated / elapsed:.2f} sentences/sec")
+
+
+if __name__ == "__main__":
+    main()
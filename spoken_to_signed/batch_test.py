@@ -0,0 +1,85 @@
+import argparse
+import os
+import shutil
+
+import pytest
+
+from spoken_to_signed import batch as batch_module
+from spoken_to_signed.batch import BatchTranslator, InProcessExecutor, read_sentences, validate_id
+
+DUMMY_LEXICON = os.path.join(os.path.dirname(__file__), "..", "assets", "dummy_lexicon")
+
+
+def translator(tmp_path, **kwargs) -> BatchTranslator:
+    lexicon = tmp_path / "lexicon"
+    if not lexicon.exists():
+        shutil.copytree(DUMMY_LEXICON, lexicon, ignore=shutil.ignore_patterns("index.bin", "packed", "prepared"))
+    output_directory = tmp_path / "output"
+    output_directory.mkdir(exist_ok=True)
+
+    args = argparse.Namespace(output_directory=str(output_directory), lexicon=str(lexicon), glosser="simple",
+                              spoken_language="de", signed_language="sgg", batch_size=2, max_pending=2,
+                              overwrite=False)
+    for key, value in kwargs.items():
+        setattr(args, key, value)
+    return BatchTranslator(InProcessExecutor(), args)
+
+
+def test_read_sentences_jsonl_and_tsv(tmp_path):
+    jsonl_path = tmp_path / "sentences.jsonl"
+    jsonl_path.write_text('{"id": "a", "text": "Kinder essen Pizza"}\n\n{"text": "Kleine Kinder"}\n', encoding="utf-8")
+    assert list(read_sentences(str(jsonl_path))) == [("a", "Kinder essen Pizza"), ("2", "Kleine Kinder")]
+
+    tsv_path = tmp_path / "sentences.tsv"
+    tsv_path.write_text('a\tSie sagt "Pizza"\n"b\tKinder "essen\nKleine Kinder\n', encoding="utf-8")
+    assert list(read_sentences(str(tsv_path))) == [
+        ("a", 'Sie sagt "Pizza"'),
+        ('"b', 'Kinder "essen'),
+        ("2", "Kleine Kinder"),
+    ]
+
+
+@pytest.mark.parametrize("sentence_id", ["", ".", "..", "../x", "a/b", "a\\b"])
+def test_validate_id_rejects_paths(sentence_id):
+    with pytest.raises(ValueError):
+        validate_id(sentence_id)
+
+
+def test_translate_deduplicates_and_resumes(tmp_path):
+    sentences = [("a", "Kinder essen Pizza"), ("b", "Kinder essen Pizza"), ("c", "Kleine Kinder"),
+                 ("d", "Kinder essen Pizza"), ("../x", "Pizza"), ("e/f", "Pizza")]
+
+    batch = translator(tmp_path)
+    batch.translate(sentences)
+    assert batch.stats == {"sentences": 6, "resumed": 0, "assembled": 2, "deduplicated": 2, "failed": 2}
+    assert sorted(os.listdir(tmp_path / "output")) == ["a.pose", "b.pose", "c.pose", "d.pose"]
+    assert not os.path.exists(tmp_path / "x.pose")
+    content = (tmp_path / "output" / "a.pose").read_bytes()
+    assert (tmp_path / "output" / "b.pose").read_bytes() == content
+    assert (tmp_path / "output" / "d.pose").read_bytes() == content
+
+    # Outputs of a previous run are kept
+    (tmp_path / "output" / "c.pose").unlink()
+    batch = translator(tmp_path)
+    batch.translate(sentences[:4])
+    assert batch.stats == {"sentences": 4, "resumed": 3, "assembled": 1, "deduplicated": 0, "failed": 0}
+
+    batch = translator(tmp_path, overwrite=True)
+    batch.translate(sentences[:4])
+    assert batch.stats["resumed"] == 0 and batch.stats["assembled"] == 2
+
+
+def test_translate_continues_after_a_failed_glossing_batch(tmp_path, monkeypatch, capsys):
+    text_to_gloss_batch = batch_module._text_to_gloss_batch
+
+    def failing_text_to_gloss_batch(texts, *args, **kwargs):
+        if "Pizza" in texts:
+            raise RuntimeError("Glosser crashed")
+        return text_to_gloss_batch(texts, *args, **kwargs)
+
+    monkeypatch.setattr(batch_module, "_text_to_gloss_batch", failing_text_to_gloss_batch)
+    batch = translator(tmp_path)
+    batch.translate([("a", "Pizza"), ("b", "Kinder"), ("c", "Kleine Kinder")])
+    assert batch.stats == {"sentences": 3, "resumed": 0, "assembled": 1, "deduplicated": 0, "failed": 2}
+    assert os.listdir(tmp_path / "output") == ["c.pose"]
+    assert "Failed a, b: Glosser crashed" in capsys.readouterr().err
@@ -1,13 +1,14 @@
 import argparse
+import functools
 import importlib
 import os
 import tempfile
-from itertools import chain
 from typing import List
 
 from pose_format import Pose
 
-from spoken_to_signed.gloss_to_pose import gloss_to_pose, CSVPoseLookup, concatenate_poses
+from spoken_to_signed.gloss_to_pose import gloss_to_pose, CSVPoseLookup, concatenate_poses, ResultCache
+from spoken_to_signed.gloss_to_pose.lookup import CompiledIndex
 from spoken_to_signed.gloss_to_pose.lookup.fingerspelling_lookup import FingerspellingPoseLookup
 from spoken_to_signed.text_to_gloss.types import Gloss
 
@@ -17,10 +18,31 @@ def _text_to_gloss(text: str, language: str, glosser: str, **kwargs) -> List[Glo
     return module.text_to_gloss(text=text, language=language, **kwargs)
 
 
-def _gloss_to_pose(sentences: List[Gloss], lexicon: str, spoken_language: str, signed_language: str) -> Pose:
+def _text_to_gloss_batch(texts: List[str], language: str, glosser: str, **kwargs) -> List[List[Gloss]]:
+    module = importlib.import_module(f"spoken_to_signed.text_to_gloss.{glosser}")
+    # Glossers can implement a batched version, otherwise we gloss one text at a time
+    if hasattr(module, "text_to_gloss_batch"):
+        return module.text_to_gloss_batch(texts=texts, language=language, **kwargs)
+    return [module.text_to_gloss(text=text, language=language, **kwargs) for text in texts]
+
+
+@functools.lru_cache(maxsize=None)
+def _pose_lookup(lexicon: str) -> CSVPoseLookup:
+    # Lookups are reused between calls, to keep their indexes and pose caches warm
     fingerspelling_lookup = FingerspellingPoseLookup()
-    pose_lookup = CSVPoseLookup(lexicon, backup=fingerspelling_lookup)
-    poses = [gloss_to_pose(gloss, pose_lookup, spoken_language, signed_language) for gloss in sentences]
+    return CSVPoseLookup(lexicon, backup=fingerspelling_lookup)
+
+
+@functools.lru_cache(maxsize=1)
+def _result_cache() -> ResultCache:
+    # Results are kept in memory, and on disk if a cache directory is set (shared between processes and runs)
+    return ResultCache(directory=os.environ.get("SPOKEN_TO_SIGNED_CACHE_DIR"))
+
+
+def _gloss_to_pose(sentences: List[Gloss], lexicon: str, spoken_language: str, signed_language: str) -> Pose:
+    pose_lookup = _pose_lookup(lexicon)
+    cache = _result_cache()
+    poses = [gloss_to_pose(gloss, pose_lookup, spoken_language, signed_language, cache=cache) for gloss in sentences]
     if len(poses) == 1:
         return poses[0]
     return concatenate_poses(poses, trim=False)
@@ -35,7 +57,12 @@ def _get_models_dir():
     return models_dir
 
 
-def _pose_to_video(pose: Pose, video_path: str):
+def _pose_to_video(pose: Pose, video_path: str, renderer: str = "pix_to_pix", preset: str = "final"):
+    if renderer == "skeleton":
+        from spoken_to_signed.pose_to_video import pose_to_video as render_pose_to_video
+        render_pose_to_video(pose, video_path, preset=preset)
+        return
+
     models_dir = _get_models_dir()
     pix2pix_path = os.path.join(models_dir, "pix2pix.h5")
     if not os.path.exists(pix2pix_path):
@@ -67,6 +94,16 @@ def _pose_to_video(pose: Pose, video_path: str):
     subprocess.run(args, shell=True, check=True)
 
 
+def _video_output_arguments(parser: argparse.ArgumentParser):
+    from spoken_to_signed.pose_to_video import RENDER_PRESETS
+
+    parser.add_argument("--video", type=str, required=True)
+    parser.add_argument("--renderer", choices=["pix_to_pix", "skeleton"], default="pix_to_pix",
+                        help="pix_to_pix uses the transcription package, skeleton is rendered in process")
+    parser.add_argument("--preset", choices=list(RENDER_PRESETS.keys()), default="final",
+                        help="Resolution and fps of skeleton videos")
+
+
 def _text_input_arguments(parser: argparse.ArgumentParser):
     parser.add_argument("--text", type=str, required=True)
     parser.add_argument("--glosser", choices=['simple', 'spacylemma', 'rules', 'nmt'], required=True)
@@ -76,9 +113,10 @@ def _text_input_arguments(parser: argparse.ArgumentParser):
     pre_args, _ = pre_parser.parse_known_args()
 
     if pre_args.lexicon:
-        lookup = CSVPoseLookup(pre_args.lexicon)
-        spoken_languages = list(lookup.words_index.keys())
-        signed_languages = set(chain.from_iterable(lookup.words_index[lang].keys() for lang in spoken_languages))
+        # Only the language pairs are needed here, which the compiled index stores in its header
+        language_pairs = CompiledIndex.load_or_build(os.path.join(pre_args.lexicon, 'index.csv')).languages()
+        spoken_languages = sorted({spoken for spoken, _ in language_pairs})
+        signed_languages = sorted({signed for _, signed in language_pairs})
     else:
         spoken_languages = ['de', 'fr', 'it', 'en']
         signed_languages = ['sgg', 'gsg', 'bfi', 'ase']
@@ -101,13 +139,13 @@ def text_to_gloss():
 def pose_to_video():
     args_parser = argparse.ArgumentParser()
     args_parser.add_argument("--pose", type=str, required=True)
-    args_parser.add_argument("--video", type=str, required=True)
+    _video_output_arguments(args_parser)
     args = args_parser.parse_args()
 
     with open(args.pose, "rb") as f:
         pose = Pose.read(f.read())
 
-    _pose_to_video(pose, args.video)
+    _pose_to_video(pose, args.video, args.renderer, args.preset)
 
     print("Pose to video")
     print("Input pose:", args.pose)
@@ -136,12 +174,12 @@ def text_to_gloss_to_pose_to_video():
     args_parser = argparse.ArgumentParser()
     _text_input_arguments(args_parser)
     args_parser.add_argument("--lexicon", type=str, required=True)
-    args_parser.add_argument("--video", type=str, required=True)
+    _video_output_arguments(args_parser)
     args = args_parser.parse_args()
 
     sentences = _text_to_gloss(args.text, args.spoken_language, args.glosser, signed_language=args.signed_language)
     pose = _gloss_to_pose(sentences, args.lexicon, args.spoken_language, args.signed_language)
-    _pose_to_video(pose, args.video)
+    _pose_to_video(pose, args.video, args.renderer, args.preset)
 
     print("Text to gloss to pose to video")
     print("Input text:", args.text)
@@ -1,8 +1,13 @@
 import argparse
 import csv
+import functools
+import json
+import multiprocessing
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
 
 from pose_format import PoseHeader, Pose
 from pose_format.numpy import NumPyPoseBody
@@ -10,6 +15,14 @@ from pose_format.utils.reader import BufferReader
 from tqdm import tqdm
 
 LEXICON_INDEX = ['path', 'spoken_language', 'signed_language', 'start', 'end', 'words', 'glosses', 'priority']
+# Progress of an interrupted ingestion, removed once it completes
+CHECKPOINT_NAME = ".download_checkpoint.json"
+
+IANA_TAGS = {
+    "ch-de": "sgg",
+    "ch-fr": "ssr",
+    "ch-it": "slf",
+}
 
 
 def init_index(index_path: str):
@@ -20,7 +33,16 @@ def init_index(index_path: str):
             writer.writerow(LEXICON_INDEX)
 
 
-def load_signsuisse(directory_path: str) -> List[Dict[str, str]]:
+class DatasetSource(NamedTuple):
+    pose_header: PoseHeader
+    size: int  # Number of records
+    # Reads the records from start to end (exclusive), decoding their poses. Called in the worker processes,
+    # so it must be picklable (e.g. a module function, or a partial of one)
+    read: Callable[[int, int], Iterator[Dict]]
+
+
+@functools.lru_cache(maxsize=None)
+def signsuisse_builder(config_name: str):
     try:
         import sign_language_datasets
     except ImportError as e:
@@ -29,98 +51,250 @@ def load_signsuisse(directory_path: str) -> List[Dict[str, str]]:
     import tensorflow_datasets as tfds
     # noinspection PyUnresolvedReferences
     import sign_language_datasets.datasets.signsuisse as signsuisse
-    # noinspection PyUnresolvedReferences
-    from sign_language_datasets.datasets.signsuisse.signsuisse import _POSE_HEADERS
     from sign_language_datasets.datasets.config import SignDatasetConfig
 
-    IANA_TAGS = {
-        "ch-de": "sgg",
-        "ch-fr": "ssr",
-        "ch-it": "slf",
-    }
+    config = SignDatasetConfig(name=config_name, version="1.0.0", include_video=False, include_pose="holistic")
+    builder = tfds.builder('sign_suisse', config=config)
+    builder.download_and_prepare()
+    return builder
+
+
+def signsuisse_records(config_name: str, start: int, end: int) -> Iterator[Dict]:
+    dataset = signsuisse_builder(config_name).as_dataset(split=f"train[{start}:{end}]")
+    for datum in dataset:
+        tf_pose = datum['pose']
+        yield {
+            'id': datum['id'].numpy().decode('utf-8'),
+            'spoken_language': datum['spokenLanguage'].numpy().decode('utf-8'),
+            'signed_language': IANA_TAGS[datum['signedLanguage'].numpy().decode('utf-8')],
+            'words': datum['name'].numpy().decode('utf-8'),
+            'fps': int(tf_pose["fps"].numpy()),
+            'data': tf_pose["data"].numpy(),
+            'conf': tf_pose["conf"].numpy(),
+        }
+
 
+def signsuisse_source() -> DatasetSource:
     # for cache busting, we use today's date
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    config = SignDatasetConfig(name=date_str, version="1.0.0", include_video=False, include_pose="holistic")
-    dataset = tfds.load(name='sign_suisse', builder_kwargs={"config": config})
+    config_name = datetime.now().strftime("%Y-%m-%d")
+    builder = signsuisse_builder(config_name)
 
+    # noinspection PyUnresolvedReferences
+    from sign_language_datasets.datasets.signsuisse.signsuisse import _POSE_HEADERS
     with open(_POSE_HEADERS["holistic"], "rb") as buffer:
         pose_header = PoseHeader.read(BufferReader(buffer.read()))
 
-    for datum in tqdm(dataset["train"]):
-        uid_raw = datum['id'].numpy().decode('utf-8')
-        spoken_language = datum['spokenLanguage'].numpy().decode('utf-8')
-        signed_language = IANA_TAGS[datum['signedLanguage'].numpy().decode('utf-8')]
-        words = datum['name'].numpy().decode('utf-8')
+    return DatasetSource(pose_header, builder.info.splits["train"].num_examples,
+                         functools.partial(signsuisse_records, config_name))
 
-        # Load pose and save to file
-        tf_pose = datum['pose']
-        fps = int(tf_pose["fps"].numpy())
-        if fps == 0:
-            continue
-        pose_body = NumPyPoseBody(fps, tf_pose["data"].numpy(), tf_pose["conf"].numpy())
-        pose = Pose(pose_header, pose_body)
-        pose_relative_path = os.path.join(signed_language, f"{uid_raw}.pose")
-        os.makedirs(os.path.join(directory_path, signed_language), exist_ok=True)
-        with open(os.path.join(directory_path, pose_relative_path), "wb") as f:
-            pose.write(f)
 
-        yield {
-            'path': pose_relative_path,
-            'spoken_language': spoken_language,
-            'signed_language': signed_language,
-            'words': words,
-            'start': "0",
-            'end': str(len(pose_body.data) / fps),  # pose duration
-            'glosses': "",
-            'priority': "",
-        }
+def write_entry(record: Dict, pose_header: PoseHeader, directory_path: str) -> Optional[Dict[str, str]]:
+    """Write the pose of a record to the lexicon directory, and return its index row (None for empty poses)"""
+    fps = record['fps']
+    if fps == 0:
+        return None
+
+    # Load pose and save to file
+    pose_body = NumPyPoseBody(fps, record['data'], record['conf'])
+    pose = Pose(pose_header, pose_body)
+    pose_relative_path = os.path.join(record['signed_language'], f"{record['id']}.pose")
+    os.makedirs(os.path.join(directory_path, record['signed_language']), exist_ok=True)
+    with open(os.path.join(directory_path, pose_relative_path), "wb") as f:
+        pose.write(f)
+
+    return {
+        'path': pose_relative_path,
+        'spoken_language': record['spoken_language'],
+        'signed_language': record['signed_language'],
+        'words': record['words'],
+        'start': "0",
+        'end': str(len(pose_body.data) / fps),  # pose duration
+        'glosses': "",
+        'priority': "",
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def simple_text_to_gloss():
+    from spoken_to_signed.text_to_gloss.simple import text_to_gloss
+    return text_to_gloss
+
+
+@functools.lru_cache(maxsize=4096)
+def words_to_glosses(words: str, language: str) -> Optional[str]:
+    # Lexicon entries often share their words (e.g. across signed languages), lemmatize them once
+    try:
+        sentences = simple_text_to_gloss()(text=words, language=language)
+    except ValueError as e:
+        if not ('Language' in str(e) and 'not supported' in str(e)):
+            raise e
+        return None
+    return " ".join(g for sentence in sentences for w, g in sentence)
 
 
 def normalize_row(row: Dict[str, str]):
     if row['glosses'] == "" and row['words'] != "":
-        from spoken_to_signed.text_to_gloss.simple import text_to_gloss
-        try:
-            sentences = text_to_gloss(text=row['words'], language=row['spoken_language'])
-            glosses = [g for sentence in sentences for w, g in sentence]
-            row['glosses'] = " ".join(glosses)
-        except ValueError as e:
-            if not ('Language' in str(e) and 'not supported' in str(e)):
-                raise e
+        glosses = words_to_glosses(row['words'], row['spoken_language'])
+        if glosses is not None:
+            row['glosses'] = glosses
 
 
-def get_data(name: str, directory: str):
-    data_loaders = {
-        'signsuisse': load_signsuisse,
+def get_source(name: str) -> DatasetSource:
+    source_loaders = {
+        'signsuisse': signsuisse_source,
     }
-    if name not in data_loaders:
+    if name not in source_loaders:
         raise NotImplementedError(f"{name} is unknown.")
 
-    return data_loaders[name](directory)
+    return source_loaders[name]()
+
+
+# Pipelined ingestion: the records of a dataset are split into chunks, and a pool of processes reads (decoding the
+# poses), writes and lemmatizes every chunk, with a bounded window of chunks in flight. Their rows are appended to
+# index.csv in batches, in the order of the dataset. After every batch, a checkpoint records the committed size of
+# index.csv and the number of records it covers, so an interrupted ingestion resumes after the last complete batch.
+
+_pose_header = None
+_directory = None
+
+
+def _init_writer(pose_header: PoseHeader, directory: str):
+    global _pose_header, _directory
+    _pose_header = pose_header
+    _directory = directory
+
+
+def _ingest_chunk(read: Callable[[int, int], Iterator[Dict]], start: int, end: int) -> List[Dict[str, str]]:
+    rows = []
+    for record in read(start, end):
+        row = write_entry(record, _pose_header, _directory)
+        if row is not None:
+            normalize_row(row)
+            rows.append(row)
+    return rows
+
+
+def read_checkpoint(directory: str) -> Optional[dict]:
+    checkpoint_path = os.path.join(directory, CHECKPOINT_NAME)
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def add_data(data: List[Dict[str, str]], directory: str):
+def write_checkpoint(directory: str, checkpoint: dict):
+    from spoken_to_signed.gloss_to_pose.lookup.index_manifest import write_atomic
+
+    write_atomic(os.path.join(directory, CHECKPOINT_NAME), lambda f: json.dump(checkpoint, f))
+
+
+def resume_index(index_path: str, directory: str, name: str) -> int:
+    """Undo rows written after the last checkpoint, and return the number of records already ingested"""
+    checkpoint = read_checkpoint(directory)
+    if checkpoint is None:
+        return 0
+    if checkpoint["name"] != name:
+        raise ValueError(f"{directory} has an interrupted ingestion of {checkpoint['name']}, "
+                         f"resume it or remove {CHECKPOINT_NAME}")
+    print(f"Resuming an interrupted ingestion of {name}")
+    with open(index_path, 'r+b') as file:
+        file.truncate(checkpoint["index_size"])
+    return checkpoint["position"]
+
+
+def ingest(source: DatasetSource,
+           directory: str,
+           name: str,
+           workers: Optional[int] = None,
+           batch_size: int = 256,
+           chunk_size: int = 32) -> int:
+    """
+    Write the records of a dataset to the lexicon directory, and add their rows to index.csv.
+    Records already ingested by an interrupted ingestion (see CHECKPOINT_NAME) are skipped.
+    With workers=0, records are read and written in this process. Returns the number of added rows.
+    """
     index_path = os.path.join(directory, 'index.csv')
     os.makedirs(directory, exist_ok=True)
     init_index(index_path)
+    position = resume_index(index_path, directory, name)
+    chunks = [(start, min(start + chunk_size, source.size)) for start in range(position, source.size, chunk_size)]
+
+    def processed_chunks(executor):
+        if executor is None:
+            _init_writer(source.pose_header, directory)
+            for start, end in chunks:
+                yield end, _ingest_chunk(source.read, start, end)
+            return
+        # A bounded window of chunks in flight, collected in order as they complete
+        in_flight = deque()
+        for start, end in chunks:
+            in_flight.append((end, executor.submit(_ingest_chunk, source.read, start, end)))
+            if len(in_flight) >= 2 * workers:
+                end, future = in_flight.popleft()
+                yield end, future.result()
+        while in_flight:
+            end, future = in_flight.popleft()
+            yield end, future.result()
 
+    added = 0
     with open(index_path, 'a', encoding='utf-8', newline='') as file:
         writer = csv.writer(file)
-        for row in tqdm(data):
-            normalize_row(row)
-            writer.writerow([row[key] for key in LEXICON_INDEX])
 
-    print(f"Added entries to {index_path}")
+        def commit(batch, position):
+            writer.writerows([row[key] for key in LEXICON_INDEX] for row in batch)
+            file.flush()
+            os.fsync(file.fileno())
+            write_checkpoint(directory, {"name": name, "index_size": file.tell(), "position": position})
+
+        write_checkpoint(directory, {"name": name, "index_size": os.path.getsize(index_path), "position": position})
+
+        executor = None
+        if workers != 0:
+            workers = workers if workers is not None else os.cpu_count()
+            # Workers are spawned, as TensorFlow (used to read datasets) does not support forking
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_writer, initargs=(source.pose_header, directory))
+        try:
+            batch = []
+            with tqdm(total=source.size, initial=position) as progress:
+                for end, rows in processed_chunks(executor):
+                    progress.update(end - position)
+                    position = end
+                    batch.extend(rows)
+                    if len(batch) >= batch_size:
+                        commit(batch, position)
+                        added += len(batch)
+                        batch = []
+            if len(batch) > 0:
+                commit(batch, position)
+                added += len(batch)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    os.remove(os.path.join(directory, CHECKPOINT_NAME))
+    print(f"Added {added} entries to {index_path}")
+    return added
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--name", choices=['signsuisse'], required=True)
     parser.add_argument("--directory", type=str, required=True)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes decoding and writing poses, and lemmatizing rows (0 to write serially, default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows added to index.csv per checkpoint")
+    parser.add_argument("--prepare", action="store_true",
+                        help="Also build the compiled index and the prepared lexicon (see prepare_lexicon)")
     args = parser.parse_args()
 
-    data = get_data(args.name, args.directory)
-    add_data(data, args.directory)
+    source = get_source(args.name)
+    ingest(source, args.directory, args.name, workers=args.workers, batch_size=args.batch_size)
+
+    if args.prepare:
+        from spoken_to_signed.gloss_to_pose.lookup.prepared_lexicon import prepare_lexicon
+        # Preparing the lexicon loads (and so compiles) the index
+        prepare_lexicon(args.directory)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,67 @@
+import csv
+import functools
+import os
+
+import pytest
+from pose_format import Pose
+
+from spoken_to_signed.download_lexicon import CHECKPOINT_NAME, DatasetSource, ingest
+
+DUMMY_LEXICON = os.path.join(os.path.dirname(__file__), "..", "assets", "dummy_lexicon")
+NAMES = sorted(name.split(".")[0] for name in os.listdir(os.path.join(DUMMY_LEXICON, "sgg")))
+
+
+def read_pose(name: str) -> Pose:
+    with open(os.path.join(DUMMY_LEXICON, "sgg", f"{name}.pose"), "rb") as f:
+        return Pose.read(f.read())
+
+
+def read_fake(start: int, end: int, interrupt_at: int = None):
+    # The dummy lexicon poses, decoded as records of a dataset, then an empty pose
+    for i in range(start, end):
+        if i == interrupt_at:
+            raise KeyboardInterrupt
+        name = NAMES[i] if i < len(NAMES) else None
+        pose = read_pose(name or NAMES[0])
+        yield {
+            "id": name or "empty",
+            "spoken_language": "de",
+            "signed_language": "sgg",
+            "words": (name or "empty").capitalize(),
+            "fps": int(pose.body.fps) if name else 0,
+            "data": pose.body.data.filled(0),
+            "conf": pose.body.confidence,
+        }
+
+
+def fake_source(read=read_fake) -> DatasetSource:
+    return DatasetSource(read_pose(NAMES[0]).header, len(NAMES) + 1, read)
+
+
+def read_rows(directory):
+    with open(os.path.join(directory, "index.csv"), "r", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_ingest_writes_poses_and_rows(tmp_path, workers):
+    assert ingest(fake_source(), str(tmp_path), "fake", workers=workers, batch_size=2, chunk_size=2) == 4
+
+    rows = read_rows(tmp_path)
+    assert [row["path"] for row in rows] == [f"sgg/{name}.pose" for name in NAMES]
+    assert rows[0]["glosses"] == "essen"
+    with open(tmp_path / "sgg" / "essen.pose", "rb") as f:
+        assert len(Pose.read(f.read()).body.data) == len(read_pose("essen").body.data)
+    assert not os.path.exists(tmp_path / CHECKPOINT_NAME)
+
+
+def test_ingest_resumes_after_interruption(tmp_path):
+    with pytest.raises(KeyboardInterrupt):
+        ingest(fake_source(functools.partial(read_fake, interrupt_at=3)), str(tmp_path), "fake", workers=0,
+               batch_size=2, chunk_size=1)
+    # Only the first batch was committed
+    assert len(read_rows(tmp_path)) == 2
+    assert os.path.exists(tmp_path / CHECKPOINT_NAME)
+
+    assert ingest(fake_source(), str(tmp_path), "fake", workers=0, batch_size=2, chunk_size=1) == 2
+    assert [row["path"] for row in read_rows(tmp_path)] == [f"sgg/{name}.pose" for name in NAMES]
@@ -1,19 +1,10 @@
-import mediapipe as mp
+import functools
+
 import numpy as np
-import cv2
 from typing import Dict, List, Tuple
 from pose_format import Pose
 from pose_format.pose_header import PoseHeader, PoseHeaderComponent
 
-# Initialize MediaPipe FaceMesh
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    static_image_mode=False,
-    max_num_faces=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
-
 # Define important facial landmark indices
 FACIAL_LANDMARKS = {
     'left_eye': [33, 133, 157, 158, 159, 160, 161, 246],  # Left eye contour
@@ -81,12 +72,27 @@ def create_face_component() -> PoseHeaderComponent:
         points=points,
         limbs=edges,  # Use limbs instead of edges
         colors=colors,  # Add colors parameter
-        point_format=["x", "y", "z"]  # Add point_format parameter
+        point_format="XYZC"  # Same point format as the holistic components, required to write the pose
+    )
+
+@functools.lru_cache(maxsize=1)
+def get_face_mesh():
+    """Initialize MediaPipe FaceMesh on first use, as importing mediapipe and building the graph is expensive."""
+    try:
+        import mediapipe as mp
+    except ImportError as e:
+        raise ImportError("Please install mediapipe. pip install mediapipe") from e
+
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
     )
 
 def extract_face_landmarks(image: np.ndarray) -> Dict[str, np.ndarray]:
     """Extract facial landmarks from an image using MediaPipe FaceMesh."""
-    results = face_mesh.process(image)
+    results = get_face_mesh().process(image)
     if not results.multi_face_landmarks:
         return None
     
@@ -180,6 +186,8 @@ def integrate_face_landmarks(pose: Pose, landmarks_dict: Dict[str, np.ndarray])
 
 def get_frame_image(pose: Pose, frame_idx: int = 0) -> np.ndarray:
     """Convert pose frame data to image for MediaPipe processing."""
+    import cv2
+
     # Create a blank image
     height = int(pose.header.dimensions.height)
     width = int(pose.header.dimensions.width)
@@ -197,6 +205,46 @@ def get_frame_image(pose: Pose, frame_idx: int = 0) -> np.ndarray:
     
     return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)  # Convert to RGB for MediaPipe
 
+def expression_category(gloss: str) -> Tuple[bool, str]:
+    """Determine the expression category of a gloss: whether it is a question, and the mouth shape."""
+    mouth = "neutral"
+    if "happy" in gloss.lower():
+        mouth = "happy"
+    elif "sad" in gloss.lower():
+        mouth = "sad"
+    return "?" in gloss, mouth
+
+@functools.lru_cache(maxsize=None)
+def face_template(question: bool, mouth: str) -> np.ndarray:
+    """Compute the 62 face point coordinates for an expression category, once per category."""
+    template = np.zeros((len(create_face_component().points), 3))
+
+    # Set some basic eye positions
+    eye_y = 0.5  # Neutral eye position
+    if question:
+        eye_y = 0.7  # Raised eyebrows for questions
+
+    for i in range(8):
+        template[i] = [0.3 + 0.1 * i, eye_y, 0]  # Left eye
+        template[8 + i] = [0.7 + 0.1 * i, eye_y, 0]  # Right eye
+
+    # Eyebrows
+    brow_y = eye_y + 0.1
+    for i in range(5):
+        template[16 + i] = [0.3 + 0.1 * i, brow_y, 0]  # Left eyebrow
+        template[21 + i] = [0.7 + 0.1 * i, brow_y, 0]  # Right eyebrow
+
+    # Mouth - make a basic smile
+    mouth_y = {"happy": 0.4, "sad": 0.2}.get(mouth, 0.3)
+    for i in range(18):
+        angle = 2 * np.pi * i / 18
+        template[26 + i] = [0.5 + 0.2 * np.cos(angle), mouth_y + 0.1 * np.sin(angle), 0]  # Outer mouth
+        template[44 + i] = [0.5 + 0.1 * np.cos(angle), mouth_y + 0.05 * np.sin(angle), 0]  # Inner mouth
+
+    # The template is shared between all calls, so it must not be modified
+    template.flags.writeable = False
+    return template
+
 def add_facial_expressions(pose: Pose, gloss: str, enable_expressions: bool = True) -> Pose:
     """Add facial expressions to a pose based on the gloss.
     
@@ -210,83 +258,34 @@ def add_facial_expressions(pose: Pose, gloss: str, enable_expressions: bool = Tr
     """
     if not enable_expressions:
         return pose
-        
-    # Create a copy of the pose to modify
-    new_pose = pose.clone()
-    
+
+    template = face_template(*expression_category(gloss))
+
+    # Create a copy of the pose to modify, the header may be shared with other poses (e.g. in the lookup cache)
+    new_pose = Pose(PoseHeader(version=pose.header.version,
+                               dimensions=pose.header.dimensions,
+                               components=list(pose.header.components)),
+                    pose.body.copy())
+
     # Add face component to header if not present
-    if "FACE" not in new_pose.header.components_names():
+    if "FACE" not in [c.name for c in new_pose.header.components]:
         face_component = create_face_component()
         new_pose.header.components.append(face_component)
-        
-        # Initialize face data arrays
-        num_frames = new_pose.body.data.shape[0]
-        num_people = new_pose.body.data.shape[1]
-        num_face_points = len(face_component.points)
-        
+
         # Create arrays for face data and confidence
-        face_data = np.zeros((num_frames, num_people, num_face_points, 3))
-        face_conf = np.ones((num_frames, num_people, num_face_points))
-        
+        num_frames, num_people = new_pose.body.data.shape[:2]
+        face_data = np.zeros((num_frames, num_people, len(face_component.points), 3))
+        face_conf = np.ones((num_frames, num_people, len(face_component.points)))
+
         # Add face data to body
         new_pose.body.data = np.concatenate([new_pose.body.data, face_data], axis=2)
         new_pose.body.confidence = np.concatenate([new_pose.body.confidence, face_conf], axis=2)
-    
+
     # Get indices for facial features
-    face_idx = new_pose.header.components_names().index("FACE")
+    face_idx = [c.name for c in new_pose.header.components].index("FACE")
     start_idx = sum(len(c.points) for c in new_pose.header.components[:face_idx])
-    
-    # Add basic expressions based on gloss
-    # For now just add some dummy expressions
-    for frame in range(new_pose.body.data.shape[0]):
-        for person in range(new_pose.body.data.shape[1]):
-            # Set some basic eye positions
-            eye_y = 0.5  # Neutral eye position
-            if "?" in gloss:
-                eye_y = 0.7  # Raised eyebrows for questions
-            
-            # Left eye
-            for i in range(8):
-                idx = start_idx + i
-                new_pose.body.data[frame, person, idx] = [0.3 + 0.1 * i, eye_y, 0]
-                
-            # Right eye  
-            for i in range(8):
-                idx = start_idx + 8 + i
-                new_pose.body.data[frame, person, idx] = [0.7 + 0.1 * i, eye_y, 0]
-                
-            # Eyebrows
-            brow_y = eye_y + 0.1
-            for i in range(5):
-                # Left eyebrow
-                idx = start_idx + 16 + i
-                new_pose.body.data[frame, person, idx] = [0.3 + 0.1 * i, brow_y, 0]
-                
-                # Right eyebrow
-                idx = start_idx + 21 + i  
-                new_pose.body.data[frame, person, idx] = [0.7 + 0.1 * i, brow_y, 0]
-                
-            # Mouth - make a basic smile
-            mouth_y = 0.3
-            if "happy" in gloss.lower():
-                mouth_y = 0.4  # Smile
-            elif "sad" in gloss.lower():
-                mouth_y = 0.2  # Frown
-                
-            # Outer mouth points
-            for i in range(18):
-                idx = start_idx + 26 + i
-                angle = 2 * np.pi * i / 18
-                x = 0.5 + 0.2 * np.cos(angle)
-                y = mouth_y + 0.1 * np.sin(angle)
-                new_pose.body.data[frame, person, idx] = [x, y, 0]
-                
-            # Inner mouth points
-            for i in range(18):
-                idx = start_idx + 44 + i
-                angle = 2 * np.pi * i / 18
-                x = 0.5 + 0.1 * np.cos(angle)
-                y = mouth_y + 0.05 * np.sin(angle)
-                new_pose.body.data[frame, person, idx] = [x, y, 0]
-    
-    return new_pose 
\ No newline at end of file
+
+    # Broadcast the expression to all frames and people at once
+    new_pose.body.data[:, :, start_idx:start_idx + len(template)] = template
+
+    return new_pose
@@ -1,28 +1,93 @@
-from typing import Union
+from typing import Iterator, Optional, Union
 
 from pose_format import Pose
 
-from .concatenate import concatenate_poses
+from .concatenate import concatenate_poses, ConcatenationSettings, PreparedPose
 from .lookup import PoseLookup, CSVPoseLookup
+from .result_cache import ResultCache
+from .smoothing import ConnectionSettings
+from .streaming import stream_concatenate_poses
 from ..text_to_gloss.types import Gloss
 from ..facial_expressions import add_facial_expressions
 
 
+def output_settings() -> dict:
+    """Process-wide settings that change the output of gloss_to_pose, part of the result cache key"""
+    return {
+        "reduce_holistic": ConcatenationSettings.is_reduce_holistic,
+        "use_descriptors": ConnectionSettings.use_descriptors,
+        "descriptor_points": ConnectionSettings.descriptor_points if ConnectionSettings.use_descriptors else None,
+    }
+
+
 def gloss_to_pose(glosses: Gloss,
                   pose_lookup: PoseLookup,
                   spoken_language: str,
                   signed_language: str,
                   source: str = None,
                   anonymize: Union[bool, Pose] = False,
-                  enable_expressions: bool = True) -> Pose:
-    # Transform the list of glosses into a list of poses
-    poses = pose_lookup.lookup_sequence(glosses, spoken_language, signed_language, source)
+                  enable_expressions: bool = True,
+                  cache: ResultCache = None) -> Pose:
+    # Repeated sentences are read from the cache. Results depend on the lexicon content, so unversioned lexicons
+    # and appearance transfer (which depends on another pose) are not cached.
+    cache_key = None
+    if cache is not None and pose_lookup.version is not None and not isinstance(anonymize, Pose):
+        cache_key = ResultCache.key(glosses, spoken_language, signed_language, pose_lookup.version,
+                                    source=source, anonymize=bool(anonymize), enable_expressions=enable_expressions,
+                                    trim=True, settings=output_settings())
+        cached_pose = cache.get(cache_key)
+        if cached_pose is not None:
+            return cached_pose
+
+    pose = _gloss_to_pose(glosses, pose_lookup, spoken_language, signed_language, source, anonymize,
+                          enable_expressions)
+
+    if cache_key is not None:
+        cache.set(cache_key, pose)
+
+    return pose
+
+
+def _gloss_to_pose(glosses: Gloss,
+                   pose_lookup: PoseLookup,
+                   spoken_language: str,
+                   signed_language: str,
+                   source: str,
+                   anonymize: Union[bool, Pose],
+                   enable_expressions: bool) -> Pose:
+    poses = list(_lookup_poses(glosses, pose_lookup, spoken_language, signed_language, source, anonymize,
+                               enable_expressions))
+
+    # Concatenate the poses to create a single pose
+    return concatenate_poses(poses)
 
-    # Add facial expressions to each pose
-    if enable_expressions:
-        poses = [add_facial_expressions(pose, str(gloss), enable_expressions) for pose, gloss in zip(poses, glosses)]
 
-    # Anonymize poses
+def stream_gloss_to_pose(glosses: Gloss,
+                         pose_lookup: PoseLookup,
+                         spoken_language: str,
+                         signed_language: str,
+                         source: str = None,
+                         anonymize: Union[bool, Pose] = False,
+                         enable_expressions: bool = True,
+                         lookahead: Optional[int] = 2) -> Iterator[Pose]:
+    """
+    Same as gloss_to_pose, but yields chunks of frames as soon as they are final, so playback can start early.
+    To bound the latency, `lookahead` limits how many signs to wait for points missing in the current one, so frames
+    do not wait for every lookup. Points missing for longer are considered gone, where gloss_to_pose interpolates them.
+    With lookahead=None, the concatenated chunks are the same as the gloss_to_pose result.
+    """
+    poses = _lookup_poses(glosses, pose_lookup, spoken_language, signed_language, source, anonymize,
+                          enable_expressions)
+    yield from stream_concatenate_poses(poses, lookahead=lookahead)
+
+
+def _lookup_poses(glosses: Gloss,
+                  pose_lookup: PoseLookup,
+                  spoken_language: str,
+                  signed_language: str,
+                  source: str,
+                  anonymize: Union[bool, Pose],
+                  enable_expressions: bool) -> Iterator[Pose]:
     if anonymize:
         try:
             from pose_anonymization.appearance import remove_appearance, transfer_appearance
@@ -32,10 +97,28 @@ def gloss_to_pose(glosses: Gloss,
 
         if isinstance(anonymize, Pose):
             print("Transferring appearance...")
-            poses = [transfer_appearance(pose, anonymize) for pose in poses]
         else:
             print("Removing appearance...")
-            poses = [remove_appearance(pose) for pose in poses]
 
-    # Concatenate the poses to create a single pose
-    return concatenate_poses(poses)
+    # Prepared lexicon entries already include the per-pose steps of concatenate_poses, with facial expressions.
+    # Anonymization needs the original poses.
+    prepared = enable_expressions and not anonymize and ConcatenationSettings.is_reduce_holistic
+
+    # Transform the glosses into poses, in order, as soon as they are looked up
+    for pose, gloss in pose_lookup.lookup_sequence_stream(glosses, spoken_language, signed_language, source,
+                                                          prepared=prepared):
+        # Add facial expressions to each pose
+        if enable_expressions:
+            if isinstance(pose, PreparedPose):
+                pose = pose.with_facial_expressions(str(gloss))
+            else:
+                pose = add_facial_expressions(pose, str(gloss), enable_expressions)
+
+        # Anonymize poses
+        if anonymize:
+            if isinstance(anonymize, Pose):
+                pose = transfer_appearance(pose, anonymize)
+            else:
+                pose = remove_appearance(pose)
+
+        yield pose
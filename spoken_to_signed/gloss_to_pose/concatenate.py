@@ -1,19 +1,111 @@
-from typing import List, Tuple
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 import numpy as np
 from pose_format import Pose
+from pose_format.pose import distance_batch
+from pose_format.pose_header import PoseHeader
 from pose_format.utils.generic import reduce_holistic, correct_wrists, pose_normalization_info, normalize_pose_size
 
+from spoken_to_signed.facial_expressions import add_facial_expressions, expression_category, face_template
 from spoken_to_signed.gloss_to_pose.smoothing import smooth_concatenate_poses
 
 class ConcatenationSettings:
     is_reduce_holistic = True
+    # Executor for the per-pose steps (reduce, normalize, trim): None (serial), "thread" or "process"
+    executor = None
+    # Number of workers of the executor, None for the number of cores
+    workers = None
+
+
+# Executors are shared across calls, by kind and number of workers
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor() -> Optional[Executor]:
+    kind = ConcatenationSettings.executor
+    if kind is None:
+        return None
+    if kind not in ("thread", "process"):
+        raise ValueError(f"Unknown executor {kind}, expected 'thread' or 'process'")
+
+    key = (kind, ConcatenationSettings.workers)
+    with _executors_lock:
+        if key not in _executors:
+            if kind == "thread":
+                _executors[key] = ThreadPoolExecutor(max_workers=ConcatenationSettings.workers,
+                                                     thread_name_prefix="concatenate")
+            else:
+                _executors[key] = ProcessPoolExecutor(max_workers=ConcatenationSettings.workers)
+        return _executors[key]
+
+
+# The per-pose steps of concatenate_poses, applied ahead of time by prepare_pose
+PREPARED_TRANSFORMS = ["facial_expressions", "reduce_holistic", "normalize_pose", "signing_boundary"]
+
+
+class PreparedPose(Pose):
+    """
+    A lexicon pose on which the per-pose steps of concatenate_poses were already applied (see prepare_pose).
+    It keeps the normalization that was applied, to place facial expressions in the same coordinates.
+    Descriptors (optional) are the per-frame connection descriptors, computed once per lexicon entry.
+    """
+
+    def __init__(self, header: PoseHeader, body, center: List[float], scale: float, boundary: Tuple[int, int],
+                 descriptors: Optional[np.ndarray] = None):
+        super().__init__(header, body)
+        self.center = center
+        self.scale = scale
+        self.boundary = boundary
+        self.descriptors = descriptors
+
+    def with_facial_expressions(self, gloss: str) -> "PreparedPose":
+        template = face_template(*expression_category(gloss))
+        # Same operations as normalize_pose, so the face is identical to a pose normalized at request time
+        normalized_template = (template - np.array(self.center)) * self.scale
+
+        pose = add_facial_expressions(self, gloss)
+        face_idx = [c.name for c in pose.header.components].index("FACE")
+        start_idx = sum(len(c.points) for c in pose.header.components[:face_idx])
+        pose.body.data[:, :, start_idx:start_idx + len(template)] = normalized_template
+
+        # The face is not part of the connection descriptors
+        return PreparedPose(pose.header, pose.body, self.center, self.scale, self.boundary, self.descriptors)
 
 
 def normalize_pose(pose: Pose) -> Pose:
     return pose.normalize(pose_normalization_info(pose.header))
 
 
+def normalization_transform(pose: Pose) -> Tuple[np.ndarray, float]:
+    # Same computation as Pose.normalize, which does not expose the center and scale it applies
+    info = pose_normalization_info(pose.header)
+    transposed = pose.body.points_perspective()
+    p1s = transposed[info.p1]
+    p2s = transposed[info.p2]
+
+    center = ((p2s + p1s) / 2).mean(axis=(0, 1))
+    scale = 1 / distance_batch(p1s, p2s).mean()
+    return center, scale
+
+
+def prepare_pose(pose: Pose) -> PreparedPose:
+    """Apply the per-pose steps of concatenate_poses (with neutral facial expressions), which only depend on the pose"""
+    pose = add_facial_expressions(pose, "")
+    if ConcatenationSettings.is_reduce_holistic:
+        pose = reduce_holistic(pose)
+
+    center, scale = normalization_transform(pose)
+    pose.body.data -= center
+    pose.body.data = pose.body.data * scale
+
+    first_frame, last_frame = get_pose_boundary(pose)
+    return PreparedPose(pose.header, pose.body, np.ma.getdata(center).tolist(), float(scale),
+                        (int(first_frame), int(last_frame)))
+
+
 def get_signing_boundary(pose: Pose, wrist_index: int, elbow_index: int) -> Tuple[int, int]:
     # Ideally, this could use a sign language detection model.
 
@@ -33,10 +125,7 @@ def get_signing_boundary(pose: Pose, wrist_index: int, elbow_index: int) -> Tupl
     return (max(first_non_zero_index, first_active_frame - 5),
             min(last_non_zero_index, last_active_frame + 5))
 
-def trim_pose(pose, start=True, end=True):
-    if len(pose.body.data) == 0:
-        raise ValueError("Cannot trim an empty pose")
-
+def get_pose_boundary(pose: Pose) -> Tuple[int, int]:
     first_frame = len(pose.body.data)
     last_frame = 0
 
@@ -48,6 +137,18 @@ def trim_pose(pose, start=True, end=True):
         first_frame = min(first_frame, boundary_start)
         last_frame = max(last_frame, boundary_end)
 
+    return first_frame, last_frame
+
+
+def trim_pose(pose, start=True, end=True):
+    if len(pose.body.data) == 0:
+        raise ValueError("Cannot trim an empty pose")
+
+    if isinstance(pose, PreparedPose):
+        first_frame, last_frame = pose.boundary
+    else:
+        first_frame, last_frame = get_pose_boundary(pose)
+
     if not start:
         first_frame = 0
     if not end:
@@ -55,21 +156,41 @@ def trim_pose(pose, start=True, end=True):
 
     pose.body.data = pose.body.data[first_frame:last_frame]
     pose.body.confidence = pose.body.confidence[first_frame:last_frame]
+    if isinstance(pose, PreparedPose) and pose.descriptors is not None:
+        pose.descriptors = pose.descriptors[first_frame:last_frame]
     return pose
 
 
-def concatenate_poses(poses: List[Pose], trim=True) -> Pose:
-    if ConcatenationSettings.is_reduce_holistic:
-        print('Reducing poses...')
-        poses = [reduce_holistic(p) for p in poses]
-
-    print('Normalizing poses...')
-    poses = [normalize_pose(p) for p in poses]
+def preprocess_pose(pose: Pose, is_reduce_holistic: bool, start: Optional[bool], end: Optional[bool]) -> Pose:
+    # Prepared poses were already reduced and normalized when the lexicon was prepared
+    if not isinstance(pose, PreparedPose):
+        if is_reduce_holistic:
+            pose = reduce_holistic(pose)
+        pose = normalize_pose(pose)
 
     # Trim the poses to only include the parts where the hands are visible
-    if trim:
-        print('Trimming poses...')
-        poses = [trim_pose(p, i > 0, i < len(poses) - 1) for i, p in enumerate(poses)]
+    if start is not None:
+        pose = trim_pose(pose, start, end)
+    return pose
+
+
+def preprocess_poses(poses: List[Pose], trim=True) -> List[Pose]:
+    """Apply the per-pose steps of concatenate_poses, in parallel if ConcatenationSettings.executor is set"""
+    # Settings are passed explicitly, as process workers don't share them
+    arguments = [(pose, ConcatenationSettings.is_reduce_holistic,
+                  i > 0 if trim else None, i < len(poses) - 1 if trim else None)
+                 for i, pose in enumerate(poses)]
+
+    executor = get_executor()
+    if executor is None or len(poses) < 2:
+        return [preprocess_pose(*args) for args in arguments]
+    # map keeps the order of the poses
+    return list(executor.map(preprocess_pose, *zip(*arguments)))
+
+
+def concatenate_poses(poses: List[Pose], trim=True) -> Pose:
+    print('Preprocessing poses...')
+    poses = preprocess_poses(poses, trim=trim)
 
     # Concatenate all poses
     print('Smooth concatenating poses...')
@@ -0,0 +1,18 @@
+import numpy as np
+
+from spoken_to_signed.gloss_to_pose.concatenate import ConcatenationSettings, concatenate_poses
+
+
+def test_concatenate_poses_with_executor_matches_serial(load_poses):
+    expected = concatenate_poses(load_poses())
+
+    ConcatenationSettings.executor = "thread"
+    ConcatenationSettings.workers = 3
+    try:
+        actual = concatenate_poses(load_poses())
+    finally:
+        ConcatenationSettings.executor = None
+        ConcatenationSettings.workers = None
+
+    np.testing.assert_array_equal(np.ma.getdata(actual.body.data), np.ma.getdata(expected.body.data))
+    np.testing.assert_array_equal(actual.body.confidence, expected.body.confidence)
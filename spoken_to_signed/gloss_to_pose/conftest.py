@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+from pose_format import Pose
+
+FINGERSPELLING_DIRECTORY = Path(__file__).parent.parent / "assets" / "fingerspelling_lexicon"
+# Consecutive letters, concatenated like a fingerspelled word
+POSE_NAMES = [
+    "ase/fs-stse28e9ac023b0e29ca0a3acc12dc46540.pose",
+    "ase/fs-stsf6361531b087bba7e2d9f561cfd3bada.pose",
+    "ase/fs-sts203d382660b73b889208b3e5838967e4.pose",
+    "ase/fs-sts73570c5e25f984f10e3bccfdf608ae48.pose",
+]
+
+
+def read_pose(name: str) -> Pose:
+    with open(FINGERSPELLING_DIRECTORY / name, "rb") as f:
+        return Pose.read(f.read())
+
+
+@pytest.fixture
+def load_pose():
+    """Reads a fingerspelling lexicon pose by path, a new copy on every call"""
+    return read_pose
+
+
+@pytest.fixture
+def load_poses():
+    """Reads the POSE_NAMES poses, new copies on every call, as the pipeline modifies poses in place"""
+    return lambda: [read_pose(name) for name in POSE_NAMES]
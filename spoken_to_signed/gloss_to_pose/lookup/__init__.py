@@ -1,2 +1,5 @@
 from .lookup import PoseLookup
 from .csv_lookup import CSVPoseLookup
+from .pose_cache import PoseCache
+from .compiled_index import CompiledIndex
+from .packed_storage import PackedPoseStorage
@@ -0,0 +1,240 @@
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# The compiled index is a single file, written next to index.csv:
+#   MAGIC | header length (uint64) | JSON header | padding | arrays (each aligned to 8 bytes)
+# The JSON header describes the source file it was built from, the language pairs, and where each array is stored.
+# Strings (paths, words, glosses and their lowercase forms) are interned in a sorted table, so rows only store ids.
+# Every term index is a sorted array of (language pair, lowercase term id) keys, and the rows they point to.
+MAGIC = b"S2SIDX01"
+COMPILED_INDEX_NAME = "index.bin"
+INDEX_TERMS = ("words", "glosses")
+ALIGNMENT = 8
+
+
+def file_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def source_info(csv_path: str, with_hash: bool = True) -> Dict[str, Union[int, str]]:
+    stat = os.stat(csv_path)
+    info = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        info["sha1"] = file_sha1(csv_path)
+    return info
+
+
+def compile_index(rows: List[Dict[str, str]], source: Dict[str, Union[int, str]]) -> bytes:
+    pairs = sorted({(row['spoken_language'], row['signed_language']) for row in rows})
+    pair_ids = {pair: i for i, pair in enumerate(pairs)}
+
+    # Intern all strings, sorted by their utf-8 encoding to allow binary search when loaded
+    strings = set()
+    for row in rows:
+        strings.add(row['path'])
+        for based_on in INDEX_TERMS:
+            strings.add(row[based_on])
+            strings.add(row[based_on].lower())
+    encoded_strings = sorted(s.encode('utf-8') for s in strings)
+    string_ids = {s.decode('utf-8'): i for i, s in enumerate(encoded_strings)}
+
+    arrays = {
+        "strings_offsets": np.cumsum([0] + [len(s) for s in encoded_strings], dtype=np.int64),
+        "strings_data": np.frombuffer(b"".join(encoded_strings), dtype=np.uint8),
+        "pair": np.array([pair_ids[(row['spoken_language'], row['signed_language'])] for row in rows], dtype=np.int32),
+        "path": np.array([string_ids[row['path']] for row in rows], dtype=np.int32),
+        "start": np.array([int(row['start']) for row in rows], dtype=np.int64),
+        "end": np.array([int(row['end']) for row in rows], dtype=np.int64),
+        "priority": np.array([int(row['priority']) for row in rows], dtype=np.int64),
+    }
+    for based_on in INDEX_TERMS:
+        arrays[based_on] = np.array([string_ids[row[based_on]] for row in rows], dtype=np.int32)
+
+        keys = (arrays["pair"].astype(np.int64) << 32) | np.array(
+            [string_ids[row[based_on].lower()] for row in rows], dtype=np.int64)
+        # A stable sort keeps rows of the same term in the order of the csv file
+        order = np.argsort(keys, kind="stable")
+        arrays[f"{based_on}_keys"] = keys[order]
+        arrays[f"{based_on}_rows"] = order.astype(np.int32)
+
+    header = {"source": source, "pairs": pairs, "rows": len(rows), "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b" " * (-(len(MAGIC) + 8 + len(header_bytes)) % ALIGNMENT)
+
+    buffer = io.BytesIO()
+    buffer.write(MAGIC)
+    buffer.write(struct.pack("<Q", len(header_bytes)))
+    buffer.write(header_bytes)
+    for array in arrays.values():
+        buffer.write(array.tobytes())
+        buffer.write(b"\0" * (-array.nbytes % ALIGNMENT))
+    return buffer.getvalue()
+
+
+class CompiledIndex:
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self.buffer = buffer
+
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a compiled lexicon index")
+        (header_length,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+        data_start = len(MAGIC) + 8 + header_length
+        self.header = json.loads(bytes(buffer[len(MAGIC) + 8:data_start]).decode('utf-8'))
+
+        self.arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            self.arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec["offset"])
+
+        self.pairs = [tuple(pair) for pair in self.header["pairs"]]
+        self.num_strings = len(self.arrays["strings_offsets"]) - 1
+
+    @property
+    def version(self) -> str:
+        return self.header["source"]["sha1"]
+
+    def languages(self) -> List[Tuple[str, str]]:
+        return list(self.pairs)
+
+    def string(self, string_id: int) -> str:
+        offsets = self.arrays["strings_offsets"]
+        return self.arrays["strings_data"][offsets[string_id]:offsets[string_id + 1]].tobytes().decode('utf-8')
+
+    def string_id(self, value: str) -> Optional[int]:
+        # Binary search in the sorted string table
+        encoded = value.encode('utf-8')
+        offsets = self.arrays["strings_offsets"]
+        data = self.arrays["strings_data"]
+        low, high = 0, self.num_strings
+        while low < high:
+            middle = (low + high) // 2
+            if data[offsets[middle]:offsets[middle + 1]].tobytes() < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.num_strings and data[offsets[low]:offsets[low + 1]].tobytes() == encoded:
+            return low
+        return None
+
+    def row(self, row_id: int, based_on: str) -> dict:
+        return {
+            "path": self.string(self.arrays["path"][row_id]),
+            "term": self.string(self.arrays[based_on][row_id]),
+            "start": int(self.arrays["start"][row_id]),
+            "end": int(self.arrays["end"][row_id]),
+            "priority": int(self.arrays["priority"][row_id]),
+        }
+
+    def dictionary_index(self, based_on: str) -> Dict[str, Dict[str, "CompiledTerms"]]:
+        # Same shape as PoseLookup.make_dictionary_index: spoken language -> signed language -> term -> rows
+        languages_dict = {}
+        for pair_id, (spoken_language, signed_language) in enumerate(self.pairs):
+            languages_dict.setdefault(spoken_language, {})[signed_language] = CompiledTerms(self, based_on, pair_id)
+        return languages_dict
+
+    @classmethod
+    def build(cls, csv_path: str) -> "CompiledIndex":
+        with open(csv_path, mode='r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        return cls(compile_index(rows, source_info(csv_path)))
+
+    @classmethod
+    def load(cls, index_path: str) -> "CompiledIndex":
+        with open(index_path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def load_or_build(cls, csv_path: str, index_path: str = None) -> "CompiledIndex":
+        """Load the compiled index next to index.csv, and (re)build it if it is missing or outdated."""
+        if index_path is None:
+            index_path = os.path.join(os.path.dirname(csv_path), COMPILED_INDEX_NAME)
+
+        if os.path.exists(index_path):
+            try:
+                index = cls.load(index_path)
+                if index.is_up_to_date(csv_path):
+                    return index
+            except ValueError:
+                pass  # Unreadable index, rebuild it
+
+        index = cls.build(csv_path)
+        try:
+            # Write atomically, as multiple processes may build the index at the same time
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(index.buffer)
+            os.replace(tmp_path, index_path)
+            return cls.load(index_path)
+        except OSError as e:
+            # e.g. a read-only installation directory, keep the index in memory
+            print(f"Could not write compiled index to {index_path}: {e}")
+            return index
+
+    def is_up_to_date(self, csv_path: str) -> bool:
+        source = self.header["source"]
+        current = source_info(csv_path, with_hash=False)
+        if current["size"] != source["size"]:
+            return False
+        if current["mtime_ns"] == source["mtime_ns"]:
+            return True
+        # The file was touched, but its content might not have changed
+        return file_sha1(csv_path) == source["sha1"]
+
+
+class CompiledTerms(Mapping):
+    """Lowercase term -> rows, for a single language pair of a compiled index"""
+
+    def __init__(self, index: CompiledIndex, based_on: str, pair_id: int):
+        self.index = index
+        self.based_on = based_on
+
+        self.term_keys = index.arrays[f"{based_on}_keys"]
+        self.term_rows = index.arrays[f"{based_on}_rows"]
+        self.pair_key = pair_id << 32
+        self.low, self.high = np.searchsorted(self.term_keys, [self.pair_key, (pair_id + 1) << 32])
+
+    def _range(self, term: str) -> Tuple[int, int]:
+        if not isinstance(term, str):
+            return 0, 0
+        string_id = self.index.string_id(term)
+        if string_id is None:
+            return 0, 0
+        key = self.pair_key | string_id
+        return np.searchsorted(self.term_keys, key, side="left"), np.searchsorted(self.term_keys, key, side="right")
+
+    def __getitem__(self, term: str) -> List[dict]:
+        low, high = self._range(term)
+        if low == high:
+            raise KeyError(term)
+        return [self.index.row(row_id, self.based_on) for row_id in self.term_rows[low:high]]
+
+    def __contains__(self, term) -> bool:
+        low, high = self._range(term)
+        return low != high
+
+    def __iter__(self):
+        string_ids = np.unique(self.term_keys[self.low:self.high] & 0xFFFFFFFF)
+        return (self.index.string(string_id) for string_id in string_ids)
+
+    def __len__(self) -> int:
+        return len(np.unique(self.term_keys[self.low:self.high]))
@@ -0,0 +1,73 @@
+import os
+import shutil
+
+from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup, compiled_index
+from spoken_to_signed.gloss_to_pose.lookup.compiled_index import COMPILED_INDEX_NAME, CompiledIndex
+
+DUMMY_LEXICON = os.path.join(os.path.dirname(__file__), "..", "..", "..", "assets", "dummy_lexicon")
+HEADER = "path,spoken_language,signed_language,start,end,words,glosses,priority\n"
+
+
+def copy_lexicon(tmp_path) -> str:
+    directory = tmp_path / "lexicon"
+    shutil.copytree(DUMMY_LEXICON, directory, ignore=shutil.ignore_patterns(COMPILED_INDEX_NAME, "packed", "prepared"))
+    return str(directory)
+
+
+def as_dict(index) -> dict:
+    return {spoken: {signed: {term: rows for term, rows in terms.items()} for signed, terms in signed_languages.items()}
+            for spoken, signed_languages in index.items()}
+
+
+def test_compiled_index_matches_dictionary_index(tmp_path):
+    directory = copy_lexicon(tmp_path)
+    compiled = CSVPoseLookup(directory, compiled=True, packed=False, prepared=False)
+    parsed = CSVPoseLookup(directory, compiled=False, packed=False, prepared=False)
+
+    for based_on in ["words_index", "glosses_index"]:
+        expected = as_dict(getattr(parsed, based_on))
+        assert len(expected["de"]["sgg"]) == 4
+        assert as_dict(getattr(compiled, based_on)) == expected
+    assert "KLEINE" not in compiled.words_index["de"]["sgg"]  # Terms are lowercase
+    assert compiled.index_version == parsed.index_version
+
+
+def test_editing_index_csv_rebuilds_the_compiled_index(tmp_path):
+    directory = copy_lexicon(tmp_path)
+    csv_path = os.path.join(directory, "index.csv")
+    index_path = os.path.join(directory, COMPILED_INDEX_NAME)
+    index = CompiledIndex.load_or_build(csv_path)
+    assert os.path.exists(index_path)
+    assert "gross" not in index.dictionary_index("words")["de"]["sgg"]
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("sgg/kleine.pose,de,sgg,0,0,gross,Gross,0\n")
+    index = CompiledIndex.load_or_build(csv_path)
+    assert "gross" in index.dictionary_index("words")["de"]["sgg"]
+    assert index.is_up_to_date(csv_path)
+
+    # Touched without changing, the index is current and not rebuilt
+    built_at = os.stat(index_path).st_mtime_ns
+    os.utime(csv_path, ns=(1, 1))
+    assert CompiledIndex.load_or_build(csv_path).version == index.version
+    assert os.stat(index_path).st_mtime_ns == built_at
+
+
+def test_empty_index_loads(tmp_path):
+    with open(tmp_path / "index.csv", "w", encoding="utf-8") as f:
+        f.write(HEADER)
+    lookup = CSVPoseLookup(str(tmp_path), packed=False, prepared=False)
+    assert dict(lookup.words_index) == {}
+
+
+def test_unwritable_directory_keeps_the_index_in_memory(tmp_path, monkeypatch, capsys):
+    directory = copy_lexicon(tmp_path)
+
+    def mkstemp(*args, **kwargs):
+        raise PermissionError("Read-only file system")
+
+    monkeypatch.setattr(compiled_index.tempfile, "mkstemp", mkstemp)
+    index = CompiledIndex.load_or_build(os.path.join(directory, "index.csv"))
+    assert "Could not write compiled index" in capsys.readouterr().out
+    assert not os.path.exists(os.path.join(directory, COMPILED_INDEX_NAME))
+    assert "kleine" in index.dictionary_index("words")["de"]["sgg"]
@@ -1,15 +1,49 @@
 import csv
 import os
 
+from .compiled_index import CompiledIndex, file_sha1
+from .index_manifest import file_versions
 from .lookup import PoseLookup
+from .packed_storage import PACKED_DIRECTORY_NAME, PackedPoseStorage
+from .pose_cache import PoseCache
+from .prepared_lexicon import PREPARED_DIRECTORY_NAME, is_up_to_date
 
 
 class CSVPoseLookup(PoseLookup):
-    def __init__(self, directory: str, backup: PoseLookup = None):
+    def __init__(self,
+                 directory: str,
+                 backup: PoseLookup = None,
+                 cache: PoseCache = None,
+                 compiled: bool = True,
+                 packed: bool = True,
+                 prepared: bool = True):
         if not os.path.exists(directory):
             raise ValueError(f"Directory {directory} does not exist")
 
-        with open(os.path.join(directory, 'index.csv'), mode='r', encoding='utf-8') as f:
-            rows = list(csv.DictReader(f))
+        # If the lexicon was packed (see packed_storage.py), read poses from the memory mapped storage
+        storage = None
+        packed_directory = os.path.join(directory, PACKED_DIRECTORY_NAME)
+        if packed and os.path.exists(os.path.join(packed_directory, "table.json")):
+            storage = PackedPoseStorage(packed_directory)
 
-        super().__init__(rows=rows, directory=directory, backup=backup)
+        index_path = os.path.join(directory, 'index.csv')
+        if compiled:
+            # Parsing the csv on every start is slow for large lexicons, so we compile it once and memory map it
+            index = CompiledIndex.load_or_build(index_path)
+            super().__init__(rows=None, directory=directory, backup=backup, cache=cache, index=index, storage=storage)
+        else:
+            with open(index_path, mode='r', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+
+            super().__init__(rows=rows, directory=directory, backup=backup, cache=cache, storage=storage)
+            self.index_version = file_sha1(index_path)
+
+        # If the lexicon was prepared (see prepared_lexicon.py) for this version of the index, use prepared entries
+        prepared_directory = os.path.join(directory, PREPARED_DIRECTORY_NAME)
+        if prepared and os.path.exists(prepared_directory):
+            if is_up_to_date(prepared_directory, self.index_version):
+                self.prepared_storage = PackedPoseStorage(prepared_directory)
+                # Prepared entries record the hash of their pose file, entries of changed files are ignored
+                self.source_versions = file_versions(directory)
+            else:
+                print(f"Prepared lexicon {prepared_directory} is outdated, ignoring it. Run prepare_lexicon to update.")
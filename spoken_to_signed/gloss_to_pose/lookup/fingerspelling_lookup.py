@@ -1,42 +1,74 @@
 from pathlib import Path
+from typing import Dict, List
 
 from pose_format import Pose
 
 from .. import CSVPoseLookup, concatenate_poses
+from .pose_cache import PoseCache
+
+# Marks the end of an alphabet key in the trie, can't collide with a character
+TRIE_KEY = None
+
+
+def make_trie(alphabet) -> Dict:
+    trie = {}
+    for key in alphabet:
+        node = trie
+        for character in key:
+            node = node.setdefault(character, {})
+        node[TRIE_KEY] = key
+    return trie
 
 
 class FingerspellingPoseLookup(CSVPoseLookup):
-    def __init__(self):
+    def __init__(self, word_cache: PoseCache = None):
         fs_directory = Path(__file__).parent.parent.parent / "assets" / "fingerspelling_lexicon"
 
         super().__init__(directory=str(fs_directory))
 
-        # Precompute the sorted alphabets to make the lookup faster
-        self.alphabets = {
+        # Precompute a trie of the alphabet of every language pair, to segment words in a single pass
+        self.tries = {
             spoken_language: {
-                signed_language: sorted(si_values.keys(), key=len, reverse=True)
+                signed_language: make_trie(si_values.keys())
                 for signed_language, si_values in sp_values.items()
             }
             for spoken_language, sp_values in self.words_index.items()
         }
 
-    def characters_lookup(self, word: str, spoken_language: str, signed_language: str):
-        if word != "":
-            rows = self.words_index[spoken_language][signed_language]
-            alphabet = self.alphabets[spoken_language][signed_language]
-            found = False
-            for key in alphabet:
-                if key in word:
-                    found = True
-                    match_index = word.index(key)
-
-                    yield from self.characters_lookup(word[:match_index], spoken_language, signed_language)
-                    yield self.get_pose(rows[key][0])
-                    yield from self.characters_lookup(word[match_index + len(key):], spoken_language, signed_language)
+        # Names and unknown words repeat a lot, so we keep the assembled words, and the stretched last letters
+        self.word_cache = word_cache if word_cache is not None else PoseCache(max_bytes=128 * 1024 * 1024)
+        self.stretched_cache = PoseCache(max_bytes=64 * 1024 * 1024)
+
+    def segment(self, word: str, spoken_language: str, signed_language: str) -> List[str]:
+        """Split a word into alphabet keys, always taking the longest key that matches (e.g. "sch" over "s")"""
+        trie = self.tries[spoken_language][signed_language]
+
+        keys = []
+        start = 0
+        while start < len(word):
+            node = trie
+            match = None
+            for character in word[start:]:
+                if character not in node:
                     break
+                node = node[character]
+                match = node.get(TRIE_KEY, match)
 
-            if not found:
-                raise FileNotFoundError(f"Characters {word} not found in fingerspelling lexicon")
+            if match is None:
+                raise FileNotFoundError(f"Characters {word[start:]} not found in fingerspelling lexicon")
+
+            keys.append(match)
+            start += len(match)
+
+        return keys
+
+    def characters_rows(self, word: str, spoken_language: str, signed_language: str) -> List[dict]:
+        rows = self.words_index[spoken_language][signed_language]
+        return [rows[key][0] for key in self.segment(word, spoken_language, signed_language)]
+
+    def characters_lookup(self, word: str, spoken_language: str, signed_language: str):
+        for row in self.characters_rows(word, spoken_language, signed_language):
+            yield self.get_pose(row)
 
     def stretch_pose(self, pose: Pose, by: float) -> Pose:
         fps = pose.body.fps
@@ -44,14 +76,27 @@ class FingerspellingPoseLookup(CSVPoseLookup):
         pose.body.fps = fps
         return pose
 
-    def lookup(self, word: str, gloss: str, spoken_language: str, signed_language: str, source: str = None) -> Pose:
-        if spoken_language not in self.words_index or signed_language not in self.words_index[spoken_language]:
-            raise FileNotFoundError(
-                f"Language pair {spoken_language} -> {signed_language} not supported for fingerspelling")
+    def get_stretched_pose(self, row) -> Pose:
+        key = (row["path"], row["start"], row["end"])
+        pose = self.stretched_cache.get_or_load(key, lambda: self.stretch_pose(self.get_pose(row), 2))
+        return Pose(pose.header, pose.body.copy())
 
-        poses = list(self.characters_lookup(word.lower(), spoken_language, signed_language))
+    def assemble_word(self, word: str, spoken_language: str, signed_language: str) -> Pose:
+        rows = self.characters_rows(word, spoken_language, signed_language)
 
+        poses = [self.get_pose(row) for row in rows[:-1]]
         # hold the last letters longer to make it more readable
-        poses[-1] = self.stretch_pose(poses[-1], 2)
+        poses.append(self.get_stretched_pose(rows[-1]))
 
         return concatenate_poses(poses)
+
+    def lookup(self, word: str, gloss: str, spoken_language: str, signed_language: str, source: str = None) -> Pose:
+        if spoken_language not in self.words_index or signed_language not in self.words_index[spoken_language]:
+            raise FileNotFoundError(
+                f"Language pair {spoken_language} -> {signed_language} not supported for fingerspelling")
+
+        word = word.lower()
+        pose = self.word_cache.get_or_load((word, spoken_language, signed_language),
+                                           lambda: self.assemble_word(word, spoken_language, signed_language))
+        # The caller may modify the pose in place, so it gets its own copy of the cached data
+        return Pose(pose.header, pose.body.copy())
@@ -0,0 +1,151 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from spoken_to_signed.gloss_to_pose.lookup.compiled_index import file_sha1
+
+# Incremental maintenance of a lexicon index.csv, for lexicons whose rows are derived from files (e.g. one row per
+# video, or the rows of data.csv for pose files). A manifest next to index.csv records the size, modification time and
+# hash of every file (and of the sources rows are derived from, and of index.csv itself), so a refresh only hashes
+# files that were touched, and when nothing was added, removed or changed, rows are not derived nor written again.
+# The manifest also gives downstream caches (e.g. prepared lexicons) a version per entry, see `file_versions`.
+MANIFEST_NAME = "index.manifest.json"
+MANIFEST_VERSION = 1
+
+FileInfo = Dict[str, object]  # {"size": int, "mtime_ns": int, "sha1": str}
+
+
+def load_manifest(lexicon_directory: str) -> dict:
+    path = os.path.join(lexicon_directory, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "files": {}, "sources": {}}
+
+
+def file_versions(lexicon_directory: str) -> Dict[str, str]:
+    """Hash of every file listed in the manifest, by path relative to the lexicon directory"""
+    return {path: info["sha1"] for path, info in load_manifest(lexicon_directory)["files"].items()}
+
+
+def content_version(lexicon_directory: str) -> Optional[str]:
+    """
+    Identifies the content of the files listed in the manifest, None without a manifest.
+    Hashes come from the last refresh, so no file is read, and edits show once the index is refreshed.
+    """
+    files = load_manifest(lexicon_directory)["files"]
+    if len(files) == 0:
+        return None
+    sha1 = hashlib.sha1()
+    for path in sorted(files.keys()):
+        sha1.update(f"{path}:{files[path]['sha1']}\n".encode("utf-8"))
+    return sha1.hexdigest()
+
+
+def write_atomic(path: str, write: Callable):
+    # Readers see either the previous or the new file, never a partially written one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def file_info(path: str, previous: Optional[FileInfo]) -> FileInfo:
+    stat = os.stat(path)
+    if previous is not None and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return previous  # Unchanged since the last scan, no need to read the file
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": file_sha1(path)}
+
+
+def scan_files(lexicon_directory: str, directories: Iterable[str], extensions: Tuple[str, ...],
+               previous: Dict[str, FileInfo]) -> Dict[str, FileInfo]:
+    files = {}
+    for directory in directories:
+        for root, _, names in os.walk(os.path.join(lexicon_directory, directory)):
+            for name in sorted(names):
+                if name.endswith(extensions):
+                    full_path = os.path.join(root, name)
+                    path = os.path.relpath(full_path, lexicon_directory).replace(os.sep, "/")
+                    files[path] = file_info(full_path, previous.get(path))
+    return files
+
+
+def read_index(index_path: str) -> Tuple[List[str], List[dict]]:
+    if not os.path.exists(index_path):
+        return [], []
+    with open(index_path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames or []), list(reader)
+
+
+def index_text(fieldnames: List[str], rows: List[dict], lineterminator: str = "\n") -> str:
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=fieldnames, lineterminator=lineterminator)
+    writer.writeheader()
+    writer.writerows(rows)
+    return text.getvalue()
+
+
+def update_index(lexicon_directory: str,
+                 directories: Iterable[str],
+                 extensions: Tuple[str, ...],
+                 derive_rows: Callable[[], List[dict]],
+                 fieldnames: List[str],
+                 sources: Dict[str, str] = None,
+                 lineterminator: str = "\n") -> Dict[str, int]:
+    """
+    Refresh index.csv with the rows from `derive_rows`, tracking the files under `directories` (relative to the
+    lexicon directory) in the manifest.
+    `sources` (name -> hash) identify anything else rows are derived from, e.g. data.csv.
+    Rows are only derived, and index.csv only written, when a file was added, removed or changed, a source changed,
+    or index.csv is not the one written by the last refresh.
+    """
+    index_path = os.path.join(lexicon_directory, "index.csv")
+    manifest = load_manifest(lexicon_directory)
+    previous_files = manifest["files"]
+    sources = sources if sources is not None else {}
+
+    files = scan_files(lexicon_directory, directories, extensions, previous_files)
+    added = files.keys() - previous_files.keys()
+    removed = previous_files.keys() - files.keys()
+    changed = {path for path in files.keys() & previous_files.keys()
+               if files[path]["sha1"] != previous_files[path]["sha1"]}
+
+    previous_index = manifest.get("index")
+    index = file_info(index_path, previous_index) if os.path.exists(index_path) else None
+    up_to_date = (not added and not removed and not changed and sources == manifest["sources"]
+                  and index is not None and previous_index is not None and index["sha1"] == previous_index["sha1"])
+
+    if up_to_date:
+        rows_count = manifest.get("rows", 0)
+        updated = False
+    else:
+        rows = derive_rows()
+        text = index_text(fieldnames, rows, lineterminator)
+        existing_text = None
+        if index is not None:
+            with open(index_path, "r", encoding="utf-8", newline="") as f:
+                existing_text = f.read()
+        updated = text != existing_text
+        if updated:
+            write_atomic(index_path, lambda f: f.write(text))
+            index = file_info(index_path, None)
+        rows_count = len(rows)
+
+    # The manifest is written last, so an interrupted refresh is redone on the next run
+    manifest = {"version": MANIFEST_VERSION, "files": files, "sources": sources, "index": index, "rows": rows_count}
+    write_atomic(os.path.join(lexicon_directory, MANIFEST_NAME),
+                 lambda f: json.dump(manifest, f, indent=1, sort_keys=True))
+
+    return {"files": len(files), "added": len(added), "removed": len(removed), "changed": len(changed),
+            "updated": int(updated), "rows": rows_count}
@@ -0,0 +1,76 @@
+import os
+
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import file_versions, read_index, update_index
+
+FIELDNAMES = ["path", "words"]
+
+
+def write_file(path, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def rows_from_directory(directory):
+    derived = []
+
+    def derive_rows():
+        derived.append(True)
+        return [{"path": f"poses/{name}", "words": os.path.splitext(name)[0]}
+                for name in sorted(os.listdir(directory / "poses"))]
+
+    return derive_rows, derived
+
+
+def test_update_index_only_derives_rows_after_changes(tmp_path):
+    write_file(tmp_path / "poses" / "a.pose", b"a")
+    write_file(tmp_path / "poses" / "b.pose", b"b")
+    derive_rows, derived = rows_from_directory(tmp_path)
+    summary = update_index(str(tmp_path), ["poses"], (".pose",), derive_rows, FIELDNAMES)
+    assert (summary["added"], summary["rows"], summary["updated"]) == (2, 2, 1)
+
+    # Touched without changes, nothing is derived nor written
+    index_path = str(tmp_path / "index.csv")
+    written_at = os.stat(index_path).st_mtime_ns
+    os.utime(tmp_path / "poses" / "a.pose", ns=(1, 1))
+    summary = update_index(str(tmp_path), ["poses"], (".pose",), derive_rows, FIELDNAMES)
+    assert (len(derived), summary["updated"], summary["rows"]) == (1, 0, 2)
+    assert os.stat(index_path).st_mtime_ns == written_at
+
+    os.remove(tmp_path / "poses" / "b.pose")
+    write_file(tmp_path / "poses" / "c.pose", b"c")
+    summary = update_index(str(tmp_path), ["poses"], (".pose",), derive_rows, FIELDNAMES)
+    assert (summary["added"], summary["removed"], summary["changed"]) == (1, 1, 0)
+    assert [row["path"] for row in read_index(index_path)[1]] == ["poses/a.pose", "poses/c.pose"]
+    assert set(file_versions(str(tmp_path)).keys()) == {"poses/a.pose", "poses/c.pose"}
+
+
+def test_update_index_keeps_derived_rows_of_missing_files(tmp_path):
+    write_file(tmp_path / "poses" / "a.pose", b"a")
+    write_file(tmp_path / "raw" / "poses" / "b.pose", b"b")
+    rows = [{"path": "poses/a.pose", "words": "a"}, {"path": "poses/missing.pose", "words": "missing"}]
+    update_index(str(tmp_path), ["poses"], (".pose",), lambda: rows, FIELDNAMES, sources={"data.csv": "1"})
+    assert read_index(str(tmp_path / "index.csv"))[1] == rows
+    # Only the listed directories are scanned
+    assert set(file_versions(str(tmp_path)).keys()) == {"poses/a.pose"}
+
+
+def test_update_index_rederives_rows_when_a_source_or_the_index_changes(tmp_path):
+    write_file(tmp_path / "poses" / "a.pose", b"a")
+    index_path = str(tmp_path / "index.csv")
+    update_index(str(tmp_path), ["poses"], (".pose",), lambda: [{"path": "poses/a.pose", "words": "a"}], FIELDNAMES,
+                 sources={"data.csv": "1"})
+
+    renamed = [{"path": "poses/a.pose", "words": "renamed"}]
+    summary = update_index(str(tmp_path), ["poses"], (".pose",), lambda: renamed, FIELDNAMES,
+                           sources={"data.csv": "2"})
+    assert summary["updated"] == 1
+    assert read_index(index_path)[1] == renamed
+
+    # Edited by hand, index.csv is written again
+    with open(index_path, "a", encoding="utf-8") as f:
+        f.write("poses/b.pose,b\n")
+    summary = update_index(str(tmp_path), ["poses"], (".pose",), lambda: renamed, FIELDNAMES,
+                           sources={"data.csv": "2"})
+    assert summary["updated"] == 1
+    assert read_index(index_path)[1] == renamed
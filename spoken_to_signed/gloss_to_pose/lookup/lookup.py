@@ -2,12 +2,17 @@ import math
 import os
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 from pose_format import Pose
 
+from spoken_to_signed.gloss_to_pose.concatenate import PreparedPose
 from spoken_to_signed.gloss_to_pose.languages import LANGUAGE_BACKUP
-from spoken_to_signed.gloss_to_pose.lookup.lru_cache import LRUCache
+from spoken_to_signed.gloss_to_pose.lookup.compiled_index import CompiledIndex
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import MANIFEST_NAME, content_version
+from spoken_to_signed.gloss_to_pose.lookup.packed_storage import PackedPoseStorage, is_source_current
+from spoken_to_signed.gloss_to_pose.lookup.pose_cache import PoseCache
+from spoken_to_signed.gloss_to_pose.smoothing import ConnectionSettings, connection_descriptors
 from spoken_to_signed.text_to_gloss.types import Gloss
 
 
@@ -15,16 +20,37 @@ class PoseLookup:
     def __init__(self, rows: List,
                  directory: str = None,
                  backup: "PoseLookup" = None,
-                 cache: LRUCache = None):
+                 cache: PoseCache = None,
+                 index: CompiledIndex = None,
+                 storage: PackedPoseStorage = None,
+                 prepared_storage: PackedPoseStorage = None):
         self.directory = directory
+        self.storage = storage
+        self.prepared_storage = prepared_storage
+        # Connection descriptors of prepared entries, computed on first use
+        self.descriptors = {}
+        # Hash of every pose file, from the index manifest (see index_manifest.py), if any
+        self.source_versions = {}
+        # Whether packed and prepared entries were stored from the current pose files, checked on first use
+        self.current_entries = {}
 
-        self.words_index = self.make_dictionary_index(rows, based_on="words")
-        self.glosses_index = self.make_dictionary_index(rows, based_on="glosses")
+        # Identifies the content of the lexicon index, see `version`
+        self.index_version = index.version if index is not None else None
+        # Identifies the content of the pose files, from the index manifest, with the manifest stat it was read at
+        self._content_version = (None, None)
+
+        if index is not None:
+            # A compiled index is memory mapped, and only materializes the rows that are looked up
+            self.words_index = index.dictionary_index(based_on="words")
+            self.glosses_index = index.dictionary_index(based_on="glosses")
+        else:
+            self.words_index = self.make_dictionary_index(rows, based_on="words")
+            self.glosses_index = self.make_dictionary_index(rows, based_on="glosses")
 
         self.backup = backup
 
         self.file_systems = {}
-        self.cache = cache if cache is not None else LRUCache()
+        self.cache = cache if cache is not None else PoseCache()
 
     def make_dictionary_index(self, rows: List, based_on: str):
         # As an attempt to make the index more compact in memory, we store a dictionary with only what we need
@@ -41,6 +67,24 @@ class PoseLookup:
             })
         return languages_dict
 
+    def local_path(self, pose_path: str) -> Optional[str]:
+        if "://" in pose_path or self.directory is None:
+            return None
+        return os.path.join(self.directory, pose_path)
+
+    def is_entry_current(self, storage: PackedPoseStorage, key: str, pose_path: str) -> bool:
+        """Whether a packed or prepared entry was stored from the current version of its pose file"""
+        memo_key = (storage.directory, key)
+        if memo_key not in self.current_entries:
+            local_path = self.local_path(pose_path)
+            current = local_path is None or is_source_current(storage.entry_metadata(key), local_path,
+                                                               self.source_versions.get(pose_path))
+            if not current:
+                print(f"{pose_path} changed since it was stored in {storage.directory}, reading the pose file. "
+                      f"Pack or prepare the lexicon again to update it.")
+            self.current_entries[memo_key] = current
+        return self.current_entries[memo_key]
+
     def read_pose(self, pose_path: str):
         if pose_path.startswith('gs://'):
             if 'gcs' not in self.file_systems:
@@ -60,19 +104,75 @@ class PoseLookup:
         with open(pose_path, "rb") as f:
             return Pose.read(f.read())
 
-    def get_pose(self, row):
-        # Manage pose cache
-        cached_pose = self.cache.get(row["path"])
-        if cached_pose is None:
-            pose = self.read_pose(row["path"])
-            self.cache.set(row["path"], pose)
-        pose = self.cache.get(row["path"])
-
-        frame_time = 1000 / pose.body.fps
+    @staticmethod
+    def frame_range(row, fps: float):
+        frame_time = 1000 / fps
         start_frame = math.floor(row["start"] // frame_time)
         end_frame = math.ceil(row["end"] // frame_time) if row["end"] > 0 else -1
+        return start_frame, end_frame
+
+    @staticmethod
+    def prepared_key(row) -> str:
+        # Prepared entries are per row, as normalization and boundaries depend on the frame range
+        return f"{row['path']}#{row['start']}-{row['end']}"
+
+    def get_pose(self, row, prepared: bool = False):
+        if prepared and self.prepared_storage is not None:
+            key = self.prepared_key(row)
+            if key in self.prepared_storage and self.is_entry_current(self.prepared_storage, key, row["path"]):
+                pose = self.prepared_storage.get_pose(key)
+                descriptors = None
+                if ConnectionSettings.use_descriptors:
+                    if key not in self.descriptors:
+                        self.descriptors[key] = connection_descriptors(pose)
+                    descriptors = self.descriptors[key]
+                metadata = self.prepared_storage.entry_metadata(key)
+                return PreparedPose(pose.header, pose.body, metadata["center"], metadata["scale"], metadata["boundary"],
+                                    descriptors=descriptors)
+
+        # Packed poses are memory mapped, and we only view the requested frames
+        if (self.storage is not None and row["path"] in self.storage
+                and self.is_entry_current(self.storage, row["path"], row["path"])):
+            start_frame, end_frame = self.frame_range(row, self.storage.fps(row["path"]))
+            return self.storage.get_pose(row["path"], start_frame, end_frame)
+
+        # Manage pose cache, concurrent lookups of the same file only read it once
+        pose = self.cache.get_or_load(row["path"], lambda: self.read_pose(row["path"]))
+
+        start_frame, end_frame = self.frame_range(row, pose.body.fps)
         return Pose(pose.header, pose.body[start_frame:end_frame])
 
+    @property
+    def version(self) -> Optional[str]:
+        """Identifies the content of this lexicon (index and pose files) and its backups, None if unknown"""
+        if self.index_version is None or self.directory is None:
+            return None
+        content = self.content_version()
+        if content is None:
+            return None
+        version = f"{self.index_version}:{content}"
+        if self.backup is None:
+            return version
+        backup_version = self.backup.version
+        if backup_version is None:
+            return None
+        return f"{version}+{backup_version}"
+
+    def content_version(self) -> Optional[str]:
+        # Pose files are not listed nor read here, the manifest is only read again when a refresh rewrote it
+        try:
+            stat = os.stat(os.path.join(self.directory, MANIFEST_NAME))
+        except FileNotFoundError:
+            return None
+        manifest_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._content_version[0] != manifest_stat:
+            self._content_version = (manifest_stat, content_version(self.directory))
+        return self._content_version[1]
+
+    def cache_stats(self):
+        # Hit, miss and eviction counters, to size the cache in production
+        return self.cache.stats()
+
     def get_best_row(self, rows, term: str):
         # Sort by priority: lower is "better"
         rows = sorted(rows, key=lambda x: x["priority"])
@@ -83,7 +183,13 @@ class PoseLookup:
         # Return the highest priority row
         return rows[0]
 
-    def lookup(self, word: str, gloss: str, spoken_language: str, signed_language: str, source: str = None) -> Pose:
+    def lookup(self,
+               word: str,
+               gloss: str,
+               spoken_language: str,
+               signed_language: str,
+               source: str = None,
+               prepared: bool = False) -> Pose:
         lookup_list = [
             (self.words_index, (spoken_language, signed_language, word)),
             (self.glosses_index, (spoken_language, signed_language, word)),
@@ -96,11 +202,11 @@ class PoseLookup:
                     lower_term = term.lower()
                     if lower_term in dict_index[spoken_language][signed_language]:
                         rows = dict_index[spoken_language][signed_language][lower_term]
-                        return self.get_pose(self.get_best_row(rows, term))
+                        return self.get_pose(self.get_best_row(rows, term), prepared=prepared)
 
         # Backup strategy: revert to backup sign language
         if signed_language in LANGUAGE_BACKUP:
-            return self.lookup(word, gloss, spoken_language, LANGUAGE_BACKUP[signed_language], source)
+            return self.lookup(word, gloss, spoken_language, LANGUAGE_BACKUP[signed_language], source, prepared)
 
         # Backup strategy: revert to fingerspelling
         if self.backup is not None:
@@ -108,25 +214,45 @@ class PoseLookup:
 
         raise FileNotFoundError
 
-    def lookup_sequence(self, glosses: Gloss, spoken_language: str, signed_language: str, source: str = None):
+    def lookup_sequence_stream(self,
+                               glosses: Gloss,
+                               spoken_language: str,
+                               signed_language: str,
+                               source: str = None,
+                               prepared: bool = False) -> Iterator[Tuple[Pose, Tuple[str, str]]]:
+        """
+        Lookup poses for a sequence of glosses, yielding (pose, (word, gloss)) in order, as soon as each is found.
+        Glosses without a pose are skipped. If prepared, returns PreparedPose for prepared lexicon entries.
+        """
         def lookup_pair(pair):
             word, gloss = pair
             if word == "":
                 return None
 
             try:
-                return self.lookup(word, gloss, spoken_language, signed_language)
+                return self.lookup(word, gloss, spoken_language, signed_language, prepared=prepared)
             except FileNotFoundError as e:
                 print(e)
                 return None
 
+        found = False
+        # All lookups start at once, and are yielded in order
         with ThreadPoolExecutor() as executor:
-            results = executor.map(lookup_pair, glosses)
-
-        poses = [result for result in results if result is not None]  # Filter out None results
+            for pair, pose in zip(glosses, executor.map(lookup_pair, glosses)):
+                if pose is not None:
+                    found = True
+                    yield pose, pair
 
-        if len(poses) == 0:
+        if not found:
             gloss_sequence = ' '.join([f"{word}/{gloss}" for word, gloss in glosses])
             raise Exception(f"No poses found for {gloss_sequence}")
 
-        return poses
+    def lookup_sequence(self,
+                        glosses: Gloss,
+                        spoken_language: str,
+                        signed_language: str,
+                        source: str = None,
+                        prepared: bool = False) -> List[Pose]:
+        """Lookup poses for a sequence of glosses. If prepared, returns PreparedPose for prepared lexicon entries."""
+        return [pose for pose, _ in self.lookup_sequence_stream(glosses, spoken_language, signed_language, source,
+                                                                prepared)]
@@ -0,0 +1,190 @@
+import argparse
+import base64
+import io
+import json
+import os
+import re
+import uuid
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from pose_format import Pose, PoseHeader
+from pose_format.numpy import NumPyPoseBody
+from pose_format.utils.reader import BufferReader
+from tqdm import tqdm
+
+# A packed lexicon stores all poses in two flat float32 files (data and confidence), in a "packed" directory next to
+# index.csv. A table maps each pose path to its offset and shape in these files, its fps, and its (shared) header.
+# The files are memory mapped, so the OS page cache acts as the pose cache, and is shared between processes.
+# Entries can carry extra metadata (e.g. precomputed values of prepared lexicons), as can the table itself.
+# Each packing writes new data files, named in the table, and then replaces the table: readers always see a table
+# with the data files it was written with. Entries record the size and modification time of their pose file, so
+# lookups can ignore the entries of files edited since (see `is_source_current`).
+PACKED_DIRECTORY_NAME = "packed"
+PACKED_VERSION = 1
+DTYPE_SUFFIXES = {"float32": "f32", "float64": "f64"}
+# Names of the data files of a packing, see pack_poses
+DATA_FILE_PATTERN = re.compile(r"(data|confidence)-[0-9a-f]{12}\.(" + "|".join(DTYPE_SUFFIXES.values()) + ")")
+
+
+class PackedPoseStorage:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        with open(os.path.join(directory, "table.json"), "r", encoding="utf-8") as f:
+            table = json.load(f)
+        if table["version"] != PACKED_VERSION:
+            raise ValueError(f"Unsupported packed lexicon version {table['version']}")
+
+        self.headers = [PoseHeader.read(BufferReader(base64.b64decode(header))) for header in table["headers"]]
+        self.entries: Dict[str, list] = table["entries"]
+        self.metadata: dict = table.get("metadata", {})
+        self.dtype = np.dtype(table.get("dtype", "float32"))
+
+        # Copy-on-write mapping, in case a pipeline step modifies a pose in place, it never reaches the file
+        self.files = table_files(table)
+        self.data = self._memmap(self.files["data"])
+        self.confidence = self._memmap(self.files["confidence"])
+
+    def _memmap(self, name: str) -> np.ndarray:
+        path = os.path.join(self.directory, name)
+        if os.path.getsize(path) == 0:  # numpy can't memory map empty files
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode="c")
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.entries
+
+    def fps(self, path: str) -> float:
+        return self.entries[path][4]
+
+    def entry_metadata(self, path: str) -> dict:
+        entry = self.entries[path]
+        return entry[5] if len(entry) > 5 else {}
+
+    def get_pose(self, path: str, start_frame: int = None, end_frame: int = None) -> Pose:
+        """Get a pose as views of the memory mapped files, only for the requested frame range."""
+        data_offset, confidence_offset, shape, header_id, fps = self.entries[path][:5]
+        frames, people, points, dims = shape
+
+        data = self.data[data_offset:data_offset + frames * people * points * dims].reshape(shape)
+        confidence = self.confidence[confidence_offset:confidence_offset + frames * people * points]
+        confidence = confidence.reshape((frames, people, points))
+
+        body = NumPyPoseBody(fps=fps, data=data[start_frame:end_frame], confidence=confidence[start_frame:end_frame])
+        return Pose(self.headers[header_id], body)
+
+
+def table_files(table: dict) -> Dict[str, str]:
+    # Storages packed before data file names were versioned use fixed names
+    suffix = DTYPE_SUFFIXES[table.get("dtype", "float32")]
+    return table.get("files", {"data": f"data.{suffix}", "confidence": f"confidence.{suffix}"})
+
+
+def source_stat(source_path: str) -> dict:
+    """Entry metadata identifying the version of the pose file an entry was stored from"""
+    stat = os.stat(source_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def is_source_current(entry_metadata: dict, source_path: str, source_sha1: Optional[str] = None) -> bool:
+    """Whether an entry was stored from the current version of its pose file (entries without a record are trusted)"""
+    if "source_size" in entry_metadata:
+        try:
+            if source_stat(source_path) != {key: entry_metadata[key] for key in ["source_size", "source_mtime_ns"]}:
+                return False
+        except FileNotFoundError:
+            return False
+    if source_sha1 is not None and "source_sha1" in entry_metadata:
+        return entry_metadata["source_sha1"] == source_sha1
+    return True
+
+
+def pack_poses(poses: Iterable[tuple], directory: str, dtype=np.float32, metadata: dict = None):
+    """Write (path, pose) or (path, pose, entry metadata) tuples to a packed storage directory."""
+    os.makedirs(directory, exist_ok=True)
+    dtype = np.dtype(dtype)
+    suffix = DTYPE_SUFFIXES[dtype.name]
+
+    headers = {}  # serialized header -> header id
+    entries = {}
+    data_offset = confidence_offset = 0
+
+    # New data files for every packing, so readers of the previous table keep reading the data it was written with
+    generation = uuid.uuid4().hex[:12]
+    files = {"data": f"data-{generation}.{suffix}", "confidence": f"confidence-{generation}.{suffix}"}
+    data_path = os.path.join(directory, files["data"])
+    confidence_path = os.path.join(directory, files["confidence"])
+    with open(data_path, "wb") as data_file, open(confidence_path, "wb") as confidence_file:
+        for path, pose, *entry_metadata in poses:
+            header_buffer = io.BytesIO()
+            pose.header.write(header_buffer)
+            header_id = headers.setdefault(base64.b64encode(header_buffer.getvalue()).decode("ascii"), len(headers))
+
+            data = np.ascontiguousarray(np.ma.getdata(pose.body.data), dtype=dtype)
+            confidence = np.ascontiguousarray(pose.body.confidence, dtype=dtype)
+            data_file.write(data.tobytes())
+            confidence_file.write(confidence.tobytes())
+
+            entries[path] = [data_offset, confidence_offset, list(data.shape), header_id, float(pose.body.fps)]
+            entries[path].extend(entry_metadata)
+            data_offset += data.size
+            confidence_offset += confidence.size
+
+    table_path = os.path.join(directory, "table.json")
+    previous_files = older_files = {}
+    if os.path.exists(table_path):
+        with open(table_path, "r", encoding="utf-8") as f:
+            previous_table = json.load(f)
+        previous_files = table_files(previous_table)
+        older_files = previous_table.get("previous_files", {})
+
+    # The table is replaced in one step, so it is the only switch between the previous and the new data
+    with open(f"{table_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": PACKED_VERSION,
+            "dtype": dtype.name,
+            "files": files,
+            "previous_files": previous_files,
+            "metadata": metadata if metadata is not None else {},
+            "headers": list(headers.keys()),
+            "entries": entries
+        }, f)
+    os.replace(f"{table_path}.tmp", table_path)
+
+    # The previous data files are kept for readers that loaded the previous table, older ones are removed.
+    # Only files written by a packing are removed, the directory may hold other files (e.g. data.csv)
+    kept = set(files.values()) | set(previous_files.values())
+    removed = set(older_files.values()) | {name for name in os.listdir(directory) if DATA_FILE_PATTERN.fullmatch(name)}
+    for name in removed - kept:
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+
+
+def pack_lexicon(lexicon_directory: str):
+    from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup
+
+    lookup = CSVPoseLookup(lexicon_directory, packed=False)
+    paths = sorted({row["path"]
+                    for signed_languages in lookup.words_index.values()
+                    for terms in signed_languages.values()
+                    for rows in terms.values()
+                    for row in rows})
+
+    print(f"Packing {len(paths)} poses...")
+    # Remote poses (e.g. gs://) have no version to check
+    poses = ((path, lookup.read_pose(path), source_stat(lookup.local_path(path)) if lookup.local_path(path) else {})
+             for path in tqdm(paths))
+    pack_poses(poses, os.path.join(lexicon_directory, PACKED_DIRECTORY_NAME))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--directory", type=str, required=True, help="Lexicon directory, containing index.csv")
+    args = parser.parse_args()
+
+    pack_lexicon(args.directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+
+import numpy as np
+from pose_format import Pose
+
+from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup
+from spoken_to_signed.gloss_to_pose.lookup.packed_storage import PACKED_DIRECTORY_NAME, PackedPoseStorage, \
+    pack_lexicon, pack_poses
+
+DUMMY_LEXICON = os.path.join(os.path.dirname(__file__), "..", "..", "..", "assets", "dummy_lexicon")
+NAMES = ["essen", "kinder", "kleine", "pizza"]
+
+
+def read_pose(path: str) -> Pose:
+    with open(path, "rb") as f:
+        return Pose.read(f.read())
+
+
+def dummy_poses():
+    return [(f"sgg/{name}.pose", read_pose(os.path.join(DUMMY_LEXICON, "sgg", f"{name}.pose"))) for name in NAMES]
+
+
+def assert_same_pose(pose: Pose, expected: Pose):
+    np.testing.assert_array_equal(np.ma.getdata(pose.body.data), np.ma.getdata(expected.body.data))
+    np.testing.assert_array_equal(pose.body.confidence, expected.body.confidence)
+    assert pose.body.fps == expected.body.fps
+
+
+def test_pack_poses_round_trip(tmp_path):
+    poses = dummy_poses()
+    pack_poses(((path, pose, {"name": path}) for path, pose in poses), str(tmp_path), metadata={"lexicon": "dummy"})
+
+    storage = PackedPoseStorage(str(tmp_path))
+    assert storage.metadata == {"lexicon": "dummy"}
+    for path, pose in poses:
+        assert path in storage
+        assert storage.entry_metadata(path) == {"name": path}
+        assert_same_pose(storage.get_pose(path), pose)
+        assert storage.get_pose(path).header.components[0].name == pose.header.components[0].name
+
+
+def test_get_pose_slices_frames(tmp_path):
+    [(path, pose)] = dummy_poses()[:1]
+    pack_poses([(path, pose)], str(tmp_path))
+
+    sliced = PackedPoseStorage(str(tmp_path)).get_pose(path, 5, 10)
+    assert_same_pose(sliced, Pose(pose.header, pose.body[5:10]))
+
+
+def test_repacking_keeps_the_previous_data_for_open_readers(tmp_path):
+    poses = dummy_poses()
+    pack_poses(poses[:2], str(tmp_path))
+    reader = PackedPoseStorage(str(tmp_path))
+
+    pack_poses(poses[2:], str(tmp_path))
+    # The previous table still reads its own data
+    assert_same_pose(reader.get_pose(poses[0][0]), poses[0][1])
+    assert poses[0][0] not in PackedPoseStorage(str(tmp_path))
+
+    # Data files older than the previous packing are removed, other files are kept
+    (tmp_path / "data.csv").write_text("path\n", encoding="utf-8")
+    (tmp_path / "confidence.txt").write_text("", encoding="utf-8")
+    pack_poses(poses[:1], str(tmp_path))
+    assert not any(os.path.exists(tmp_path / name) for name in reader.files.values())
+    # Two generations of data and confidence, the table, and the other files
+    assert len(os.listdir(tmp_path)) == 7
+
+
+def test_repacking_removes_legacy_data_files(tmp_path):
+    poses = dummy_poses()
+    pack_poses(poses, str(tmp_path))
+    # A storage packed before data file names were versioned
+    reader = PackedPoseStorage(str(tmp_path))
+    for kind, name in reader.files.items():
+        os.replace(tmp_path / name, tmp_path / f"{kind}.f32")
+    table = json.loads((tmp_path / "table.json").read_text(encoding="utf-8"))
+    del table["files"], table["previous_files"]
+    (tmp_path / "table.json").write_text(json.dumps(table), encoding="utf-8")
+    assert_same_pose(PackedPoseStorage(str(tmp_path)).get_pose(poses[0][0]), poses[0][1])
+
+    pack_poses(poses, str(tmp_path))
+    assert os.path.exists(tmp_path / "data.f32")  # Kept for readers of the previous table
+    pack_poses(poses, str(tmp_path))
+    assert not os.path.exists(tmp_path / "data.f32") and not os.path.exists(tmp_path / "confidence.f32")
+
+
+def test_lookup_ignores_entries_of_changed_pose_files(tmp_path):
+    directory = tmp_path / "lexicon"
+    shutil.copytree(DUMMY_LEXICON, directory, ignore=shutil.ignore_patterns("index.bin", "packed", "prepared"))
+    pack_lexicon(str(directory))
+    assert os.path.exists(directory / PACKED_DIRECTORY_NAME / "table.json")
+
+    def expected_pose(name: str) -> Pose:
+        # Rows ending at 0 skip the last frame, see PoseLookup.frame_range
+        pose = read_pose(str(directory / "sgg" / f"{name}.pose"))
+        return Pose(pose.header, pose.body[0:-1])
+
+    row = {"path": "sgg/kleine.pose", "start": 0, "end": 0}
+    assert_same_pose(CSVPoseLookup(str(directory)).get_pose(row), expected_pose("kleine"))
+
+    # Edited after packing, the pose file is read instead
+    shutil.copy(directory / "sgg" / "kinder.pose", directory / "sgg" / "kleine.pose")
+    assert_same_pose(CSVPoseLookup(str(directory)).get_pose(row), expected_pose("kinder"))
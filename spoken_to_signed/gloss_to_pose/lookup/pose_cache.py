@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+from pose_format import Pose
+
+
+class PoseCache:
+    """Thread-safe LRU cache of poses, bounded by the size of the pose arrays in bytes rather than by entries."""
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+
+        self.cache = OrderedDict()  # key -> (pose, size in bytes)
+        self.current_bytes = 0
+        self.loading: Dict[str, Future] = {}  # keys that are currently being loaded by another thread
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def pose_size(pose: Pose) -> int:
+        return pose.body.data.nbytes + pose.body.confidence.nbytes
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+
+    def _get(self, key):
+        if key in self.cache:
+            self.hits += 1
+            # Move the accessed item to the end to show it's recently used
+            self.cache.move_to_end(key)
+            return self.cache[key][0]
+        self.misses += 1
+        return None
+
+    def set(self, key, value: Pose):
+        size = self.pose_size(value)
+        with self.lock:
+            if key in self.cache:
+                self.current_bytes -= self.cache.pop(key)[1]
+
+            # A pose larger than the whole budget would evict everything, and still not fit
+            if size > self.max_bytes:
+                return
+
+            self.cache[key] = (value, size)
+            self.current_bytes += size
+
+            # Remove the least recently used items until we are back within budget
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.cache.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_load(self, key, loader: Callable[[], Pose]) -> Pose:
+        """Get a pose from the cache, or load it. Concurrent misses on the same key only load it once."""
+        with self.lock:
+            cached = self._get(key)
+            if cached is not None:
+                return cached
+
+            # The miss is counted by _get, whether this thread loads the pose or waits for another one
+            future = self.loading.get(key)
+            is_loader = future is None
+            if is_loader:
+                future = self.loading[key] = Future()
+
+        if not is_loader:
+            return future.result()
+
+        try:
+            pose = loader()
+            self.set(key, pose)
+            future.set_result(pose)
+            return pose
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.loading[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.cache),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
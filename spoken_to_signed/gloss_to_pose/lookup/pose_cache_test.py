@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from pose_format import Pose
+from pose_format.numpy import NumPyPoseBody
+
+from spoken_to_signed.gloss_to_pose.lookup.pose_cache import PoseCache
+
+
+def make_pose(frames: int) -> Pose:
+    data = np.zeros((frames, 1, 2, 3), dtype=np.float32)
+    confidence = np.ones((frames, 1, 2), dtype=np.float32)
+    return Pose(None, NumPyPoseBody(fps=25, data=data, confidence=confidence))
+
+
+def test_get_counts_hits_and_misses():
+    cache = PoseCache()
+    assert cache.get("a") is None
+    pose = make_pose(1)
+    cache.set("a", pose)
+    assert cache.get("a") is pose
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_eviction_is_bounded_in_bytes():
+    size = PoseCache.pose_size(make_pose(10))  # 10 frames of 2 points
+    cache = PoseCache(max_bytes=2 * size)
+    cache.set("a", make_pose(10))
+    cache.set("b", make_pose(10))
+    cache.get("a")  # "b" is the least recently used
+    cache.set("c", make_pose(10))
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 2 * size, 1)
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    # Poses larger than the whole budget are not cached, and evict nothing
+    cache.set("d", make_pose(30))
+    assert cache.get("d") is None and cache.stats()["entries"] == 2
+
+
+def test_get_or_load_loads_once_for_concurrent_misses():
+    loads = []
+    release = threading.Event()
+
+    def loader():
+        loads.append(threading.get_ident())
+        release.wait(timeout=5)
+        return make_pose(1)
+
+    cache = PoseCache()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get_or_load, "a", loader) for _ in range(8)]
+        # Let every thread reach the cache before the load finishes
+        while len(cache.loading) == 0 or cache.stats()["misses"] < 8:
+            time.sleep(0.01)
+        release.set()
+        poses = [future.result() for future in futures]
+
+    assert len(loads) == 1
+    assert all(pose is poses[0] for pose in poses)
+    assert cache.stats()["misses"] == 8
+    assert cache.get_or_load("a", loader) is poses[0]
+    assert len(loads) == 1
+
+
+def test_get_or_load_shares_failures_and_retries():
+    cache = PoseCache()
+
+    def failing_loader():
+        raise OSError("unreadable")
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            cache.get_or_load("a", failing_loader)
+    # Failed loads are not cached, the next call loads again
+    assert cache.get_or_load("a", lambda: make_pose(1)) is not None
+    assert len(cache.loading) == 0
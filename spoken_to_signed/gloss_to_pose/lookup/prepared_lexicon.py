@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+from typing import Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from spoken_to_signed.gloss_to_pose.concatenate import PREPARED_TRANSFORMS, ConcatenationSettings, prepare_pose
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import file_versions
+from spoken_to_signed.gloss_to_pose.lookup.packed_storage import PackedPoseStorage, is_source_current, pack_poses, \
+    source_stat
+
+# A prepared lexicon stores every lexicon entry (row of index.csv) after the per-pose steps of concatenate_poses,
+# in a packed storage directory next to index.csv. The table records the applied transforms and the index version
+# it was prepared from, so outdated preparations are ignored (and rebuilt by running this again).
+# Entries record the size and modification time of their pose file, and its hash when the lexicon has an index
+# manifest (see index_manifest.py). Lookups ignore the entries of changed files, and rebuilding only prepares those.
+PREPARED_DIRECTORY_NAME = "prepared"
+# Bump when prepare_pose changes, to invalidate previously prepared lexicons
+PREPARED_VERSION = 1
+
+
+def prepared_metadata(index_version: str) -> dict:
+    return {
+        "prepared_version": PREPARED_VERSION,
+        "index_version": index_version,
+        "transforms": PREPARED_TRANSFORMS,
+        "reduce_holistic": ConcatenationSettings.is_reduce_holistic,
+    }
+
+
+def is_up_to_date(prepared_directory: str, index_version: str) -> bool:
+    table_path = os.path.join(prepared_directory, "table.json")
+    if not os.path.exists(table_path):
+        return False
+    with open(table_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("metadata") == prepared_metadata(index_version)
+
+
+def reusable_storage(prepared_directory: str) -> Optional[PackedPoseStorage]:
+    # A previous preparation with the same transforms, for any index version
+    table_path = os.path.join(prepared_directory, "table.json")
+    if not os.path.exists(table_path):
+        return None
+    storage = PackedPoseStorage(prepared_directory)
+    metadata = dict(storage.metadata, index_version=None)
+    return storage if metadata == prepared_metadata(None) else None
+
+
+def prepare_lexicon(lexicon_directory: str, force: bool = False):
+    from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup
+
+    lookup = CSVPoseLookup(lexicon_directory, prepared=False)
+    prepared_directory = os.path.join(lexicon_directory, PREPARED_DIRECTORY_NAME)
+
+    rows = {lookup.prepared_key(row): row
+            for signed_languages in lookup.words_index.values()
+            for terms in signed_languages.values()
+            for rows in terms.values()
+            for row in rows}
+
+    versions = file_versions(lexicon_directory)
+    previous = None if force else reusable_storage(prepared_directory)
+
+    def is_reusable(key: str) -> bool:
+        # The pose file did not change since it was prepared
+        local_path = lookup.local_path(rows[key]["path"])
+        return (previous is not None and key in previous and local_path is not None
+                and "source_size" in previous.entry_metadata(key)
+                and is_source_current(previous.entry_metadata(key), local_path, versions.get(rows[key]["path"])))
+
+    if (not force and is_up_to_date(prepared_directory, lookup.index_version)
+            and all(is_reusable(key) or lookup.local_path(rows[key]["path"]) is None for key in rows)):
+        print("Prepared lexicon is up to date")
+        return
+
+    reused = 0
+
+    def prepared_poses():
+        nonlocal reused
+        for key in tqdm(sorted(rows.keys())):
+            if is_reusable(key):
+                reused += 1
+                yield key, previous.get_pose(key), previous.entry_metadata(key)
+                continue
+
+            source_sha1 = versions.get(rows[key]["path"])
+            local_path = lookup.local_path(rows[key]["path"])
+            pose = prepare_pose(lookup.get_pose(rows[key]))
+            entry_metadata = {"center": pose.center, "scale": pose.scale, "boundary": list(pose.boundary)}
+            if local_path is not None:
+                entry_metadata.update(source_stat(local_path))
+            if source_sha1 is not None:
+                entry_metadata["source_sha1"] = source_sha1
+            yield key, pose, entry_metadata
+
+    print(f"Preparing {len(rows)} lexicon entries...")
+    # Normalized poses are float64, stored as is, so prepared entries give the exact same results
+    pack_poses(prepared_poses(), prepared_directory, dtype=np.float64,
+               metadata=prepared_metadata(lookup.index_version))
+    if reused > 0:
+        print(f"Reused {reused} unchanged entries")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--directory", type=str, required=True, help="Lexicon directory, containing index.csv")
+    parser.add_argument("--force", action="store_true", help="Prepare the lexicon even if it is up to date")
+    args = parser.parse_args()
+
+    prepare_lexicon(args.directory, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
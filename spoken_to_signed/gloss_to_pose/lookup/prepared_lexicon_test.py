@@ -0,0 +1,29 @@
+import os
+import shutil
+
+from spoken_to_signed.gloss_to_pose.concatenate import PreparedPose
+from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup
+from spoken_to_signed.gloss_to_pose.lookup.prepared_lexicon import prepare_lexicon
+
+DUMMY_LEXICON = os.path.join(os.path.dirname(__file__), "..", "..", "..", "assets", "dummy_lexicon")
+ROW = {"path": "sgg/kleine.pose", "start": 0, "end": 0}
+
+
+def test_prepared_entries_of_changed_pose_files_are_ignored(tmp_path, capsys):
+    directory = tmp_path / "lexicon"
+    shutil.copytree(DUMMY_LEXICON, directory, ignore=shutil.ignore_patterns("index.bin", "packed", "prepared"))
+    prepare_lexicon(str(directory))
+    assert isinstance(CSVPoseLookup(str(directory)).get_pose(ROW, prepared=True), PreparedPose)
+
+    # Replaced without touching index.csv, the prepared lexicon is still current for the index
+    shutil.copy(directory / "sgg" / "kinder.pose", directory / "sgg" / "kleine.pose")
+    lookup = CSVPoseLookup(str(directory))
+    assert lookup.prepared_storage is not None
+    assert not isinstance(lookup.get_pose(ROW, prepared=True), PreparedPose)
+    assert isinstance(lookup.get_pose({**ROW, "path": "sgg/kinder.pose"}, prepared=True), PreparedPose)
+
+    # Preparing again only prepares the changed entry
+    capsys.readouterr()
+    prepare_lexicon(str(directory))
+    assert "Reused 3 unchanged entries" in capsys.readouterr().out
+    assert isinstance(CSVPoseLookup(str(directory)).get_pose(ROW, prepared=True), PreparedPose)
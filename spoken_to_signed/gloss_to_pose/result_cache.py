@@ -0,0 +1,175 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from pose_format import Pose
+
+# Bump when a change to the pipeline changes its output, to invalidate previously cached results
+RESULT_CACHE_VERSION = 1
+
+
+class ResultCache:
+    """
+    Two-tier cache of full gloss_to_pose results, as serialized pose files.
+    The memory tier is per process, the disk tier (optional) can be shared between processes and restarts.
+    Both tiers are LRU, bounded in bytes. Entries are content addressed, so they never need to be invalidated:
+    a different lexicon version or option gives a different key.
+    Lexicons are versioned by their index manifest (see index_manifest.py), results of lexicons without one are not
+    cached.
+    """
+
+    def __init__(self,
+                 directory: str = None,
+                 max_memory_bytes: int = 128 * 1024 * 1024,
+                 max_disk_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory = OrderedDict()  # key -> serialized pose
+        self.memory_bytes = 0
+        self.disk = OrderedDict()  # key -> file size
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def key(glosses, spoken_language: str, signed_language: str, lexicon_version: str, **options) -> str:
+        content = {
+            "version": RESULT_CACHE_VERSION,
+            "glosses": [[word, gloss] for word, gloss in glosses],
+            "spoken_language": spoken_language,
+            "signed_language": signed_language,
+            "lexicon": lexicon_version,
+            "options": options,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pose")
+
+    def _scan_disk(self):
+        # Rebuild the LRU order of a previous run from file access times
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pose"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_atime, name[:-len(".pose")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    def get(self, key: str) -> Optional[Pose]:
+        content = self._get_bytes(key)
+        if content is None:
+            return None
+        # Every hit gets its own pose, as the pipeline modifies poses in place
+        return Pose.read(content)
+
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            if key in self.memory:
+                self.memory_hits += 1
+                self.memory.move_to_end(key)
+                if key in self.disk:
+                    # Also recently used on disk, so it is not the next to be evicted there
+                    self.disk.move_to_end(key)
+                return self.memory[key]
+
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+                os.utime(path)  # Mark as recently used, for eviction across restarts
+            except FileNotFoundError:
+                # Never cached, or evicted by another process
+                content = None
+
+            if content is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self._touch_disk(key, len(content))
+                    self._set_memory(key, content)
+                return content
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, pose: Pose):
+        buffer = io.BytesIO()
+        pose.write(buffer)
+        content = buffer.getvalue()
+
+        if self.directory is not None and len(content) <= self.max_disk_bytes:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write atomically, as multiple processes may share the directory
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+            with self.lock:
+                self._touch_disk(key, len(content))
+                self._evict_disk()
+
+        with self.lock:
+            self._set_memory(key, content)
+
+    def _set_memory(self, key: str, content: bytes):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        if len(content) > self.max_memory_bytes:
+            return
+
+        self.memory[key] = content
+        self.memory_bytes += len(content)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _touch_disk(self, key: str, size: int):
+        if key in self.disk:
+            self.disk_bytes -= self.disk.pop(key)
+        self.disk[key] = size
+        self.disk_bytes += size
+
+    def _evict_disk(self):
+        while self.disk_bytes > self.max_disk_bytes:
+            key, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups > 0 else 0,
+                "evictions": self.evictions,
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": self.disk_bytes,
+            }
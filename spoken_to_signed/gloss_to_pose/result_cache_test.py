@@ -0,0 +1,109 @@
+import io
+import os
+import shutil
+
+import numpy as np
+
+from spoken_to_signed.gloss_to_pose import ConcatenationSettings, output_settings
+from spoken_to_signed.gloss_to_pose.lookup import CSVPoseLookup
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import read_index, update_index
+from spoken_to_signed.gloss_to_pose.result_cache import ResultCache
+
+DUMMY_LEXICON = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "dummy_lexicon")
+GLOSSES = [("kleine", "KLEIN"), ("kinder", "KIND")]
+POSE_NAMES = ["ase/fs-sts13206cebad70790ee136a34c7a74af5e.pose", "ase/fs-stse28e9ac023b0e29ca0a3acc12dc46540.pose",
+              "ase/fs-stsf6361531b087bba7e2d9f561cfd3bada.pose"]
+
+
+def pose_size(pose) -> int:
+    buffer = io.BytesIO()
+    pose.write(buffer)
+    return len(buffer.getvalue())
+
+
+def key(name: str) -> str:
+    return ResultCache.key(GLOSSES, "de", "sgg", name)
+
+
+def test_key_depends_on_inputs_and_settings():
+    assert key("v1") == key("v1")
+    assert key("v1") != key("v2")
+    assert ResultCache.key(GLOSSES, "de", "sgg", "v1", trim=True) != ResultCache.key(GLOSSES, "de", "sgg", "v1")
+
+    settings = output_settings()
+    ConcatenationSettings.is_reduce_holistic = False
+    try:
+        assert output_settings() != settings
+    finally:
+        ConcatenationSettings.is_reduce_holistic = True
+
+
+def test_lexicon_version_changes_with_the_manifest(tmp_path):
+    directory = tmp_path / "lexicon"
+    shutil.copytree(DUMMY_LEXICON, directory, ignore=shutil.ignore_patterns("index.bin"))
+    lookup = CSVPoseLookup(str(directory))
+    # Without a manifest, the content of the pose files is unknown
+    assert lookup.version is None
+
+    _, rows = read_index(str(directory / "index.csv"))
+    update_index(str(directory), ["sgg"], (".pose",), lambda: rows, list(rows[0].keys()))
+    version = lookup.version
+    assert version is not None and CSVPoseLookup(str(directory)).version == version
+
+    # Replaced without touching index.csv, the version changes once the manifest is refreshed
+    shutil.copy(directory / "sgg" / "kinder.pose", directory / "sgg" / "kleine.pose")
+    update_index(str(directory), ["sgg"], (".pose",), lambda: rows, list(rows[0].keys()))
+    assert lookup.version != version
+
+
+def test_memory_and_disk_tiers(tmp_path, load_pose):
+    pose = load_pose(POSE_NAMES[0])
+    cache = ResultCache(directory=str(tmp_path))
+    assert cache.get(key("a")) is None
+    cache.set(key("a"), pose)
+
+    cached = cache.get(key("a"))
+    np.testing.assert_array_equal(np.ma.getdata(cached.body.data), np.ma.getdata(pose.body.data))
+    # Every hit is a new pose
+    assert cache.get(key("a")) is not cached
+
+    # A new process reads from disk, then from memory
+    cache = ResultCache(directory=str(tmp_path))
+    assert cache.get(key("a")) is not None
+    assert cache.get(key("a")) is not None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_eviction_is_bounded_in_bytes(tmp_path, load_pose):
+    poses = [load_pose(name) for name in POSE_NAMES]
+    # Room for "a" and "c", not for "b" as well
+    max_bytes = pose_size(poses[0]) + pose_size(poses[2])
+    cache = ResultCache(directory=str(tmp_path), max_memory_bytes=max_bytes, max_disk_bytes=max_bytes)
+    cache.set(key("a"), poses[0])
+    cache.set(key("b"), poses[1])
+    cache.get(key("a"))  # "a" is used again, so "b" is the least recently used
+    cache.set(key("c"), poses[2])
+
+    assert cache.memory_bytes <= max_bytes and cache.disk_bytes <= max_bytes
+    assert key("b") not in cache.memory and key("b") not in cache.disk
+    assert not os.path.exists(cache._path(key("b")))
+    assert cache.get(key("a")) is not None and cache.get(key("c")) is not None
+
+
+def test_startup_scan_restores_disk_usage_and_order(tmp_path, load_pose):
+    cache = ResultCache(directory=str(tmp_path))
+    for i, name in enumerate(["a", "b", "c"]):
+        cache.set(key(name), load_pose(POSE_NAMES[i]))
+        # Access times of a previous run: "a" is the least recently used
+        os.utime(cache._path(key(name)), (1000 + i, 1000 + i))
+
+    cache = ResultCache(directory=str(tmp_path))
+    assert list(cache.disk.keys()) == [key("a"), key("b"), key("c")]
+    assert cache.disk_bytes == sum(os.path.getsize(cache._path(key(name))) for name in ["a", "b", "c"])
+
+    # Adding an entry beyond the limit evicts the least recently used one of the previous run
+    small = ResultCache(directory=str(tmp_path), max_disk_bytes=cache.disk_bytes)
+    small.set(key("d"), load_pose(POSE_NAMES[0]))
+    assert key("a") not in small.disk and not os.path.exists(small._path(key("a")))
+    assert small.disk_bytes <= small.max_disk_bytes
@@ -1,29 +1,74 @@
 import math
-from typing import List
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 import numpy as np
 import scipy.signal
-from pose_format import Pose
+from pose_format import Pose, PoseHeader
 from pose_format.numpy import NumPyPoseBody
 from scipy.spatial.distance import cdist
 
 
+class ConnectionSettings:
+    # Compare frames using only a subset of joints (in float32) when looking for the best connection point
+    use_descriptors = False
+    # Points per component, None for all the points of the component. Missing components are skipped
+    descriptor_points = {
+        "POSE_LANDMARKS": ["LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST"],
+        "LEFT_HAND_LANDMARKS": None,
+        "RIGHT_HAND_LANDMARKS": None,
+    }
+
+
+@lru_cache(maxsize=16)
+def _descriptor_indexes(components: Tuple[Tuple[str, Tuple[str, ...]], ...],
+                        selection: Tuple[Tuple[str, Optional[Tuple[str, ...]]], ...]) -> np.ndarray:
+    selected_points = dict(selection)
+    indexes = []
+    offset = 0
+    for name, points in components:
+        if name in selected_points:
+            selected = selected_points[name]
+            if selected is None:
+                indexes.extend(range(offset, offset + len(points)))
+            else:
+                indexes.extend(offset + points.index(point) for point in selected)
+        offset += len(points)
+    return np.array(indexes, dtype=np.int64)
+
+
+def descriptor_indexes(header: PoseHeader) -> np.ndarray:
+    components = tuple((c.name, tuple(c.points)) for c in header.components)
+    # The selection is read from the settings on every call, so changing the settings takes effect
+    selection = tuple((name, None if points is None else tuple(points))
+                      for name, points in ConnectionSettings.descriptor_points.items())
+    return _descriptor_indexes(components, selection)
+
+
+def connection_descriptors(pose: Pose, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+    """Per-frame vectors of the descriptor points (first person), for frames [start, end)"""
+    data = np.ma.getdata(pose.body.data[start:end, 0])
+    vectors = data[:, descriptor_indexes(pose.header)].astype(np.float32)
+    return vectors.reshape(len(vectors), -1)
+
+
+def savgol_points_mask(header: PoseHeader) -> np.ndarray:
+    # Smoothing the face does not result in a good result, so we skip it
+    [face_component] = [c for c in header.components if c.name == 'FACE_LANDMARKS']
+    face_start = header._get_point_index('FACE_LANDMARKS', face_component.points[0])
+    face_end = header._get_point_index('FACE_LANDMARKS', face_component.points[-1])
+
+    points_mask = np.ones(header.total_points(), dtype=bool)
+    points_mask[face_start:face_end] = False
+    return points_mask
+
+
 def pose_savgol_filter(pose: Pose):
-    # If we want this to be faster, here is a possible solution
-    # https://stackoverflow.com/questions/75221888/fast-savgol-filter-on-3d-tensor/75406720#75406720
+    points_mask = savgol_points_mask(pose.header)
 
-    # Smoothing the face does not result in a good result, so we skip it
-    [face_component] = [c for c in pose.header.components if c.name == 'FACE_LANDMARKS']
-    face_range = range(
-        pose.header._get_point_index('FACE_LANDMARKS', face_component.points[0]),
-        pose.header._get_point_index('FACE_LANDMARKS', face_component.points[-1]),
-    )
-
-    _, _, points, dims = pose.body.data.shape
-    for p in range(points):
-        if p not in face_range:
-            for d in range(dims):
-                pose.body.data[:, 0, p, d] = scipy.signal.savgol_filter(pose.body.data[:, 0, p, d], 3, 1)
+    # Filter all non-face points and dimensions at once, along the time axis
+    # Based on https://stackoverflow.com/questions/75221888/fast-savgol-filter-on-3d-tensor/75406720#75406720
+    pose.body.data[:, 0, points_mask] = scipy.signal.savgol_filter(pose.body.data[:, 0, points_mask], 3, 1, axis=0)
     return pose
 
 
@@ -54,18 +99,38 @@ def concatenate_poses(poses: List[Pose], padding: NumPyPoseBody, interpolation='
     return Pose(header=poses[0].header, body=new_body)
 
 
+def pose_descriptors(pose: Pose, start: int, end: int) -> np.ndarray:
+    # Prepared lexicon entries come with the descriptors of all their frames, see PoseLookup.get_pose
+    descriptors = getattr(pose, "descriptors", None)
+    if descriptors is not None:
+        return descriptors[start:end]
+    return connection_descriptors(pose, start, end)
+
+
+def squared_distances(vectors1: np.ndarray, vectors2: np.ndarray) -> np.ndarray:
+    # |a - b|^2 = |a|^2 + |b|^2 - 2ab, a single matrix product instead of a distance per pair
+    return ((vectors1 ** 2).sum(axis=1)[:, None] + (vectors2 ** 2).sum(axis=1)[None, :]
+            - 2 * vectors1 @ vectors2.T)
+
+
 def find_best_connection_point(pose1: Pose, pose2: Pose, window=0.3):
     # window size in seconds, or percentage of the pose, whichever is smaller
     p1_size = math.ceil(min(window * pose1.body.fps, len(pose1.body.data) * window))
     p2_size = math.ceil(min(window * pose2.body.fps, len(pose2.body.data) * window))
 
-    last_data = pose1.body.data[len(pose1.body.data) - p1_size:]
-    first_data = pose2.body.data[:p2_size]
+    if ConnectionSettings.use_descriptors:
+        last_vectors = pose_descriptors(pose1, len(pose1.body.data) - p1_size, len(pose1.body.data))
+        first_vectors = pose_descriptors(pose2, 0, p2_size)
+        distances_matrix = squared_distances(last_vectors, first_vectors)
+    else:
+        last_data = pose1.body.data[len(pose1.body.data) - p1_size:]
+        first_data = pose2.body.data[:p2_size]
+
+        last_vectors = last_data.reshape(len(last_data), -1)
+        first_vectors = first_data.reshape(len(first_data), -1)
 
-    last_vectors = last_data.reshape(len(last_data), -1)
-    first_vectors = first_data.reshape(len(first_data), -1)
+        distances_matrix = cdist(last_vectors, first_vectors, 'euclidean')
 
-    distances_matrix = cdist(last_vectors, first_vectors, 'euclidean')
     min_index = np.unravel_index(np.argmin(distances_matrix, axis=None), distances_matrix.shape)
     last_index = len(pose1.body.data) - p1_size + min_index[0]
     return last_index, min_index[1]
@@ -0,0 +1,65 @@
+import numpy as np
+import scipy.signal
+from pose_format import Pose
+
+from spoken_to_signed.gloss_to_pose.concatenate import prepare_pose, trim_pose
+from spoken_to_signed.gloss_to_pose.smoothing import ConnectionSettings, connection_descriptors, \
+    find_best_connection_point, pose_savgol_filter
+
+
+def looped_savgol_filter(pose: Pose):
+    # The original, per point and per dimension implementation
+    [face_component] = [c for c in pose.header.components if c.name == 'FACE_LANDMARKS']
+    face_range = range(
+        pose.header._get_point_index('FACE_LANDMARKS', face_component.points[0]),
+        pose.header._get_point_index('FACE_LANDMARKS', face_component.points[-1]),
+    )
+
+    _, _, points, dims = pose.body.data.shape
+    for p in range(points):
+        if p not in face_range:
+            for d in range(dims):
+                pose.body.data[:, 0, p, d] = scipy.signal.savgol_filter(pose.body.data[:, 0, p, d], 3, 1)
+    return pose
+
+
+def test_pose_savgol_filter_matches_looped_implementation(load_pose):
+    for name in ["ase/fs-sts13206cebad70790ee136a34c7a74af5e.pose", "sgg/05e2ba412aae7c5a7cfce84c52d5e509.pose"]:
+        expected = looped_savgol_filter(load_pose(name))
+        actual = pose_savgol_filter(load_pose(name))
+
+        assert actual.body.data.dtype == expected.body.data.dtype
+        np.testing.assert_array_equal(np.ma.getmaskarray(actual.body.data), np.ma.getmaskarray(expected.body.data))
+
+        # Interior frames are bit-identical, the polynomial fit of the edge frames may differ in float32 rounding
+        np.testing.assert_array_equal(actual.body.data.data[1:-1], expected.body.data.data[1:-1])
+        np.testing.assert_allclose(actual.body.data.data, expected.body.data.data, rtol=1e-6, atol=1e-5)
+
+
+def test_pose_savgol_filter_skips_face(load_pose):
+    pose = load_pose("ase/fs-sts13206cebad70790ee136a34c7a74af5e.pose")
+    face_index = pose.header._get_point_index('FACE_LANDMARKS', '0')
+    original_face = pose.body.data.data[:, 0, face_index].copy()
+
+    smoothed = pose_savgol_filter(pose)
+    np.testing.assert_array_equal(smoothed.body.data.data[:, 0, face_index], original_face)
+
+
+def test_find_best_connection_point_precomputed_descriptors(load_pose):
+    def trimmed_poses(precompute: bool):
+        poses = [prepare_pose(load_pose(name)) for name in ["ase/fs-sts13206cebad70790ee136a34c7a74af5e.pose",
+                                                             "sgg/05e2ba412aae7c5a7cfce84c52d5e509.pose"]]
+        if precompute:
+            for pose in poses:
+                pose.descriptors = connection_descriptors(pose)
+        return [trim_pose(poses[0], start=False), trim_pose(poses[1], end=False)]
+
+    ConnectionSettings.use_descriptors = True
+    try:
+        computed = find_best_connection_point(*trimmed_poses(precompute=False))
+        poses = trimmed_poses(precompute=True)
+        # Trimming slices the precomputed descriptors along with the frames
+        assert poses[0].descriptors.shape == (len(poses[0].body.data), (6 + 21 + 21) * 3)
+        assert find_best_connection_point(*poses) == computed
+    finally:
+        ConnectionSettings.use_descriptors = False
@@ -0,0 +1,236 @@
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import scipy.signal
+from pose_format import Pose, PoseHeader
+from pose_format.numpy import NumPyPoseBody
+from pose_format.utils.generic import correct_wrists, normalize_pose_size, reduce_holistic
+
+from spoken_to_signed.gloss_to_pose.concatenate import ConcatenationSettings, PreparedPose, normalize_pose, trim_pose
+from spoken_to_signed.gloss_to_pose.smoothing import find_best_connection_point, savgol_points_mask
+
+# Streaming version of concatenate_poses. Poses are joined as they arrive, and frames are emitted once final:
+# - Missing points are linearly interpolated between observations (like NumPyPoseBody.interpolate in the batch
+#   version), so a frame is final once every point missing in it was observed again, or never observed before it.
+# - The Savitzky-Golay filter (window of 3) needs the next frame.
+# Each join needs the next sign, and finalizing frames may need more of them, for points that are missing for a while.
+# To bound the latency, points that stay missing for more than `lookahead` signs can be considered gone instead of
+# waiting for them. Only then does the output differ from the batch version.
+
+
+class StreamingTimeline:
+    """Assembles consecutive segments like smooth_concatenate_poses, correct_wrists and normalize_pose_size."""
+
+    def __init__(self, header: PoseHeader, fps: float, lookahead: Optional[int]):
+        self.header = header
+        self.fps = fps
+        self.lookahead = lookahead
+        self.points_mask = savgol_points_mask(header)
+
+        # Frames waiting for interpolation, from global frame index `base`. The last dimension is (x, y, z, confidence)
+        self.raw = None
+        self.base = 0
+        self.segment_starts = []
+
+        # Last observation of every point before `base`
+        self.previous_index = None
+        self.previous_values = None
+
+        # Interpolated frames waiting for smoothing, from global frame index `interpolated_base`
+        self.interpolated = None
+        self.interpolated_base = 0
+        self.emitted = 0
+
+    def append(self, data: np.ndarray, confidence: np.ndarray, is_sign: bool = True):
+        frames = np.concatenate([np.ma.getdata(data), np.expand_dims(confidence, axis=-1)], axis=-1)
+        frames = frames.reshape((len(frames), -1, frames.shape[-1]))  # (frames, people * points, dims + 1)
+
+        if self.raw is None:
+            self.raw = frames[:0]
+            self.interpolated = frames[:0]
+            self.previous_index = np.full(frames.shape[1], -1)
+            self.previous_values = np.zeros(frames.shape[1:])
+
+        if is_sign:
+            self.segment_starts.append(self.base + len(self.raw))
+        self.raw = np.concatenate([self.raw, frames])
+
+    def flush(self) -> Iterator[Pose]:
+        valid = self.raw[:, :, -1] > 0
+        # A point is undetermined in a frame if it was observed before, but not observed since
+        observed_before = (self.previous_index >= 0) | (np.cumsum(valid, axis=0) - valid > 0)
+        observed_after = np.flip(np.cumsum(np.flip(valid, axis=0), axis=0), axis=0) > 0
+        undetermined = (observed_before & ~observed_after).any(axis=1)
+        frontier = self.base + (np.argmax(undetermined) if undetermined.any() else len(self.raw))
+
+        forced = False
+        if self.lookahead is not None and len(self.segment_starts) > self.lookahead:
+            forced_frontier = self.segment_starts[-self.lookahead]
+            if forced_frontier > frontier:
+                frontier = forced_frontier
+                forced = True
+
+        self.interpolate_until(frontier, forced)
+        yield from self.smooth(final=False)
+
+    def finish(self) -> Iterator[Pose]:
+        self.interpolate_until(self.base + len(self.raw))
+        yield from self.smooth(final=True)
+
+    def interpolate_until(self, frontier: int, forced: bool = False):
+        count = frontier - self.base
+        if count <= 0:
+            return
+
+        valid = self.raw[:, :, -1] > 0
+        frame_indexes = self.base + np.arange(len(self.raw))[:, None]
+
+        # Index of the previous and next observation of every point, in every frame
+        previous_index = np.maximum.accumulate(np.where(valid, frame_indexes, -1), axis=0)
+        previous_index = np.maximum(previous_index, self.previous_index)
+        no_next = np.iinfo(np.int64).max
+        next_index = np.flip(np.minimum.accumulate(np.flip(np.where(valid, frame_indexes, no_next), axis=0), axis=0),
+                             axis=0)
+
+        previous_index, next_index = previous_index[:count], next_index[:count]
+        points = np.arange(self.raw.shape[1])
+
+        def values_at(indexes: np.ndarray) -> np.ndarray:
+            # Observations before `base` come from the previous flush
+            local = np.clip(indexes - self.base, 0, len(self.raw) - 1)
+            return np.where((indexes >= self.base)[..., None], self.raw[local, points], self.previous_values)
+
+        previous_values = values_at(previous_index)
+        next_values = values_at(np.minimum(next_index, self.base + len(self.raw) - 1))
+
+        # Same formula as scipy's linear interp1d
+        gap = (next_index - previous_index).astype(np.float64)
+        slope = (next_values - previous_values) / np.where(gap > 0, gap, 1)[..., None]
+        interpolated = slope * (frame_indexes[:count] - previous_index)[..., None] + previous_values
+
+        in_gap = (previous_index >= 0) & (next_index != no_next)
+        frames = np.where(valid[:count, :, None], self.raw[:count], np.where(in_gap[..., None], interpolated, 0))
+
+        # Remember the last observation of every point
+        last_valid = valid[:count].any(axis=0)
+        last_index = count - 1 - np.argmax(np.flip(valid[:count], axis=0), axis=0)
+        self.previous_values = np.where(last_valid[:, None], self.raw[last_index, points], self.previous_values)
+        self.previous_index = np.where(last_valid, self.base + last_index, self.previous_index)
+        if forced:
+            # Points that are not observed again in the lookahead are gone
+            self.previous_index[~(valid[count:].any(axis=0))] = -1
+
+        self.raw = self.raw[count:]
+        self.base = frontier
+        self.segment_starts = [start for start in self.segment_starts if start > frontier]
+        self.interpolated = np.concatenate([self.interpolated, frames])
+
+    def smooth(self, final: bool) -> Iterator[Pose]:
+        end = self.interpolated_base + len(self.interpolated)
+        # The filter needs the next frame, and the edges are fitted on the first and last 3 frames
+        emit_until = end if final else end - 1
+        if emit_until <= self.emitted or (self.emitted == 0 and end < 3):
+            return
+
+        window_start = max(self.emitted - 2 if final else self.emitted - 1, 0)
+        window = self.interpolated[window_start - self.interpolated_base:]
+        chunk = window[self.emitted - window_start:emit_until - window_start]
+
+        people, dims = self.header_shape()
+        data = chunk[:, :, :-1].reshape((len(chunk), people, -1, dims)).copy()
+        confidence = chunk[:, :, -1].reshape((len(chunk), people, -1))
+
+        window_data = window[:, :, :-1].reshape((len(window), people, -1, dims))
+        smoothed = scipy.signal.savgol_filter(window_data[:, 0, self.points_mask], 3, 1, axis=0)
+
+        body = NumPyPoseBody(fps=self.fps, data=data, confidence=confidence)
+        body.data[:, 0, self.points_mask] = smoothed[self.emitted - window_start:emit_until - window_start]
+
+        # correct_wrists copies the pose, so normalize_pose_size doesn't modify the shared header
+        pose = correct_wrists(Pose(self.header, body))
+        normalize_pose_size(pose)
+
+        # Keep the last frames, for the filter window of the next chunk
+        keep_from = max(emit_until - 2, 0)
+        self.interpolated = self.interpolated[keep_from - self.interpolated_base:]
+        self.interpolated_base = keep_from
+        self.emitted = emit_until
+
+        yield pose
+
+    def header_shape(self):
+        dims = self.raw.shape[-1] - 1
+        people = self.raw.shape[1] // self.header.total_points()
+        return people, dims
+
+
+def prepare_for_concatenation(pose: Pose) -> Pose:
+    # Prepared poses were already reduced and normalized when the lexicon was prepared
+    if isinstance(pose, PreparedPose):
+        return pose
+    if ConcatenationSettings.is_reduce_holistic:
+        pose = reduce_holistic(pose)
+    return normalize_pose(pose)
+
+
+def stream_concatenate_poses(poses: Iterable[Pose],
+                             trim=True,
+                             padding=0.20,
+                             lookahead: Optional[int] = None) -> Iterator[Pose]:
+    """
+    Same as concatenate_poses, but yields chunks of final frames, as soon as the joins around them are decided.
+    Each pose is only needed once the previous one is being joined, so poses can be looked up lazily.
+    """
+    poses = iter(poses)
+
+    current = next(poses, None)
+    if current is None:
+        raise ValueError("No poses to smooth")
+    current = prepare_for_concatenation(current)
+
+    following = next(poses, None)
+    if following is None:
+        # A single pose is not smoothed
+        pose = correct_wrists(current)
+        normalize_pose_size(pose)
+        yield pose
+        return
+
+    if trim:
+        current = trim_pose(current, start=False, end=True)
+
+    timeline = StreamingTimeline(current.header, current.body.fps, lookahead)
+    padding_frames = int(padding * current.body.fps)
+
+    start = 0
+    while current is not None:
+        if following is not None:
+            following = prepare_for_concatenation(following)
+            after = next(poses, None)
+            if trim:
+                following = trim_pose(following, start=True, end=after is not None)
+            end, next_start = find_best_connection_point(current, following)
+        else:
+            after = None
+            end = len(current.body.data)
+            next_start = None
+
+        body = current.body[start:end]
+        timeline.append(body.data, body.confidence)
+        if following is not None:
+            data_shape = body.data.shape
+            timeline.append(np.zeros((padding_frames,) + data_shape[1:]),
+                            np.zeros((padding_frames,) + data_shape[1:3]),
+                            is_sign=False)
+
+        yield from timeline.flush()
+
+        current, following, start = following, after, next_start
+
+    yield from timeline.finish()
+
+
+def concatenate_chunks(chunks: List[Pose]) -> Pose:
+    data = np.ma.concatenate([chunk.body.data for chunk in chunks])
+    confidence = np.concatenate([chunk.body.confidence for chunk in chunks])
+    return Pose(chunks[0].header, NumPyPoseBody(fps=chunks[0].body.fps, data=data, confidence=confidence))
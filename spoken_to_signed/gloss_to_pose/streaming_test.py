@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+from pose_format import Pose
+
+from spoken_to_signed.gloss_to_pose import stream_gloss_to_pose
+from spoken_to_signed.gloss_to_pose.concatenate import concatenate_poses
+from spoken_to_signed.gloss_to_pose.lookup import PoseLookup
+from spoken_to_signed.gloss_to_pose.streaming import concatenate_chunks, stream_concatenate_poses
+
+
+def assert_same_pose(pose: Pose, expected: Pose):
+    # Interpolation differs from the batch version in floating point rounding only
+    assert pose.body.data.shape == expected.body.data.shape
+    np.testing.assert_allclose(np.ma.getdata(pose.body.data), np.ma.getdata(expected.body.data), atol=1e-6)
+    np.testing.assert_allclose(pose.body.confidence, expected.body.confidence, atol=1e-9)
+
+
+def test_stream_concatenate_poses_matches_batch(load_poses):
+    batch = concatenate_poses(load_poses())
+    chunks = list(stream_concatenate_poses(load_poses()))
+
+    assert len(chunks) > 1
+    assert_same_pose(concatenate_chunks(chunks), batch)
+
+
+def test_stream_concatenate_poses_single_pose(load_poses):
+    batch = concatenate_poses(load_poses()[:1])
+    chunks = list(stream_concatenate_poses(load_poses()[:1]))
+
+    assert len(chunks) == 1
+    assert_same_pose(chunks[0], batch)
+
+
+def test_stream_concatenate_poses_lookahead_bounds_missing_points(load_poses):
+    def poses_with_missing_hand():
+        poses = load_poses()
+        start = poses[0].header._get_point_index("RIGHT_HAND_LANDMARKS", "WRIST")
+        for pose in poses[1:3]:
+            pose.body.confidence[:, :, start:start + 21] = 0
+        return poses
+
+    exact = list(stream_concatenate_poses(poses_with_missing_hand()))
+    bounded = list(stream_concatenate_poses(poses_with_missing_hand(), lookahead=1))
+
+    # Waiting for the hand to reappear delays frames, bounding the lookahead emits them earlier
+    assert len(bounded) > len(exact)
+    assert len(concatenate_chunks(bounded).body.data) == len(concatenate_chunks(exact).body.data)
+    assert np.isfinite(np.ma.getdata(concatenate_chunks(bounded).body.data)).all()
+
+
+class BlockingLookup(PoseLookup):
+    """Looks up the poses of glosses named by their index, the ones from `blocked` wait for `release`"""
+
+    def __init__(self, poses, blocked: int):
+        super().__init__(rows=[])
+        self.poses = poses
+        self.blocked = blocked
+        self.release = threading.Event()
+        self.finished = set()
+
+    def lookup(self, word, gloss, spoken_language, signed_language, source=None, prepared=False):
+        index = int(word)
+        if index >= self.blocked:
+            self.release.wait(timeout=5)
+        self.finished.add(index)
+        return self.poses[index]
+
+
+def test_stream_gloss_to_pose_yields_before_later_lookups_finish(load_poses):
+    # The right hand is missing after the first frame, so without a bounded lookahead, frames wait for every sign
+    poses = load_poses() + load_poses() + load_poses()
+    start = poses[0].header._get_point_index("RIGHT_HAND_LANDMARKS", "WRIST")
+    poses[0].body.confidence[1:, :, start:start + 21] = 0
+    for pose in poses[1:]:
+        pose.body.confidence[:, :, start:start + 21] = 0
+
+    # With a lookahead of 2 signs, the first chunk needs the first 6 poses
+    lookup = BlockingLookup(poses, blocked=6)
+    glosses = [(str(i), str(i)) for i in range(len(poses))]
+    chunks = stream_gloss_to_pose(glosses, lookup, "en", "ase", enable_expressions=False)
+    try:
+        first = next(chunks)
+        assert len(first.body.data) > 0
+        assert lookup.finished.isdisjoint(range(6, len(poses)))
+    finally:
+        lookup.release.set()
+    assert len(list(chunks)) > 0
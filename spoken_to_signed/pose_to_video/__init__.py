@@ -1,5 +1,148 @@
+import io
+import math
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
 from pose_format import Pose
 
+# Skeleton rendering of poses to video. Frames are drawn in a pool of processes, in chunks, and written to the
+# encoder in order as soon as they are drawn. Only a few chunks are in flight at a time, so memory stays bounded
+# regardless of the video length.
+
+# Output height (the width keeps the aspect ratio of the pose), fps (None for the pose fps) and encoder settings
+RENDER_PRESETS = {
+    "preview": {"height": 360, "fps": 12, "crf": 28, "encoder_preset": "veryfast"},
+    "final": {"height": 720, "fps": None, "crf": 18, "encoder_preset": "slow"},
+}
+
+_visualizer = None
+
+
+def output_size(pose: Pose, height: int) -> Tuple[int, int, float]:
+    dimensions = pose.header.dimensions
+    scale = height / dimensions.height
+    # yuv420p needs even dimensions
+    width = 2 * round(dimensions.width * scale / 2)
+    return width, 2 * round(height / 2), scale
+
+
+def frame_indexes(pose: Pose, fps: Optional[float]) -> Tuple[List[int], float]:
+    pose_fps = float(pose.body.fps)
+    if fps is None or fps >= pose_fps:
+        return list(range(len(pose.body.data))), pose_fps
+    # Drop frames evenly to reach the target fps
+    duration = len(pose.body.data) / pose_fps
+    count = max(1, math.floor(duration * fps))
+    return [min(math.floor(i * pose_fps / fps), len(pose.body.data) - 1) for i in range(count)], fps
+
+
+def _init_renderer(pose_bytes: bytes, width: int, height: int, scale: float,
+                   background_color: Tuple[int, int, int]):
+    # Every process reads its own copy of the pose, scaled to the output size
+    from spoken_to_signed.pose_visualizer import PoseVisualizer
+
+    global _visualizer
+    pose = Pose.read(pose_bytes)
+    pose.body.data = pose.body.data * scale
+    pose.header.dimensions.width = width
+    pose.header.dimensions.height = height
+    _visualizer = PoseVisualizer(pose)
+    _visualizer.background = np.full((height, width, 3), fill_value=background_color, dtype=np.uint8)
+
+
+def _render_frames(indexes: List[int]) -> np.ndarray:
+    body = _visualizer.pose.body
+    frames = [_visualizer._draw_frame(body.data[i], body.confidence[i], img=_visualizer.background.copy())
+              for i in indexes]
+    return np.stack(frames)
+
+
+def render_frames(pose: Pose,
+                  preset: str = "final",
+                  workers: Optional[int] = None,
+                  chunk_size: int = 16,
+                  background_color: Tuple[int, int, int] = (255, 255, 255)) -> Iterator[np.ndarray]:
+    """
+    Draw the pose (including the FACE component, see PoseVisualizer) as BGR frames, in order, for the given preset.
+    With workers=0, frames are drawn in this process.
+    """
+    settings = RENDER_PRESETS[preset]
+    width, height, scale = output_size(pose, settings["height"])
+    indexes, _ = frame_indexes(pose, settings["fps"])
+    chunks = [indexes[i:i + chunk_size] for i in range(0, len(indexes), chunk_size)]
+
+    buffer = io.BytesIO()
+    pose.write(buffer)
+    init_args = (buffer.getvalue(), width, height, scale, background_color)
+
+    if workers == 0:
+        _init_renderer(*init_args)
+        for chunk in chunks:
+            yield from _render_frames(chunk)
+        return
+
+    workers = workers if workers is not None else os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer, initargs=init_args) as executor:
+        # A bounded window of chunks in flight, written in order as they complete
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_render_frames, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class FFmpegWriter:
+    """Encodes raw BGR frames piped to an ffmpeg process"""
+
+    def __init__(self, video_path: str, width: int, height: int, fps: float, crf: int, encoder_preset: str):
+        args = ["ffmpeg", "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                "-c:v", "libx264", "-preset", encoder_preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+                video_path]
+        try:
+            self.process = subprocess.Popen(args, stdin=subprocess.PIPE)
+        except FileNotFoundError as e:
+            raise RuntimeError("ffmpeg is required to encode videos, please install it") from e
+
+    def write(self, frame: np.ndarray):
+        self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {self.process.returncode}")
+
+
+def open_writer(video_path: str, width: int, height: int, fps: float, crf: int, encoder_preset: str):
+    try:
+        from vidgear.gears import WriteGear
+    except ImportError:
+        return FFmpegWriter(video_path, width, height, fps, crf, encoder_preset)
+
+    output_params = {
+        "-vcodec": "libx264",
+        "-preset": encoder_preset,
+        "-input_framerate": fps,
+        "-pix_fmt": "yuv420p",
+        "-crf": crf,
+    }
+    return WriteGear(output=video_path, logging=False, **output_params)
+
+
+def pose_to_video(pose: Pose, video_path: str, preset: str = "final", workers: Optional[int] = None):
+    settings = RENDER_PRESETS[preset]
+    width, height, _ = output_size(pose, settings["height"])
+    _, fps = frame_indexes(pose, settings["fps"])
 
-def pose_to_video(pose: Pose, video_path: str):
-    raise NotImplementedError
+    writer = open_writer(video_path, width, height, fps, settings["crf"], settings["encoder_preset"])
+    try:
+        for frame in render_frames(pose, preset=preset, workers=workers):
+            writer.write(frame)
+    finally:
+        writer.close()
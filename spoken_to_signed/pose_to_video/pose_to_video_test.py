@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import numpy as np
+from pose_format import Pose
+
+from spoken_to_signed.pose_to_video import frame_indexes, render_frames
+from spoken_to_signed.pose_visualizer import PoseVisualizer
+
+POSE_PATH = Path(__file__).parent.parent / "assets" / "fingerspelling_lexicon" / "sgg" / \
+    "05e2ba412aae7c5a7cfce84c52d5e509.pose"
+
+
+def load_pose() -> Pose:
+    with open(POSE_PATH, "rb") as f:
+        return Pose.read(f.read())
+
+
+def test_render_frames_preview_preset():
+    pose = load_pose()
+    frames = list(render_frames(pose, preset="preview", workers=0, chunk_size=4))
+
+    indexes, fps = frame_indexes(pose, 12)
+    assert fps == 12
+    assert len(frames) == len(indexes) < len(pose.body.data)
+    assert frames[0].shape[0] == 360 and frames[0].shape[1] % 2 == 0
+    assert frames[0].dtype == np.uint8
+
+
+def test_render_frames_pool_matches_in_process():
+    pose = load_pose()
+    in_process = np.stack(list(render_frames(pose, preset="preview", workers=0, chunk_size=4)))
+    pooled = np.stack(list(render_frames(pose, preset="preview", workers=2, chunk_size=4)))
+
+    np.testing.assert_array_equal(pooled, in_process)
+
+
+def test_draw_frame_matches_draw():
+    visualizer = PoseVisualizer(load_pose())
+    np.testing.assert_array_equal(visualizer.draw_frame(0), next(visualizer.draw()))
@@ -7,15 +7,20 @@ class PoseVisualizer(BasePoseVisualizer):
         super().__init__(pose, **kwargs)
         self.face_color = (0, 255, 0)  # Green for facial features
         self.face_thickness = 1
-        
+
+    def face_start_index(self):
+        names = [c.name for c in self.pose.header.components]
+        if 'FACE' not in names:
+            return None
+        face_idx = names.index('FACE')
+        return sum(len(c.points) for c in self.pose.header.components[:face_idx])
+
     def draw_face_component(self, frame, points, confidence):
         """Draw facial landmarks and connections."""
-        if 'FACE' not in self.pose.header.components_names():
+        start_idx = self.face_start_index()
+        if start_idx is None:
             return frame
-            
-        face_idx = self.pose.header.components_names().index('FACE')
-        start_idx = sum(len(c.points) for c in self.pose.header.components[:face_idx])
-        
+
         def draw_feature(indices, close=False):
             pts = points[indices].astype(np.int32)
             if close:
@@ -23,36 +28,43 @@ class PoseVisualizer(BasePoseVisualizer):
             else:
                 for i in range(len(pts) - 1):
                     if confidence[indices[i]] > 0.2 and confidence[indices[i + 1]] > 0.2:
-                        cv2.line(frame, tuple(pts[i]), tuple(pts[i + 1]), 
+                        cv2.line(frame, tuple(pts[i]), tuple(pts[i + 1]),
                                self.face_color, self.face_thickness)
-        
+
         # Draw eyes
         left_eye_indices = range(start_idx, start_idx + 8)
         right_eye_indices = range(start_idx + 8, start_idx + 16)
         draw_feature(left_eye_indices, close=True)
         draw_feature(right_eye_indices, close=True)
-        
+
         # Draw eyebrows
         left_brow_indices = range(start_idx + 16, start_idx + 21)
         right_brow_indices = range(start_idx + 21, start_idx + 26)
         draw_feature(left_brow_indices)
         draw_feature(right_brow_indices)
-        
+
         # Draw mouth
         mouth_outer_indices = range(start_idx + 26, start_idx + 44)
         mouth_inner_indices = range(start_idx + 44, start_idx + 62)
         draw_feature(mouth_outer_indices, close=True)
         draw_feature(mouth_inner_indices, close=True)
-        
+
         return frame
-    
-    def draw_frame(self, frame_idx: int = 0):
-        """Override draw_frame to include facial landmarks."""
-        frame = super().draw_frame(frame_idx)
-        
-        if frame is not None and 'FACE' in self.pose.header.components_names():
-            points = self.pose.body.data[frame_idx, 0]
-            confidence = self.pose.body.confidence[frame_idx, 0]
-            frame = self.draw_face_component(frame, points, confidence)
-        
-        return frame 
\ No newline at end of file
+
+    def _draw_frame(self, frame, frame_confidence, img, transparency: bool = False):
+        """Override _draw_frame (used by draw) to include facial landmarks."""
+        img = super()._draw_frame(frame, frame_confidence, img, transparency)
+
+        if self.face_start_index() is not None:
+            # Only the coordinates, the face is drawn on the image plane
+            points = np.asarray(frame[0])[:, :2]
+            confidence = np.asarray(frame_confidence[0])
+            img = self.draw_face_component(img, points, confidence)
+
+        return img
+
+    def draw_frame(self, frame_idx: int = 0, background_color=(255, 255, 255)):
+        """Draw a single frame, including facial landmarks, on a plain background."""
+        background = np.full((self.pose.header.dimensions.height, self.pose.header.dimensions.width, 3),
+                             fill_value=background_color, dtype="uint8")
+        return self._draw_frame(self.pose.body.data[frame_idx], self.pose.body.confidence[frame_idx], img=background)
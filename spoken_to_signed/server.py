@@ -0,0 +1,153 @@
+import argparse
+import importlib
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from spoken_to_signed.bin import _gloss_to_pose, _pose_lookup, _result_cache, _text_to_gloss
+
+GLOSSERS = ['simple', 'spacylemma', 'rules', 'nmt']
+
+
+class Timings:
+    """Collects the duration of each stage of a request, reported in a Server-Timing header"""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - start) * 1000))
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={duration:.1f}" for name, duration in self.stages)
+
+
+class TranslationServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, lexicon: str, max_concurrency: int, queue_timeout: float):
+        super().__init__(address, TranslationRequestHandler)
+        self.lexicon = lexicon
+        self.queue_timeout = queue_timeout
+        # Requests beyond this limit wait for a free slot, up to queue_timeout seconds
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+
+    def warm_up(self, glossers):
+        print("Loading lexicon...")
+        pose_lookup = _pose_lookup(self.lexicon)
+        spoken_languages = list(pose_lookup.words_index.keys())
+
+        for glosser in glossers:
+            print(f"Loading glosser {glosser}...")
+            importlib.import_module(f"spoken_to_signed.text_to_gloss.{glosser}")
+            # Glossers load their models (dictionaries, spaCy pipelines) lazily, per language
+            for spoken_language in spoken_languages:
+                try:
+                    _text_to_gloss("a", spoken_language, glosser)
+                except (ImportError, ValueError, NotImplementedError) as e:
+                    print(f"Could not warm up {glosser} for {spoken_language}: {e}")
+
+
+class TranslationRequestHandler(BaseHTTPRequestHandler):
+    server: TranslationServer
+
+    def send_json(self, status: HTTPStatus, content: dict):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+        pose_lookup = _pose_lookup(self.server.lexicon)
+        self.send_json(HTTPStatus.OK, {
+            "status": "ok",
+            "cache": pose_lookup.cache_stats(),
+            "result_cache": _result_cache().stats()
+        })
+
+    def do_POST(self):
+        if self.path != "/text_to_gloss_to_pose":
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(content_length))
+            text = request["text"]
+            spoken_language = request["spoken_language"]
+            signed_language = request["signed_language"]
+            glosser = request.get("glosser", "simple")
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {e}"})
+
+        if glosser not in GLOSSERS:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"Unknown glosser {glosser}"})
+
+        timings = Timings()
+        with timings.stage("queue"):
+            acquired = self.server.slots.acquire(timeout=self.server.queue_timeout)
+        if not acquired:
+            return self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many concurrent requests"})
+
+        try:
+            with timings.stage("text_to_gloss"):
+                sentences = _text_to_gloss(text, spoken_language, glosser, signed_language=signed_language)
+            with timings.stage("gloss_to_pose"):
+                pose = _gloss_to_pose(sentences, self.server.lexicon, spoken_language, signed_language)
+            with timings.stage("write"):
+                buffer = io.BytesIO()
+                pose.write(buffer)
+        except (ValueError, NotImplementedError) as e:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except Exception as e:  # pylint: disable=broad-except
+            return self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        finally:
+            self.server.slots.release()
+
+        body = buffer.getvalue()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Server-Timing", timings.header())
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve text to pose translation, keeping models and lexicons warm")
+    parser.add_argument("--lexicon", type=str, required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=os.cpu_count())
+    parser.add_argument("--queue-timeout", type=float, default=30, help="Seconds to wait for a free slot")
+    parser.add_argument("--glossers", choices=GLOSSERS, nargs="*", default=["simple"], help="Glossers to preload")
+    args = parser.parse_args()
+
+    server = TranslationServer((args.host, args.port), args.lexicon, args.max_concurrency, args.queue_timeout)
+    server.warm_up(args.glossers)
+
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
+import functools
 import os
 import tarfile
 import requests
-import torch as pt
-import sentencepiece as spm
-import sockeye.inference
 
-from sockeye import inference, model
-from typing import Dict, List, Any
+from typing import Dict, List, Any, TYPE_CHECKING
 
 from .types import Gloss
 
+if TYPE_CHECKING:
+    import sentencepiece as spm
+
 
 MODELS_PATH = './models'
 
@@ -43,48 +43,81 @@ def download_model_if_does_not_exist(sockeye_paths: Dict[str, str]):
                                        "attempting to download and extract." % model_path
 
 
-def load_sockeye_models():
+SPM_NAME = "sentencepiece.model"
 
-    os.makedirs(MODELS_PATH, exist_ok=True)
+SOCKEYE_PATHS = {
+    "dgs_de": {
+        "model_path": os.path.join(MODELS_PATH, "dgs_de"),
+        "spm_path": os.path.join(MODELS_PATH, "dgs_de", SPM_NAME),
+        "url": "https://files.ifi.uzh.ch/cl/archiv/2022/easier/dgs_de.tar.gz"
+    }
+}
 
-    spm_name = "sentencepiece.model"
+# Number of threads torch uses for CPU inference, defaults to torch's own choice (usually the number of cores)
+NUM_THREADS_ENV = "SPOKEN_TO_SIGNED_NMT_THREADS"
 
-    sockeye_paths_dict = {
-        "dgs_de": {
-                         "model_path": os.path.join(MODELS_PATH, "dgs_de"),
-                         "spm_path": os.path.join(MODELS_PATH, "dgs_de", spm_name),
-                         "url": "https://files.ifi.uzh.ch/cl/archiv/2022/easier/dgs_de.tar.gz"
-                        }
-    }
 
-    sockeye_models_dict = {}
+def set_num_threads(num_threads: int):
+    import torch as pt
+    pt.set_num_threads(num_threads)
+
 
-    device = pt.device('cpu')
+@functools.lru_cache(maxsize=1)
+def get_device():
+    import torch as pt
 
-    for model_name in sockeye_paths_dict.keys():
+    num_threads = os.environ.get(NUM_THREADS_ENV)
+    if num_threads is not None:
+        set_num_threads(int(num_threads))
 
-        sockeye_paths = sockeye_paths_dict[model_name]
+    return pt.device('cpu')
+
+
+@functools.lru_cache(maxsize=None)
+def load_sockeye_model(model_name: str) -> Dict[str, Any]:
+    """Load (and download if necessary) a single model. Models are only loaded on first use, then kept in memory."""
+    import sentencepiece as spm
+    from sockeye import model
+
+    os.makedirs(MODELS_PATH, exist_ok=True)
 
-        download_model_if_does_not_exist(sockeye_paths)
+    sockeye_paths = SOCKEYE_PATHS[model_name]
+    download_model_if_does_not_exist(sockeye_paths)
 
-        model_path = sockeye_paths["model_path"]
-        spm_path = sockeye_paths["spm_path"]
+    sockeye_models, sockeye_source_vocabs, sockeye_target_vocabs = model.load_models(
+        device=get_device(), dtype=None, model_folders=[sockeye_paths["model_path"]], inference_only=True)
 
-        sockeye_models, sockeye_source_vocabs, sockeye_target_vocabs = model.load_models(
-            device=device, dtype=None, model_folders=[model_path], inference_only=True)
+    return {"sockeye_models": sockeye_models,
+            "spm_model": spm.SentencePieceProcessor(model_file=sockeye_paths["spm_path"]),
+            "sockeye_source_vocabs": sockeye_source_vocabs,
+            "sockeye_target_vocabs": sockeye_target_vocabs}
 
-        sockeye_models_dict[model_name] = {"sockeye_models": sockeye_models,
-                                           "spm_model": spm.SentencePieceProcessor(model_file=spm_path),
-                                           "sockeye_source_vocabs": sockeye_source_vocabs,
-                                           "sockeye_target_vocabs": sockeye_target_vocabs}
 
-    return device, sockeye_paths_dict, sockeye_models_dict
+def load_sockeye_models() -> Dict[str, Dict[str, Any]]:
+    """Explicitly load all models, e.g. to warm up a server before the first request"""
+    return {model_name: load_sockeye_model(model_name) for model_name in SOCKEYE_PATHS}
 
 
-device, sockeye_paths_dict, sockeye_models_dict = load_sockeye_models()
+@functools.lru_cache(maxsize=None)
+def get_translator(model_name: str, beam_size: int, nbest_size: int, batch_size: int):
+    from sockeye import inference
 
+    sockeye_model = load_sockeye_model(model_name)
 
-def apply_pieces(text: str, spm_model: spm.SentencePieceProcessor) -> str:
+    return inference.Translator(device=get_device(),
+                                ensemble_mode='linear',
+                                scorer=inference.CandidateScorer(),
+                                output_scores=True,
+                                batch_size=batch_size,
+                                beam_size=beam_size,
+                                beam_search_stop='all',
+                                nbest_size=nbest_size,
+                                models=sockeye_model["sockeye_models"],
+                                source_vocabs=sockeye_model["sockeye_source_vocabs"],
+                                target_vocabs=sockeye_model["sockeye_target_vocabs"])
+
+
+def apply_pieces(text: str, spm_model: "spm.SentencePieceProcessor") -> str:
     text = text.strip()
 
     pieces = spm_model.encode(text, out_type=str)
@@ -120,50 +153,60 @@ def translate(text: str,
               source_language_code: str = "de",
               target_language_code: str = "dgs",
               nbest_size: int = 3) -> Dict[str, Any]:
+    return translate_batch([text],
+                           source_language_code=source_language_code,
+                           target_language_code=target_language_code,
+                           nbest_size=nbest_size,
+                           batch_size=1)[0]
+
+
+def translate_batch(texts: List[str],
+                    source_language_code: str = "de",
+                    target_language_code: str = "dgs",
+                    nbest_size: int = 3,
+                    batch_size: int = 16) -> List[Dict[str, Any]]:
+    from sockeye import inference
 
     if source_language_code == "de":
         model_name = "dgs_de"
     else:
         raise NotImplementedError()
 
-    sockeye_models = sockeye_models_dict[model_name]["sockeye_models"]
-    sockeye_source_vocabs = sockeye_models_dict[model_name]["sockeye_source_vocabs"]
-    sockeye_target_vocabs = sockeye_models_dict[model_name]["sockeye_target_vocabs"]
+    spm_model = load_sockeye_model(model_name)["spm_model"]
 
-    spm_model = sockeye_models_dict[model_name]["spm_model"]
-
-    pieces = apply_pieces(text, spm_model)
+    beam_size = nbest_size
+    translator = get_translator(model_name, beam_size, nbest_size, batch_size)
 
     tag_str = '<2{}>'.format(target_language_code)
-    tagged_pieces = add_tag_to_text(pieces, tag_str)
+    tagged_pieces = [add_tag_to_text(apply_pieces(text, spm_model), tag_str) for text in texts]
 
-    beam_size = nbest_size
+    # Group inputs of similar length in the same batch, to minimize padding
+    order = sorted(range(len(texts)), key=lambda i: len(tagged_pieces[i].split(" ")))
+
+    translations = [None] * len(texts)
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        inputs = [inference.make_input_from_plain_string(i, tagged_pieces[i]) for i in batch]
+        outputs = translator.translate(inputs)  # type: List[sockeye.inference.TranslatorOutput]
+        for i, output in zip(batch, outputs):
+            translations[i] = [remove_pieces(t) for t in output.nbest_translations]
 
-    translator = inference.Translator(device=device,
-                                      ensemble_mode='linear',
-                                      scorer=inference.CandidateScorer(),
-                                      output_scores=True,
-                                      batch_size=1,
-                                      beam_size=beam_size,
-                                      beam_search_stop='all',
-                                      nbest_size=nbest_size,
-                                      models=sockeye_models,
-                                      source_vocabs=sockeye_source_vocabs,
-                                      target_vocabs=sockeye_target_vocabs)
-
-    input_ = inference.make_input_from_plain_string(0, tagged_pieces)
-    output = translator.translate([input_])[0]  # type: sockeye.inference.TranslatorOutput
-
-    translations = output.nbest_translations  # type: List[str]
-    translations = [remove_pieces(t) for t in translations]
-
-    return {
+    return [{
         'source_language_code': source_language_code,
         'target_language_code': target_language_code,
         'nbest_size': nbest_size,
         'text': text,
-        'translations': translations,
-    }
+        'translations': text_translations,
+    } for text, text_translations in zip(texts, translations)]
+
+
+def translations_to_gloss(translations_dict: Dict[str, Any]) -> List[Gloss]:
+    best_translation = translations_dict["translations"][0]  # type: str
+    glosses = best_translation.split(" ")
+
+    tokens = [None] * len(glosses)
+
+    return [list(zip(tokens, glosses))]
 
 
 def text_to_gloss(text: str, language: str, nbest_size: int = 3, **kwargs) -> List[Gloss]:
@@ -176,9 +219,21 @@ def text_to_gloss(text: str, language: str, nbest_size: int = 3, **kwargs) -> Li
     else:
         raise NotImplementedError()
 
-    best_translation = translations_dict["translations"][0]  # type: str
-    glosses = best_translation.split(" ")
+    return translations_to_gloss(translations_dict)
 
-    tokens = [None] * len(glosses)
 
-    return [list(zip(tokens, glosses))]
+def text_to_gloss_batch(texts: List[str],
+                        language: str,
+                        nbest_size: int = 3,
+                        batch_size: int = 16,
+                        **kwargs) -> List[List[Gloss]]:
+    if language == "de":
+        translations_dicts = translate_batch(texts,
+                                             source_language_code="de",
+                                             target_language_code="dgs",
+                                             nbest_size=nbest_size,
+                                             batch_size=batch_size)
+    else:
+        raise NotImplementedError()
+
+    return [translations_to_gloss(translations_dict) for translations_dict in translations_dicts]
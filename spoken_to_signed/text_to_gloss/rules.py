@@ -336,8 +336,10 @@ def text_to_gloss_given_spacy_model(text: str, spacy_model, lang: str = 'de', pu
     if text.strip() == "":
         return {"glosses": [], "tokens": [], "gloss_string": ""}
 
-    doc = spacy_model(text)
+    return doc_to_gloss(spacy_model(text), lang=lang, punctuation=punctuation)
 
+
+def doc_to_gloss(doc, lang: str = 'de', punctuation=False) -> Dict:
     if lang != "fr":
         # Rule 0: Attach separable verb particle to the verb lemma, but not for French
         attach_svp(doc)
@@ -383,3 +385,27 @@ def text_to_gloss(text: str, language: str, punctuation=False, **unused_kwargs)
     tokens = output_dict["tokens"]
 
     return [list(zip(tokens, glosses))]
+
+
+def text_to_gloss_batch(texts: List[str],
+                        language: str,
+                        punctuation=False,
+                        batch_size: int = 256,
+                        n_process: int = 1,
+                        **unused_kwargs) -> List[List[Gloss]]:
+    """Same as text_to_gloss for every text, but runs spaCy over all texts at once with nlp.pipe"""
+    if language not in LANGUAGE_MODELS_RULES:
+        raise NotImplementedError("Don't know language '%s'." % language)
+
+    model_names = LANGUAGE_MODELS_RULES[language]
+    spacy_model = load_spacy_model(model_names)
+
+    results = [[[]] for _ in texts]  # empty texts have no glosses
+
+    indexes = [i for i, text in enumerate(texts) if text.strip() != ""]
+    docs = spacy_model.pipe((texts[i] for i in indexes), batch_size=batch_size, n_process=n_process)
+    for i, doc in zip(indexes, docs):
+        output_dict = doc_to_gloss(doc, lang=language, punctuation=punctuation)
+        results[i] = [list(zip(output_dict["tokens"], output_dict["glosses"]))]
+
+    return results
@@ -16,14 +16,35 @@ def text_to_gloss(text: str, language: str, ignore_punctuation: bool = False, **
     if language not in LANGUAGE_MODELS_SPACY:
         raise NotImplementedError("Don't know language '%s'." % language)
 
+    spacy_model = load_model(language)
+
+    return [doc_to_gloss(spacy_model(text), ignore_punctuation=ignore_punctuation)]
+
+
+def text_to_gloss_batch(texts: List[str],
+                        language: str,
+                        ignore_punctuation: bool = False,
+                        batch_size: int = 256,
+                        n_process: int = 1,
+                        **unused_kwargs) -> List[List[Gloss]]:
+    """Same as text_to_gloss for every text, but runs spaCy over all texts at once with nlp.pipe"""
+    if language not in LANGUAGE_MODELS_SPACY:
+        raise NotImplementedError("Don't know language '%s'." % language)
+
+    spacy_model = load_model(language)
+
+    docs = spacy_model.pipe(texts, batch_size=batch_size, n_process=n_process)
+    return [[doc_to_gloss(doc, ignore_punctuation=ignore_punctuation)] for doc in docs]
+
+
+def load_model(language: str):
     model_name = LANGUAGE_MODELS_SPACY[language]
 
     # disable unnecessary components to make lemmatization faster
+    return load_spacy_model((model_name,), disable=("parser", "ner"))
 
-    spacy_model = load_spacy_model(model_name, disable=("parser", "ner"))
-
-    doc = spacy_model(text)
 
+def doc_to_gloss(doc, ignore_punctuation: bool = False) -> Gloss:
     glosses = []  # type: Gloss
 
     for token in doc:
@@ -34,4 +55,4 @@ def text_to_gloss(text: str, language: str, ignore_punctuation: bool = False, **
         gloss = (token.text, token.lemma_)
         glosses.append(gloss)
 
-    return [glosses]
+    return glosses
@@ -1,14 +1,19 @@
 import os
-import pandas as pd
+
+from spoken_to_signed.gloss_to_pose.lookup.index_manifest import update_index
 
 # Paths
-CSV_PATH = os.path.join("ISL_lexicon", "index.csv")
-VIDEO_FOLDER = os.path.join("ISL_lexicon", "Videos", "output")
+LEXICON_DIRECTORY = "ISL_lexicon"
+VIDEO_FOLDER = os.path.join(LEXICON_DIRECTORY, "Videos", "output")
+
+FIELDNAMES = ['path', 'spoken_language', 'signed_language', 'start', 'end', 'words', 'glosses', 'priority']
+
 
 def standardize_word(word):
     """Standardize word format: lowercase, replace underscores with spaces."""
     return word.lower().replace('_', ' ')
 
+
 # Get list of all MP4 files in output folder with their exact names
 mp4_files = [f for f in os.listdir(VIDEO_FOLDER) if f.endswith('.mp4')]
 print(f"Found {len(mp4_files)} MP4 files in output folder")
@@ -16,32 +21,33 @@ print(f"Found {len(mp4_files)} MP4 files in output folder")
 # Create a mapping of standardized words to their exact filenames
 file_mapping = {standardize_word(os.path.splitext(f)[0]): f for f in mp4_files}
 
-# Create new DataFrame with exact filenames
-new_df = []
-for word, filename in file_mapping.items():
-    new_df.append({
-        'path': f"Videos/output/{filename}",
-        'spoken_language': 'en',
-        'signed_language': 'ins',
-        'start': 0,
-        'end': 0,
-        'words': word,
-        'glosses': word.upper(),
-        'priority': 0
-    })
-
-# Convert to DataFrame and sort by words
-df = pd.DataFrame(new_df)
-df = df.sort_values('words', ignore_index=True)
-
-# Save updated CSV
-df.to_csv(CSV_PATH, index=False)
-print(f"✅ Updated index.csv with {len(df)} entries")
+
+def create_rows():
+    rows = []
+    for word, filename in file_mapping.items():
+        rows.append({
+            'path': f"Videos/output/{filename}",
+            'spoken_language': 'en',
+            'signed_language': 'ins',
+            'start': 0,
+            'end': 0,
+            'words': word,
+            'glosses': word.upper(),
+            'priority': 0
+        })
+    # Sort by words
+    return sorted(rows, key=lambda row: row['words'])
+
+
+# index.csv is only written again when a video was added, removed or changed since the last run,
+# see index.manifest.json
+summary = update_index(LEXICON_DIRECTORY, [os.path.join("Videos", "output")], ('.mp4',), create_rows, FIELDNAMES)
+print(f"✅ Updated index.csv with {summary['rows']} entries ({summary['added']} added, {summary['removed']} removed, "
+      f"{summary['changed']} changed)")
 
 # Print any missing files
-csv_files = set(os.path.basename(path) for path in df['path'])
-missing_files = set(mp4_files) - csv_files
+missing_files = set(mp4_files) - set(file_mapping.values())
 if missing_files:
     print("\nWarning: The following files are missing from index.csv:")
     for f in sorted(missing_files):
-        print(f"- {f}") 
\ No newline at end of file
+        print(f"- {f}")